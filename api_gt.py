@@ -280,6 +280,41 @@ class APIGuerrasTribales:
         
         return resultados
 
+    
+    def pueblos_de_jugadores(self, nombres_jugadores):
+        """
+        Obtiene todos los pueblos de varios jugadores (ofensivos o no).
+        
+        Args:
+            nombres_jugadores: nombres de los jugadores (sin distinguir mayúsculas)
+        
+        Returns:
+            list: pueblos con coordenadas, nombre, jugador, puntos_jugador y village_id
+        """
+        self.cargar_pueblos()
+        self.cargar_jugadores()
+        
+        # Se conserva el nombre tal como se pidió (el del CSV de ofensivas)
+        buscados = {nombre.lower(): nombre for nombre in nombres_jugadores}
+        jugadores = {
+            player_id: jugador for player_id, jugador in self._players.items()
+            if jugador['nombre'].lower() in buscados
+        }
+        
+        pueblos = []
+        for coordenadas, pueblo in self._villages.items():
+            jugador = jugadores.get(pueblo['player_id'])
+            if jugador:
+                pueblos.append({
+                    'coordenadas': coordenadas,
+                    'nombre': pueblo['nombre'],
+                    'jugador': buscados[jugador['nombre'].lower()],
+                    'puntos_jugador': jugador['puntos'],
+                    'village_id': pueblo['id']
+                })
+        
+        return pueblos
+
 
 # Función auxiliar para uso rápido
 def enriquecer_coordenadas(coordenadas_lista, mundo):
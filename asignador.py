@@ -3,20 +3,213 @@ Módulo de asignación de ataques
 Asigna pueblos atacantes a objetivos de manera optimizada
 """
 
-from calculadora import calcular_distancia, calcular_tiempo_viaje, calcular_moral, coordenadas_a_string, tiempo_a_string
-from datetime import datetime, timedelta
+from calculadora import (calcular_distancia, calcular_distancia_cuadrada, calcular_moral, coordenadas_a_string,
+                         tiempo_a_string, datetime_a_ms, FormateadorHoras, unidades_mas_lentas, matriz_distancias,
+                         tramos_sin_bonus_noche, mascara_llegada_posible, colocar_llegada)
+from config_mundos import segundos_por_campo, horas_bonus_noche, TROPA_AUTOMATICA
+from puntuacion import PESOS_POR_DEFECTO, normalizar_pesos, matriz_puntuaciones, asignacion_optima
+from datetime import datetime
+import heapq
+import math
 
+# Campos del pueblo que se copian a sus ataques
+CAMPOS_PUEBLO = ('tipo_off', 'tropas', 'poblacion_ofensiva', 'village_id')
 
-def asignar_ataques_por_distancia(pueblos_atacantes, objetivos, ataques_por_objetivo=5, mundo='es95', tipo_tropa='noble'):
+# NumPy es opcional: si está instalado, las máscaras de la ventana se calculan por lotes
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Políticas de prioridad de objetivos (1 = alta, 3 = baja)
+POLITICAS_PRIORIDAD = ('estricta', 'ponderada')
+
+# Objetivos de cada prioridad por ronda en la política ponderada (las demás prioridades, 1)
+PESOS_PRIORIDAD = {1: 3, 2: 2, 3: 1}
+
+
+def _velocidades_por_pueblo(pueblos, tipo_tropa, mundo):
+    """
+    Calcula la velocidad de cada pueblo atacante.
+    
+    Con tipo_tropa 'auto' cada pueblo viaja a la velocidad de su unidad más
+    lenta (el noble si lo lleva); si no, todos usan tipo_tropa.
+    
+    Args:
+        pueblos: lista de pueblos atacantes
+        tipo_tropa: tipo de tropa o 'auto'
+        mundo: identificador del mundo
+    
+    Returns:
+        dict: id(pueblo) -> (unidad, minutos_por_campo, ms_por_campo)
+    """
+    if tipo_tropa == TROPA_AUTOMATICA:
+        unidades = unidades_mas_lentas(pueblos, mundo)
+    else:
+        unidades = [tipo_tropa] * len(pueblos)
+    
+    por_unidad = {}
+    for unidad in set(unidades):
+        segundos = segundos_por_campo(unidad, mundo)
+        por_unidad[unidad] = (unidad, segundos / 60, segundos * 1000)
+    
+    return {id(pueblo): por_unidad[unidad] for pueblo, unidad in zip(pueblos, unidades)}
+
+
+def _cercanos_admitidos(pueblos, coord_objetivo, cantidad, velocidades, admite, plan):
+    """
+    Los pueblos más cercanos a un objetivo que pasan el filtro admite.
+    
+    Se sacan de un montículo por distancia al cuadrado hasta reunir
+    'cantidad' admitidos, así que solo se evalúan los pueblos necesarios.
+    Cuenta los descartes en plan['disponibilidad'].
+    """
+    ox, oy = coord_objetivo
+    monticulo = [((p['coordenadas'][0] - ox) ** 2 + (p['coordenadas'][1] - oy) ** 2, orden, p)
+                 for orden, p in enumerate(pueblos)]
+    heapq.heapify(monticulo)
+    
+    cercanos = []
+    descartados = 0
+    while monticulo and len(cercanos) < cantidad:
+        distancia_cuadrada, _, pueblo = heapq.heappop(monticulo)
+        ms_por_campo = velocidades[id(pueblo)][2]
+        if admite(pueblo, round(math.sqrt(distancia_cuadrada) * ms_por_campo)):
+            cercanos.append(pueblo)
+        else:
+            descartados += 1
+    
+    _anotar_descartes(plan, coord_objetivo, descartados, len(cercanos), cantidad)
+    return cercanos
+
+
+def _anotar_descartes(plan, coord_objetivo, descartados, asignados, pedidos):
+    """Acumula en plan['disponibilidad'] los pares descartados y los objetivos incompletos"""
+    resumen = plan.setdefault('disponibilidad', {'pares_descartados': 0, 'objetivos_incompletos': []})
+    resumen['pares_descartados'] += descartados
+    if descartados and asignados < pedidos:
+        resumen['objetivos_incompletos'].append({
+            'coordenadas': coordenadas_a_string(coord_objetivo),
+            'ataques_asignados': asignados,
+            'ataques_pedidos': pedidos
+        })
+
+
+def mostrar_objetivos_incompletos(plan):
+    """Avisa de los objetivos que quedaron sin todos sus ataques por los horarios de los jugadores"""
+    resumen = plan.get('disponibilidad')
+    if not resumen:
+        return
+    print(f"🕒 Horarios: {resumen['pares_descartados']} combinaciones descartadas por jugadores desconectados")
+    for objetivo in resumen['objetivos_incompletos']:
+        print(f"   ⚠️  {objetivo['coordenadas']}: {objetivo['ataques_asignados']}/{objetivo['ataques_pedidos']} ataques "
+              f"(faltan jugadores conectados a la hora de envío)")
+
+
+def tandas_por_prioridad(objetivos, politica='estricta', clave=None, pesos=None):
+    """
+    Reparte los objetivos en tandas según su 'prioridad' (1 = alta).
+    
+    Con la política 'estricta' hay una tanda por prioridad, de la más alta a
+    la más baja, así que los objetivos de baja prioridad solo reciben lo que
+    sobra. Con 'ponderada' cada tanda es una ronda que toma pesos[p]
+    objetivos de cada prioridad p (3, 2 y 1 por defecto), así que los de baja
+    prioridad también reciben una parte cuando faltan ofensivas. Dentro de
+    cada prioridad los objetivos van ordenados por clave (o en su orden).
+    
+    Los objetivos se ordenan una sola vez, antes de asignar: la prioridad no
+    añade trabajo por cada pareja pueblo-objetivo.
+    
+    Args:
+        objetivos: lista de objetivos ('prioridad' opcional, 1 por defecto)
+        politica: 'estricta' o 'ponderada'
+        clave: (opcional) función de orden dentro de cada prioridad
+        pesos: (opcional) dict prioridad -> objetivos por ronda (ponderada)
+    
+    Returns:
+        list: tandas (listas de objetivos) en el orden en que se asignan
+    """
+    if politica not in POLITICAS_PRIORIDAD:
+        raise ValueError(f"Política de prioridad desconocida: {politica}. Usa una de: {', '.join(POLITICAS_PRIORIDAD)}")
+    
+    cubetas = {}
+    for objetivo in (sorted(objetivos, key=clave) if clave else objetivos):
+        cubetas.setdefault(objetivo.get('prioridad', 1), []).append(objetivo)
+    niveles = sorted(cubetas)
+    
+    if politica == 'estricta':
+        return [cubetas[nivel] for nivel in niveles]
+    
+    pesos = PESOS_PRIORIDAD if pesos is None else pesos
+    posiciones = dict.fromkeys(niveles, 0)
+    tandas = []
+    while any(posiciones[nivel] < len(cubetas[nivel]) for nivel in niveles):
+        tanda = []
+        for nivel in niveles:
+            inicio = posiciones[nivel]
+            posiciones[nivel] = inicio + max(1, pesos.get(nivel, 1))
+            tanda.extend(cubetas[nivel][inicio:posiciones[nivel]])
+        tandas.append(tanda)
+    return tandas
+
+
+def ordenar_por_prioridad(objetivos, politica='estricta', clave=None):
+    """Objetivos en el orden de sus tandas de prioridad (ver tandas_por_prioridad)"""
+    return [objetivo for tanda in tandas_por_prioridad(objetivos, politica, clave) for objetivo in tanda]
+
+
+def anotar_prioridad(plan, objetivo, asignados, pedidos, politica):
+    """Acumula en plan['prioridades'] los ataques de cada prioridad y los objetivos incompletos"""
+    resumen = plan.setdefault('prioridades', {'politica': politica, 'por_prioridad': {}, 'objetivos_incompletos': []})
+    prioridad = objetivo.get('prioridad', 1)
+    nivel = resumen['por_prioridad'].setdefault(str(prioridad), {
+        'objetivos': 0, 'completos': 0, 'ataques_asignados': 0, 'ataques_pedidos': 0
+    })
+    nivel['objetivos'] += 1
+    nivel['ataques_asignados'] += asignados
+    nivel['ataques_pedidos'] += pedidos
+    if asignados >= pedidos:
+        nivel['completos'] += 1
+    else:
+        resumen['objetivos_incompletos'].append({
+            'coordenadas': coordenadas_a_string(objetivo['coordenadas']),
+            'nombre': objetivo['nombre'],
+            'prioridad': prioridad,
+            'ataques_asignados': asignados,
+            'ataques_pedidos': pedidos
+        })
+
+
+def mostrar_prioridades(plan):
+    """Resume por prioridad los objetivos completos y avisa de los incompletos"""
+    resumen = plan.get('prioridades')
+    if not resumen or not resumen['objetivos_incompletos']:
+        return
+    print(f"🚩 Prioridades ({resumen['politica']}):")
+    for prioridad, nivel in sorted(resumen['por_prioridad'].items(), key=lambda item: int(item[0])):
+        print(f"   Prioridad {prioridad}: {nivel['completos']}/{nivel['objetivos']} objetivos completos "
+              f"({nivel['ataques_asignados']}/{nivel['ataques_pedidos']} ataques)")
+    for objetivo in sorted(resumen['objetivos_incompletos'], key=lambda o: o['prioridad']):
+        print(f"   ⚠️  P{objetivo['prioridad']} {objetivo['coordenadas']}: "
+              f"{objetivo['ataques_asignados']}/{objetivo['ataques_pedidos']} ataques")
+
+
+def asignar_ataques_por_distancia(pueblos_atacantes, objetivos, ataques_por_objetivo=5, mundo='es95', tipo_tropa='noble', escritor=None, admite=None,
+                                  politica_prioridad='estricta'):
     """
     Asigna ataques a objetivos priorizando la menor distancia.
     
     Args:
-        pueblos_atacantes: lista de pueblos disponibles para atacar
+        pueblos_atacantes: lista de pueblos disponibles para atacar (o un PoolOfensivas)
         objetivos: lista de objetivos a atacar
         ataques_por_objetivo: número de ataques a asignar por objetivo
         mundo: identificador del mundo para calcular tiempos
         tipo_tropa: tipo de tropa para calcular tiempos de viaje
+        escritor: (opcional) EscritorPlanJSON. Si se proporciona, cada objetivo
+            se escribe en cuanto se completa y no se acumula en plan['objetivos']
+        admite: (opcional) función (pueblo, tiempo_viaje_ms) -> bool; los pueblos
+            que no admite se saltan y se usa el siguiente más cercano
+        politica_prioridad: 'estricta' o 'ponderada' (ver tandas_por_prioridad)
     
     Returns:
         dict: plan de ataque con asignaciones
@@ -29,30 +222,40 @@ def asignar_ataques_por_distancia(pueblos_atacantes, objetivos, ataques_por_obje
         'pueblos_sin_asignar': []
     }
     
-    pueblos_disponibles = pueblos_atacantes.copy()
+    if escritor:
+        escritor.actualizar_metadatos({'fecha_creacion': plan['fecha_creacion'], 'mundo': mundo, 'tipo_tropa': tipo_tropa})
+    
+    # Velocidad de cada pueblo desde la tabla compilada del mundo (una sola pasada)
+    velocidades = _velocidades_por_pueblo(pueblos_atacantes, tipo_tropa, mundo)
+    
+    pueblos_disponibles = list(pueblos_atacantes)
     
-    # Ordenar objetivos por puntos del jugador defensor (menor a mayor)
-    # Esto asegura que jugadores pequeños ataquen primero a defensores pequeños (moral óptima)
-    objetivos_ordenados = sorted(objetivos, key=lambda x: x.get('puntos_defensor', 0))
+    # Ordenar objetivos por prioridad y, dentro de cada una, por puntos del jugador
+    # defensor (menor a mayor): jugadores pequeños atacan primero a defensores pequeños
+    objetivos_ordenados = ordenar_por_prioridad(objetivos, politica_prioridad,
+                                                clave=lambda x: x.get('puntos_defensor', 0))
     
     for objetivo in objetivos_ordenados:
         coord_objetivo = objetivo['coordenadas']
         ataques_asignados = []
         
-        # Calcular distancias de todos los pueblos disponibles a este objetivo
-        distancias = []
-        for pueblo in pueblos_disponibles:
-            distancia = calcular_distancia(pueblo['coordenadas'], coord_objetivo)
-            distancias.append((pueblo, distancia))
-        
-        # Ordenar por distancia
-        distancias.sort(key=lambda x: x[1])
+        # Los N más cercanos por distancia al cuadrado (entera, mismo orden que la real)
+        ox, oy = coord_objetivo
+        if admite is None:
+            cercanos = heapq.nsmallest(
+                ataques_por_objetivo, pueblos_disponibles,
+                key=lambda p: (p['coordenadas'][0] - ox) ** 2 + (p['coordenadas'][1] - oy) ** 2
+            )
+        else:
+            cercanos = _cercanos_admitidos(pueblos_disponibles, coord_objetivo, ataques_por_objetivo,
+                                           velocidades, admite, plan)
         
-        # Asignar los N pueblos más cercanos
-        for i in range(min(ataques_por_objetivo, len(distancias))):
-            pueblo, distancia = distancias[i]
+        # Asignar los N pueblos más cercanos (raíz solo para los elegidos)
+        for pueblo in cercanos:
+            distancia = calcular_distancia(pueblo['coordenadas'], coord_objetivo)
             
-            tiempo_viaje_mins = calcular_tiempo_viaje(distancia, tipo_tropa, mundo)
+            unidad, minutos_por_campo, ms_por_campo = velocidades[id(pueblo)]
+            tiempo_viaje_mins = distancia * minutos_por_campo
             
             ataque = {
                 'pueblo_atacante': coordenadas_a_string(pueblo['coordenadas']),
@@ -61,9 +264,13 @@ def asignar_ataques_por_distancia(pueblos_atacantes, objetivos, ataques_por_obje
                 'distancia': round(distancia, 2),
                 'tiempo_viaje': tiempo_a_string(tiempo_viaje_mins),
                 'tiempo_viaje_minutos': round(tiempo_viaje_mins, 2),
+                'tiempo_viaje_ms': round(distancia * ms_por_campo),
                 'moral': calcular_moral(pueblo['puntos_jugador'], objetivo['puntos_defensor'])
             }
             
+            if tipo_tropa == TROPA_AUTOMATICA:
+                ataque['tropa_lenta'] = unidad
+            
             # Preservar información adicional si existe
             if 'tipo_off' in pueblo:
                 ataque['tipo_off'] = pueblo['tipo_off']
@@ -75,13 +282,20 @@ def asignar_ataques_por_distancia(pueblos_atacantes, objetivos, ataques_por_obje
             ataques_asignados.append(ataque)
             pueblos_disponibles.remove(pueblo)
         
-        plan['objetivos'].append({
+        anotar_prioridad(plan, objetivo, len(ataques_asignados), ataques_por_objetivo, politica_prioridad)
+        
+        objetivo_plan = {
             'coordenadas': coordenadas_a_string(coord_objetivo),
             'nombre': objetivo['nombre'],
             'jugador_defensor': objetivo.get('jugador_defensor', 'Desconocido'),
             'ataques': ataques_asignados,
             'ataques_asignados': len(ataques_asignados)
-        })
+        }
+        
+        if escritor:
+            escritor.escribir_objetivo(objetivo_plan)
+        else:
+            plan['objetivos'].append(objetivo_plan)
     
     # Pueblos que no fueron asignados
     plan['pueblos_sin_asignar'] = [
@@ -93,10 +307,126 @@ def asignar_ataques_por_distancia(pueblos_atacantes, objetivos, ataques_por_obje
         for p in pueblos_disponibles
     ]
     
+    if escritor:
+        escritor.actualizar_finales({'pueblos_sin_asignar': plan['pueblos_sin_asignar'],
+                                     'prioridades': plan.get('prioridades')})
+    
     return plan
 
 
-def asignar_con_sincronizacion(pueblos_atacantes, objetivos, hora_llegada, ataques_por_objetivo=5, mundo='es95', tipo_tropa='noble'):
+def formato_fecha_plan(plan):
+    """
+    Formato de fecha de las horas ya escritas en el plan.
+    
+    Returns:
+        str: '%Y-%m-%d' (planes sincronizados) o '%d/%m/%Y' (el resto)
+    """
+    for objetivo in plan['objetivos']:
+        for ataque in objetivo['ataques']:
+            hora_envio = ataque.get('hora_envio', '')
+            if hora_envio:
+                return '%Y-%m-%d' if hora_envio[4:5] == '-' else '%d/%m/%Y'
+    return '%d/%m/%Y'
+
+
+def formatear_horas_plan(plan, formato_fecha='%d/%m/%Y'):
+    """
+    Rellena los textos 'hora_envio' y 'hora_llegada' de todos los ataques
+    a partir de sus campos en milisegundos, en un solo recorrido.
+    
+    Los rangos de ventana ('hora_envio_hasta_ms', 'hora_llegada_hasta_ms')
+    se escriben como "inicio hasta fin" e "inicio - fin". Los ataques de
+    oleadas también reciben el texto 'hora_regreso'.
+    
+    Args:
+        plan: plan de ataque
+        formato_fecha: formato strftime de la parte de fecha
+    """
+    formateador = FormateadorHoras(formato_fecha)
+    formatear = formateador.formatear
+    
+    for objetivo in plan['objetivos']:
+        for ataque in objetivo['ataques']:
+            if 'hora_llegada_ms' in ataque:
+                texto = formatear(ataque['hora_llegada_ms'])
+                if 'hora_llegada_hasta_ms' in ataque:
+                    texto = f"{texto} - {formatear(ataque['hora_llegada_hasta_ms'])}"
+                ataque['hora_llegada'] = texto
+            if 'hora_envio_ms' in ataque:
+                texto = formatear(ataque['hora_envio_ms'])
+                if 'hora_envio_hasta_ms' in ataque:
+                    texto = f"{texto} hasta {formatear(ataque['hora_envio_hasta_ms'])}"
+                ataque['hora_envio'] = texto
+            if 'hora_regreso_ms' in ataque:
+                ataque['hora_regreso'] = formatear(ataque['hora_regreso_ms'])
+
+
+def aplicar_ventana_llegada(plan, hora_inicio, hora_fin, hora_actual=None, bonus_noche=False, disponibilidad=None):
+    """
+    Añade a cada ataque el rango de envío para llegar dentro de una ventana.
+    
+    Guarda 'ventana_llegada' en el plan y, por ataque, el envío para llegar
+    al inicio y al final de la ventana (en milisegundos y como texto).
+    Con bonus_noche, la ventana se parte quitando las horas del bonus de
+    noche del mundo del plan y cada ataque recibe el tramo más cercano al
+    centro de la ventana al que puede llegar (saliendo no antes de
+    hora_actual, si se indica). Con disponibilidad, el rango se recorta
+    además a las horas en que el jugador del ataque está conectado.
+    
+    Args:
+        plan: plan con 'tiempo_viaje_ms' en cada ataque
+        hora_inicio: datetime de inicio de la ventana
+        hora_fin: datetime de fin de la ventana
+        hora_actual: (opcional) datetime desde el que se puede enviar
+        bonus_noche: quitar de la ventana las horas del bonus de noche
+        disponibilidad: (opcional) Disponibilidad con los horarios de los jugadores
+    """
+    hora_llegada = hora_inicio + (hora_fin - hora_inicio) / 2
+    plan['ventana_llegada'] = {
+        'inicio': hora_inicio.strftime('%H:%M:%S %d/%m/%Y'),
+        'fin': hora_fin.strftime('%H:%M:%S %d/%m/%Y'),
+        'objetivo': hora_llegada.strftime('%H:%M:%S %d/%m/%Y')
+    }
+    
+    inicio_ms = datetime_a_ms(hora_inicio)
+    fin_ms = datetime_a_ms(hora_fin)
+    tramos = None
+    if bonus_noche:
+        horas_noche = horas_bonus_noche(plan['mundo'])
+        tramos = tramos_sin_bonus_noche(inicio_ms, fin_ms, horas_noche)
+        if horas_noche:
+            plan['ventana_llegada']['bonus_noche'] = f"{horas_noche[0]:02d}:00-{horas_noche[1]:02d}:00"
+    objetivo_ms = datetime_a_ms(hora_llegada)
+    ahora_ms = datetime_a_ms(hora_actual) if hora_actual else None
+    
+    for objetivo in plan['objetivos']:
+        for ataque in objetivo['ataques']:
+            tiempo_viaje_ms = ataque['tiempo_viaje_ms']
+            
+            # Tramo de llegada: la ventana entera o el mejor tramo fuera del bonus
+            # (y dentro del horario del jugador)
+            llegada_desde, llegada_hasta = inicio_ms, fin_ms
+            tramos_ataque = tramos
+            if disponibilidad:
+                tramos_ataque = disponibilidad.recortar_llegadas(ataque['jugador'], tramos or [(inicio_ms, fin_ms)],
+                                                                 tiempo_viaje_ms)
+            if tramos_ataque is not None:
+                colocado = colocar_llegada(tramos_ataque, tiempo_viaje_ms, objetivo_ms, ahora_ms)
+                if colocado:
+                    llegada_desde, llegada_hasta, _ = colocado
+            
+            # Envío para llegar al inicio y al final del tramo
+            ataque['hora_envio_ms'] = llegada_desde - tiempo_viaje_ms
+            ataque['hora_envio_hasta_ms'] = llegada_hasta - tiempo_viaje_ms
+            ataque['hora_llegada_ms'] = llegada_desde
+            ataque['hora_llegada_hasta_ms'] = llegada_hasta
+    
+    # Textos de todos los rangos en un solo recorrido
+    formatear_horas_plan(plan, '%d/%m/%Y')
+
+
+def asignar_con_sincronizacion(pueblos_atacantes, objetivos, hora_llegada, ataques_por_objetivo=5, mundo='es95', tipo_tropa='noble', disponibilidad=None,
+                               politica_prioridad='estricta'):
     """
     Asigna ataques sincronizados para llegar a una hora específica.
     
@@ -107,27 +437,36 @@ def asignar_con_sincronizacion(pueblos_atacantes, objetivos, hora_llegada, ataqu
         ataques_por_objetivo: número de ataques por objetivo
         mundo: identificador del mundo
         tipo_tropa: tipo de tropa para calcular tiempos
+        disponibilidad: (opcional) Disponibilidad con los horarios de los jugadores;
+            se descartan los pueblos cuyo jugador no está conectado a la hora de envío
+        politica_prioridad: 'estricta' o 'ponderada' (ver tandas_por_prioridad)
     
     Returns:
         dict: plan de ataque con horarios de envío
     """
-    plan_base = asignar_ataques_por_distancia(pueblos_atacantes, objetivos, ataques_por_objetivo, mundo, tipo_tropa)
+    llegada_ms = datetime_a_ms(hora_llegada)
+    
+    admite = None
+    if disponibilidad:
+        admite = lambda pueblo, tiempo_viaje_ms: disponibilidad.disponible(pueblo['jugador'], llegada_ms - tiempo_viaje_ms)
     
-    # Calcular hora de envío para cada ataque
+    plan_base = asignar_ataques_por_distancia(pueblos_atacantes, objetivos, ataques_por_objetivo, mundo, tipo_tropa,
+                                              admite=admite, politica_prioridad=politica_prioridad)
+    
+    # Calcular hora de envío para cada ataque en milisegundos enteros
     for objetivo in plan_base['objetivos']:
         for ataque in objetivo['ataques']:
-            tiempo_viaje_minutos = ataque['tiempo_viaje_minutos']
-            hora_envio = hora_llegada - timedelta(minutes=tiempo_viaje_minutos)
-            
-            ataque['hora_llegada'] = hora_llegada.strftime('%Y-%m-%d %H:%M:%S')
-            ataque['hora_envio'] = hora_envio.strftime('%Y-%m-%d %H:%M:%S')
+            ataque['hora_llegada_ms'] = llegada_ms
+            ataque['hora_envio_ms'] = llegada_ms - ataque['tiempo_viaje_ms']
     
+    formatear_horas_plan(plan_base, '%Y-%m-%d')
     plan_base['hora_llegada_objetivo'] = hora_llegada.strftime('%Y-%m-%d %H:%M:%S')
     
     return plan_base
 
 
-def balancear_por_jugador(pueblos_atacantes, objetivos, ataques_por_objetivo=5, mundo='es95', tipo_tropa='noble'):
+def balancear_por_jugador(pueblos_atacantes, objetivos, ataques_por_objetivo=5, mundo='es95', tipo_tropa='noble', escritor=None,
+                          politica_prioridad='estricta'):
     """
     Asigna ataques balanceando la carga entre jugadores.
     
@@ -137,6 +476,9 @@ def balancear_por_jugador(pueblos_atacantes, objetivos, ataques_por_objetivo=5,
         ataques_por_objetivo: ataques por objetivo
         mundo: identificador del mundo
         tipo_tropa: tipo de tropa para calcular tiempos
+        escritor: (opcional) EscritorPlanJSON. Si se proporciona, cada objetivo
+            se escribe en cuanto se completa y no se acumula en plan['objetivos']
+        politica_prioridad: 'estricta' o 'ponderada' (ver tandas_por_prioridad)
     
     Returns:
         dict: plan balanceado
@@ -161,7 +503,14 @@ def balancear_por_jugador(pueblos_atacantes, objetivos, ataques_por_objetivo=5,
         'balance_jugadores': {}
     }
     
-    for objetivo in objetivos:
+    if escritor:
+        escritor.actualizar_metadatos({'fecha_creacion': plan['fecha_creacion'], 'mundo': mundo, 'tipo_tropa': tipo_tropa})
+    
+    # Velocidad de cada pueblo desde la tabla compilada del mundo (una sola pasada)
+    velocidades = _velocidades_por_pueblo(pueblos_atacantes, tipo_tropa, mundo)
+    
+    # Objetivos de mayor prioridad primero (en su orden dentro de cada prioridad)
+    for objetivo in ordenar_por_prioridad(objetivos, politica_prioridad):
         coord_objetivo = objetivo['coordenadas']
         ataques_asignados = []
         
@@ -177,20 +526,24 @@ def balancear_por_jugador(pueblos_atacantes, objetivos, ataques_por_objetivo=5,
                 if not pueblos:
                     continue
                 
+                # El más cercano del jugador por distancia al cuadrado (entera)
+                cercano = min(pueblos, key=lambda p: calcular_distancia_cuadrada(p['coordenadas'], coord_objetivo))
+                cercano_d2 = calcular_distancia_cuadrada(cercano['coordenadas'], coord_objetivo)
+                
                 # Bonus para jugadores con menos ataques asignados
+                # (una raíz por jugador: el peso se aplica sobre la distancia real)
                 peso_jugador = 1 + (ataques_por_jugador[jugador] * 0.1)
+                distancia = math.sqrt(cercano_d2) * peso_jugador
                 
-                for pueblo in pueblos:
-                    distancia = calcular_distancia(pueblo['coordenadas'], coord_objetivo) * peso_jugador
-                    
-                    if distancia < mejor_distancia:
-                        mejor_distancia = distancia
-                        mejor_jugador = jugador
-                        mejor_pueblo = pueblo
+                if distancia < mejor_distancia:
+                    mejor_distancia = distancia
+                    mejor_jugador = jugador
+                    mejor_pueblo = cercano
             
             if mejor_pueblo:
                 distancia_real = calcular_distancia(mejor_pueblo['coordenadas'], coord_objetivo)
-                tiempo_viaje_mins = calcular_tiempo_viaje(distancia_real, tipo_tropa, mundo)
+                unidad, minutos_por_campo, ms_por_campo = velocidades[id(mejor_pueblo)]
+                tiempo_viaje_mins = distancia_real * minutos_por_campo
                 
                 ataque = {
                     'pueblo_atacante': coordenadas_a_string(mejor_pueblo['coordenadas']),
@@ -198,9 +551,13 @@ def balancear_por_jugador(pueblos_atacantes, objetivos, ataques_por_objetivo=5,
                     'jugador': mejor_pueblo['jugador'],
                     'distancia': round(distancia_real, 2),
                     'tiempo_viaje': tiempo_a_string(tiempo_viaje_mins),
+                    'tiempo_viaje_ms': round(distancia_real * ms_por_campo),
                     'moral': calcular_moral(mejor_pueblo['puntos_jugador'], objetivo['puntos_defensor'])
                 }
                 
+                if tipo_tropa == TROPA_AUTOMATICA:
+                    ataque['tropa_lenta'] = unidad
+                
                 # Preservar información adicional si existe
                 if 'tipo_off' in mejor_pueblo:
                     ataque['tipo_off'] = mejor_pueblo['tipo_off']
@@ -213,18 +570,120 @@ def balancear_por_jugador(pueblos_atacantes, objetivos, ataques_por_objetivo=5,
                 pueblos_por_jugador[mejor_jugador].remove(mejor_pueblo)
                 ataques_por_jugador[mejor_jugador] += 1
         
-        plan['objetivos'].append({
+        anotar_prioridad(plan, objetivo, len(ataques_asignados), ataques_por_objetivo, politica_prioridad)
+        
+        objetivo_plan = {
             'coordenadas': coordenadas_a_string(coord_objetivo),
             'nombre': objetivo['nombre'],
             'ataques': ataques_asignados
-        })
+        }
+        
+        if escritor:
+            escritor.escribir_objetivo(objetivo_plan)
+        else:
+            plan['objetivos'].append(objetivo_plan)
     
     plan['balance_jugadores'] = ataques_por_jugador
     
+    if escritor:
+        escritor.actualizar_finales({'pueblos_sin_asignar': [], 'balance_jugadores': ataques_por_jugador,
+                                     'prioridades': plan.get('prioridades')})
+    
     return plan
 
 
-def asignar_optimizando_moral(pueblos_atacantes, objetivos, ataques_por_objetivo=5, mundo='es95', tipo_tropa='noble', hora_llegada=None, tipo_off_por_objetivo=None):
+def _poblacion_pueblo(pueblo):
+    """
+    Población ofensiva de un pueblo (la del CSV o, si falta, la suma de sus tropas).
+    """
+    poblacion_total = pueblo.get('poblacion_ofensiva', 0)
+    if poblacion_total == 0 and 'tropas' in pueblo:
+        # Calcular población desde tropas
+        tropas = pueblo['tropas']
+        poblacion_total = (
+            tropas.get('hachas', 0) +
+            tropas.get('ligeras', 0) +
+            tropas.get('arq_caballo', 0) +
+            tropas.get('arietes', 0) +
+            tropas.get('catapultas', 0)
+        )
+    return poblacion_total
+
+
+def _objetivo_acepta(obj_info, tipo_pueblo):
+    """
+    Indica si un objetivo acepta (todavía) ofensivas de un tipo.
+    
+    Sin tipo exigido acepta cualquiera; con un tipo, solo ese; en modo MIXTA,
+    SUPER o FULL mientras su contador no llegue a la cantidad pedida.
+    """
+    tipo_requerido = obj_info['tipo_requerido']
+    if not tipo_requerido:
+        return True
+    if isinstance(tipo_requerido, dict) and tipo_requerido.get('tipo') == 'MIXTA':
+        if tipo_pueblo not in ['SUPER', 'FULL']:
+            return False
+        return obj_info['asignados_por_tipo'].get(tipo_pueblo, 0) < tipo_requerido.get(tipo_pueblo, 0)
+    return tipo_pueblo == tipo_requerido
+
+
+def crear_ataque(pueblo, objetivo, distancia, tiempo_viaje_mins, tiempo_viaje_ms, moral, llegada_ms=None,
+                 unidad=None, campos_pueblo=CAMPOS_PUEBLO, **campos):
+    """
+    Orden con el formato común de los planes (ataques, trenes, oleadas, fakes y apoyos).
+    
+    Args:
+        pueblo: pueblo que envía
+        objetivo: objetivo (o entrante) con 'coordenadas'
+        distancia: distancia en campos
+        tiempo_viaje_mins: tiempo de viaje en minutos
+        tiempo_viaje_ms: tiempo de viaje en milisegundos
+        moral: moral del ataque
+        llegada_ms: (opcional) hora de llegada; con ella se calcula la de envío
+            (los textos se añaden al final, en lote)
+        unidad: (opcional) unidad más lenta, guardada en 'tropa_lenta'
+        campos_pueblo: campos del pueblo que se copian si los tiene
+        **campos: campos propios de cada tipo de orden ('rol', 'oleada', 'fake'...)
+    
+    Returns:
+        dict: ataque
+    """
+    ataque = {
+        'pueblo_atacante': coordenadas_a_string(pueblo['coordenadas']),
+        'nombre_pueblo': pueblo['nombre'],
+        'jugador': pueblo['jugador'],
+        'distancia': round(distancia, 2),
+        'tiempo_viaje': tiempo_a_string(tiempo_viaje_mins),
+        'tiempo_viaje_minutos': round(tiempo_viaje_mins, 2),
+        'tiempo_viaje_ms': tiempo_viaje_ms,
+        'moral': moral
+    }
+    if llegada_ms is not None:
+        ataque['hora_llegada_ms'] = llegada_ms
+        ataque['hora_envio_ms'] = llegada_ms - tiempo_viaje_ms
+    if unidad is not None:
+        ataque['tropa_lenta'] = unidad
+    ataque.update(campos)
+    
+    # Preservar información adicional si existe
+    for campo in campos_pueblo:
+        if campo in pueblo:
+            ataque[campo] = pueblo[campo]
+    
+    ataque['coordenadas_objetivo'] = objetivo['coordenadas']
+    return ataque
+
+
+def _crear_ataque_moral(pueblo, objetivo, moral, velocidad, tipo_tropa, llegada_ms=None):
+    """Ataque del asignador por moral para una pareja ya elegida"""
+    distancia = calcular_distancia(pueblo['coordenadas'], objetivo['coordenadas'])
+    unidad, minutos_por_campo, ms_por_campo = velocidad
+    return crear_ataque(pueblo, objetivo, distancia, distancia * minutos_por_campo, round(distancia * ms_por_campo),
+                        moral, llegada_ms, unidad if tipo_tropa == TROPA_AUTOMATICA else None)
+
+
+def asignar_optimizando_moral(pueblos_atacantes, objetivos, ataques_por_objetivo=5, mundo='es95', tipo_tropa='noble', hora_llegada=None, tipo_off_por_objetivo=None, disponibilidad=None,
+                              ventana=None, hora_actual=None, politica_prioridad='estricta', pesos=None, optimo=False):
     """
     Asigna ataques optimizando la moral del plan.
     
@@ -234,10 +693,12 @@ def asignar_optimizando_moral(pueblos_atacantes, objetivos, ataques_por_objetivo
     - EVITAR: Jugadores grandes contra objetivos pequeños (moral baja 30-40%)
     
     El algoritmo asigna cada ofensiva al objetivo donde tendrá la MEJOR moral posible,
-    priorizando las asignaciones donde la moral sea más alta.
+    priorizando las asignaciones donde la moral sea más alta. Los objetivos entran
+    por tandas de prioridad: la siguiente tanda solo se abre cuando ninguna ofensiva
+    restante sirve a los objetivos ya abiertos.
     
     Args:
-        pueblos_atacantes: lista de pueblos disponibles para atacar
+        pueblos_atacantes: lista de pueblos disponibles para atacar (o un PoolOfensivas)
         objetivos: lista de objetivos a atacar
         ataques_por_objetivo: número de ataques por objetivo (puede ser int o dict)
             - Si es int: mismo número para todos los objetivos
@@ -247,10 +708,44 @@ def asignar_optimizando_moral(pueblos_atacantes, objetivos, ataques_por_objetivo
         hora_llegada: (opcional) datetime para sincronizar llegadas
         tipo_off_por_objetivo: (opcional) dict con tipo de OFF por objetivo {coord_string: tipo}
             - Si se proporciona, solo se usan ofensivas del tipo especificado para cada objetivo
+        disponibilidad: (opcional) Disponibilidad con los horarios de los jugadores (necesita
+            hora_llegada); se descartan las combinaciones cuya hora de envío cae fuera de ellos
+            (con ventana, las que no pueden enviar en ningún momento de su rango, que se
+            recorta a las horas del jugador)
+        ventana: (opcional) (hora_inicio, hora_fin) de llegada; se quitan las horas del bonus
+            de noche del mundo, se descartan las combinaciones que no pueden llegar a ningún
+            tramo y cada ataque recibe el tramo más cercano al centro (hora_llegada por
+            defecto es el centro de la ventana)
+        hora_actual: (opcional) datetime desde el que se puede enviar (con ventana)
+        politica_prioridad: 'estricta' o 'ponderada' (ver tandas_por_prioridad)
+        pesos: (opcional) dict criterio -> peso (ver puntuacion.CRITERIOS); en lugar de la
+            regla de moral con tolerancias, cada pueblo va al objetivo de mayor puntuación
+            ponderada. Con peso en 'tipo_off', el tipo pedido deja de ser obligatorio y
+            solo suma puntos
+        optimo: si es True, reparte cada tanda con el algoritmo húngaro (máxima puntuación
+            total en lugar de voraz; sin pesos usa puntuacion.PESOS_POR_DEFECTO). No
+            admite peso en 'balance', que depende del orden del reparto voraz
     
     Returns:
         dict: plan de ataque optimizado por moral
     """
+    if optimo and pesos is None:
+        pesos = PESOS_POR_DEFECTO
+    if pesos is not None:
+        pesos = normalizar_pesos(pesos)
+    if optimo and pesos['balance']:
+        raise ValueError("El reparto óptimo no admite el peso 'balance' (usa el voraz)")
+    
+    # Con peso en el tipo de OFF el tipo pedido puntúa en lugar de filtrar
+    tipos_preferidos = None
+    if pesos is not None and pesos['tipo_off'] and tipo_off_por_objetivo:
+        tipos_preferidos, tipo_off_por_objetivo = tipo_off_por_objetivo, None
+    
+    if ventana and not hora_llegada:
+        hora_llegada = ventana[0] + (ventana[1] - ventana[0]) / 2
+    if disponibilidad and not hora_llegada:
+        raise ValueError("Los horarios de los jugadores necesitan una hora de llegada")
+    
     plan = {
         'fecha_creacion': datetime.now().isoformat(),
         'mundo': mundo,
@@ -267,10 +762,22 @@ def asignar_optimizando_moral(pueblos_atacantes, objetivos, ataques_por_objetivo
     # Si hay hora de llegada, agregarla al plan
     if hora_llegada:
         plan['hora_llegada_objetivo'] = hora_llegada.strftime('%d/%m/%Y %H:%M:%S')
+        llegada_ms = datetime_a_ms(hora_llegada)
+    
+    # Velocidad de cada pueblo desde la tabla compilada del mundo (una sola pasada)
+    velocidades = _velocidades_por_pueblo(pueblos_atacantes, tipo_tropa, mundo)
+    
+    # Tandas de prioridad; dentro de cada una, por puntos del jugador defensor (menor
+    # a mayor): jugadores pequeños atacan primero a defensores pequeños (moral óptima)
+    tandas = tandas_por_prioridad(objetivos, politica_prioridad, clave=lambda x: x.get('puntos_defensor', 0))
+    objetivos_ordenados = [objetivo for tanda in tandas for objetivo in tanda]
     
-    # Ordenar objetivos por puntos del jugador defensor (menor a mayor)
-    # Esto asegura que jugadores pequeños ataquen primero a defensores pequeños (moral óptima)
-    objetivos_ordenados = sorted(objetivos, key=lambda x: x.get('puntos_defensor', 0))
+    # Índice final (exclusivo) de cada tanda en objetivos_ordenados
+    fin_tandas = []
+    for tanda in tandas:
+        fin_tandas.append((fin_tandas[-1] if fin_tandas else 0) + len(tanda))
+    tanda_abierta = 0
+    abiertos = fin_tandas[0] if fin_tandas else 0
     
     # Crear estructura para trackear cuántos ataques necesita cada objetivo
     objetivos_info = []
@@ -282,166 +789,254 @@ def asignar_optimizando_moral(pueblos_atacantes, objetivos, ataques_por_objetivo
         else:
             num_ataques = ataques_por_objetivo
         
+        # Tipo de OFF exigido, resuelto una vez por objetivo
+        tipo_requerido = None
+        if tipo_off_por_objetivo:
+            tipo_requerido = tipo_off_por_objetivo.get(coordenadas_a_string(objetivo['coordenadas']))
+        
         objetivos_info.append({
             'objetivo': objetivo,
             'ataques_necesarios': num_ataques,
-            'ataques_asignados': []
+            'ataques_asignados': [],
+            'tipo_requerido': tipo_requerido,
+            'asignados_por_tipo': {}
         })
     
-    pueblos_disponibles = pueblos_atacantes.copy()
+    pueblos_disponibles = list(pueblos_atacantes)
     
-    # Mientras haya pueblos disponibles y objetivos que necesiten ataques
-    while pueblos_disponibles:
-        # Verificar si quedan objetivos por completar
-        objetivos_incompletos = [obj for obj in objetivos_info if obj['ataques_necesarios'] > 0]
-        if not objetivos_incompletos:
-            break
+    # Pools de pueblos por tipo de OFF; cada entrada guarda su posición original
+    # (para recorrerlos en el mismo orden) y su población, calculada una vez
+    poblaciones = [_poblacion_pueblo(pueblo) for pueblo in pueblos_disponibles]
+    pools = {}
+    for orden, pueblo in enumerate(pueblos_disponibles):
+        pools.setdefault(pueblo.get('tipo_off'), []).append((orden, pueblo, poblaciones[orden]))
+    
+    # Objetivos abiertos e incompletos que aceptan cada tipo (en orden de objetivo)
+    objetivos_por_tipo = {
+        tipo: [idx for idx, obj_info in enumerate(objetivos_info[:abiertos])
+               if obj_info['ataques_necesarios'] > 0 and _objetivo_acepta(obj_info, tipo)]
+        for tipo in pools
+    }
+    
+    # Horarios: conexión ya comprobada por (pueblo, objetivo) y descartes por objetivo
+    conexiones = {}
+    descartes_por_objetivo = {}
+    
+    # Ventana: máscara pueblos x objetivos de las parejas que pueden llegar a algún
+    # tramo fuera del bonus de noche, calculada de una vez
+    viables = None
+    if ventana:
+        ahora_ms = datetime_a_ms(hora_actual) if hora_actual else None
+        tramos = tramos_sin_bonus_noche(datetime_a_ms(ventana[0]), datetime_a_ms(ventana[1]), horas_bonus_noche(mundo))
+        distancias = matriz_distancias([p['coordenadas'] for p in pueblos_disponibles],
+                                       [info['objetivo']['coordenadas'] for info in objetivos_info])
+        ms_por_campo = [velocidades[id(p)][2] for p in pueblos_disponibles]
+        if np is not None:
+            tiempos = np.rint(distancias * np.asarray(ms_por_campo).reshape(-1, 1))
+            viables = mascara_llegada_posible(tiempos, tramos, ahora_ms).tolist()
+        else:
+            viables = [mascara_llegada_posible([round(d * v) for d in fila], tramos, ahora_ms)
+                       for fila, v in zip(distancias, ms_por_campo)]
+        fuera_de_ventana = sum(fila.count(False) for fila in viables)
+    
+    def conectado(pueblo, idx):
+        """Jugador conectado a la hora de envío (o en parte del rango) de la pareja, una sola vez"""
+        clave = (id(pueblo), idx)
+        resultado = conexiones.get(clave)
+        if resultado is None:
+            objetivo = objetivos_info[idx]['objetivo']
+            ms_por_campo = velocidades[id(pueblo)][2]
+            tiempo_viaje_ms = round(calcular_distancia(pueblo['coordenadas'], objetivo['coordenadas']) * ms_por_campo)
+            if viables is not None:
+                # Con ventana, basta con que algún envío del rango caiga en su horario
+                tramos_pareja = disponibilidad.recortar_llegadas(pueblo['jugador'], tramos, tiempo_viaje_ms)
+                resultado = colocar_llegada(tramos_pareja, tiempo_viaje_ms, llegada_ms, ahora_ms) is not None
+            else:
+                resultado = disponibilidad.disponible(pueblo['jugador'], llegada_ms - tiempo_viaje_ms)
+            conexiones[clave] = resultado
+            if not resultado:
+                descartes_por_objetivo[idx] = descartes_por_objetivo.get(idx, 0) + 1
+        return resultado
+    
+    # Puntuación configurable: todas las parejas de una sola pasada; el reparto entre
+    # jugadores depende de lo ya asignado y se resta al elegir
+    puntuaciones = None
+    if pesos is not None:
+        tipos_pedidos = None
+        if tipos_preferidos:
+            tipos_pedidos = [tipos_preferidos.get(coordenadas_a_string(info['objetivo']['coordenadas']))
+                             for info in objetivos_info]
+        puntuaciones = matriz_puntuaciones(pueblos_disponibles, [info['objetivo'] for info in objetivos_info], pesos,
+                                           [velocidades[id(p)][2] for p in pueblos_disponibles], poblaciones,
+                                           tipos_pedidos)
+        if np is not None:
+            puntuaciones = puntuaciones.tolist()
+        pueblos_por_jugador = {}
+        for pueblo in pueblos_disponibles:
+            pueblos_por_jugador[pueblo['jugador']] = pueblos_por_jugador.get(pueblo['jugador'], 0) + 1
+        usados_por_jugador = {}
+    
+    def asignar(entrada, idx, moral):
+        """Añade el ataque de la pareja elegida a su objetivo y retira el pueblo"""
+        pueblo = entrada[1]
+        obj_info = objetivos_info[idx]
+        ataque = _crear_ataque_moral(pueblo, obj_info['objetivo'], moral, velocidades[id(pueblo)],
+                                     tipo_tropa, llegada_ms if hora_llegada else None)
+        tipo_pueblo = pueblo.get('tipo_off')
+        obj_info['ataques_asignados'].append(ataque)
+        obj_info['ataques_necesarios'] -= 1
+        obj_info['asignados_por_tipo'][tipo_pueblo] = obj_info['asignados_por_tipo'].get(tipo_pueblo, 0) + 1
+        pueblos_disponibles.remove(pueblo)
+        pools[tipo_pueblo].remove(entrada)
+        if puntuaciones is not None:
+            usados_por_jugador[pueblo['jugador']] = usados_por_jugador.get(pueblo['jugador'], 0) + 1
+        
+        # Retirar el objetivo de los tipos que ya no acepta
+        for tipo, indices in objetivos_por_tipo.items():
+            if idx in indices and (obj_info['ataques_necesarios'] <= 0 or not _objetivo_acepta(obj_info, tipo)):
+                indices.remove(idx)
+        
+        # Actualizar estadísticas
+        plan['estadisticas_moral']['moral_promedio'] += moral
+        if moral == 100:
+            plan['estadisticas_moral']['ataques_100_moral'] += 1
+        elif moral < 50:
+            plan['estadisticas_moral']['ataques_baja_moral'] += 1
+    
+    # Reparto óptimo: algoritmo húngaro sobre los huecos de cada tanda de prioridad
+    inicio_tanda = 0
+    for fin_tanda in (fin_tandas if optimo else []):
+        huecos = []
+        tipos_huecos = []
+        for idx in range(inicio_tanda, fin_tanda):
+            tipo_requerido = objetivos_info[idx]['tipo_requerido']
+            if isinstance(tipo_requerido, dict) and tipo_requerido.get('tipo') == 'MIXTA':
+                cantidades = [(tipo, tipo_requerido.get(tipo, 0)) for tipo in ('SUPER', 'FULL')]
+            else:
+                cantidades = [(tipo_requerido, max(objetivos_info[idx]['ataques_necesarios'], 0))]
+            for tipo, cantidad in cantidades:
+                huecos.extend([idx] * cantidad)
+                tipos_huecos.extend([tipo] * cantidad)
+        inicio_tanda = fin_tanda
+        
+        libres = sorted(entrada for pool in pools.values() for entrada in pool)
+        if not huecos or not libres:
+            continue
+        permitidas = [
+            [(not tipo or entrada[1].get('tipo_off') == tipo)
+             and (viables is None or viables[entrada[0]][idx])
+             and (not disponibilidad or conectado(entrada[1], idx))
+             for idx, tipo in zip(huecos, tipos_huecos)]
+            for entrada in libres
+        ]
+        parejas = asignacion_optima([puntuaciones[entrada[0]] for entrada in libres], huecos, permitidas)
+        for i, k in parejas:
+            pueblo = libres[i][1]
+            objetivo = objetivos_info[huecos[k]]['objetivo']
+            asignar(libres[i], huecos[k],
+                    calcular_moral(pueblo.get('puntos_jugador', 0), objetivo.get('puntos_defensor', 0)))
+    
+    # Mientras haya pueblos disponibles y objetivos que los acepten
+    while not optimo:
+        # Solo los pools con algún objetivo que los acepte
+        pools_activos = [pool for tipo, pool in pools.items() if pool and objetivos_por_tipo[tipo]]
+        if not pools_activos:
+            # Nada más que asignar en las tandas abiertas: abrir la siguiente
+            if tanda_abierta + 1 >= len(fin_tandas) or not any(pools.values()):
+                break
+            tanda_abierta += 1
+            nuevos = range(abiertos, fin_tandas[tanda_abierta])
+            abiertos = fin_tandas[tanda_abierta]
+            for tipo, indices in objetivos_por_tipo.items():
+                indices.extend(idx for idx in nuevos
+                               if objetivos_info[idx]['ataques_necesarios'] > 0
+                               and _objetivo_acepta(objetivos_info[idx], tipo))
+            continue
         
         # Para cada pueblo disponible, encontrar su MEJOR asignación
-        mejor_asignacion = None
         mejor_moral = -1
         mejor_poblacion = -1
-        mejor_pueblo = None
+        mejor_puntuacion = -math.inf
         mejor_objetivo_idx = None
+        mejor_entrada = None
         
-        for pueblo in pueblos_disponibles:
+        # Recorrer los pools en el orden original de los pueblos
+        for entrada in heapq.merge(*pools_activos):
+            orden, pueblo, poblacion_total = entrada
             puntos_atacante = pueblo.get('puntos_jugador', 0)
             
-            # Calcular población total de este pueblo (si tiene tropas)
-            poblacion_total = pueblo.get('poblacion_ofensiva', 0)
-            if poblacion_total == 0 and 'tropas' in pueblo:
-                # Calcular población desde tropas
-                tropas = pueblo['tropas']
-                poblacion_total = (
-                    tropas.get('hachas', 0) +
-                    tropas.get('ligeras', 0) +
-                    tropas.get('arq_caballo', 0) +
-                    tropas.get('arietes', 0) +
-                    tropas.get('catapultas', 0)
-                )
+            # Con pesos: puntuación de la matriz menos lo que ya lleva asignado el jugador
+            if puntuaciones is not None:
+                fila_puntuaciones = puntuaciones[orden]
+                penalizacion = 0
+                if pesos['balance']:
+                    penalizacion = (pesos['balance'] * usados_por_jugador.get(pueblo['jugador'], 0)
+                                    / pueblos_por_jugador[pueblo['jugador']])
             
-            # Evaluar este pueblo contra todos los objetivos incompletos
-            for idx, obj_info in enumerate(objetivos_info):
-                if obj_info['ataques_necesarios'] <= 0:
-                    continue
-                
-                objetivo = obj_info['objetivo']
-                
-                # Si hay filtro de tipo de OFF, verificar que este pueblo cumpla
-                if tipo_off_por_objetivo:
-                    coord_str = coordenadas_a_string(objetivo['coordenadas'])
-                    tipo_requerido = tipo_off_por_objetivo.get(coord_str)
+            # Evaluar este pueblo solo contra los objetivos que aceptan su tipo
+            for idx in objetivos_por_tipo[pueblo.get('tipo_off')]:
+                if puntuaciones is not None:
+                    puntuacion = fila_puntuaciones[idx] - penalizacion
+                    es_mejor = puntuacion > mejor_puntuacion
+                else:
+                    objetivo = objetivos_info[idx]['objetivo']
+                    puntos_defensor = objetivo.get('puntos_defensor', 0)
                     
-                    # Si se especificó un tipo para este objetivo, filtrar
-                    if tipo_requerido:
-                        tipo_pueblo = pueblo.get('tipo_off')
-                        
-                        # Manejar modo mixto
-                        if isinstance(tipo_requerido, dict) and tipo_requerido.get('tipo') == 'MIXTA':
-                            # Modo mixto: verificar si el pueblo es SUPER o FULL
-                            # y si aún quedan ofensivas de ese tipo por asignar
-                            if tipo_pueblo not in ['SUPER', 'FULL']:
-                                continue
-                            
-                            # Contar cuántas de este tipo ya se han asignado a este objetivo
-                            asignados_este_tipo = sum(1 for ataque in obj_info['ataques_asignados'] 
-                                                     if ataque.get('tipo_off') == tipo_pueblo)
-                            necesarios_este_tipo = tipo_requerido.get(tipo_pueblo, 0)
-                            
-                            if asignados_este_tipo >= necesarios_este_tipo:
-                                continue  # Ya se asignaron suficientes de este tipo
-                        else:
-                            # Modo normal: un solo tipo
-                            if tipo_pueblo != tipo_requerido:
-                                continue  # Este pueblo no es del tipo requerido, saltar
-                
-                puntos_defensor = objetivo.get('puntos_defensor', 0)
-                
-                # Calcular moral para esta combinaci\u00f3n
-                moral = calcular_moral(puntos_atacante, puntos_defensor)
-                
-                # PRIORIDAD ABSOLUTA: MORAL
-                # No hay penalizaci\u00f3n por repetir jugadores en el mismo objetivo
-                # Si un jugador tiene varias ofensivas con buena moral, que vayan todas
-                # Es mejor tener 2 ataques del mismo jugador a 100% moral
-                # que tener 1 ataque a 100% y otro a 66% moral
-                moral_efectiva = moral
-                
-                # Determinar si esta combinación es mejor que la actual
-                es_mejor = False
+                    # Calcular moral para esta combinación
+                    moral = calcular_moral(puntos_atacante, puntos_defensor)
+                    
+                    # PRIORIDAD ABSOLUTA: MORAL
+                    # No hay penalización por repetir jugadores en el mismo objetivo
+                    # Si un jugador tiene varias ofensivas con buena moral, que vayan todas
+                    # Es mejor tener 2 ataques del mismo jugador a 100% moral
+                    # que tener 1 ataque a 100% y otro a 66% moral
+                    moral_efectiva = moral
+                    
+                    # Determinar si esta combinación es mejor que la actual
+                    es_mejor = False
+                    
+                    # Comparar moral con margen de tolerancia
+                    diferencia_moral = moral_efectiva - mejor_moral
+                    
+                    if diferencia_moral > 5:
+                        # Moral significativamente mejor (>5% de diferencia)
+                        es_mejor = True
+                    elif diferencia_moral > 0:
+                        # Moral ligeramente mejor
+                        es_mejor = True
+                    elif abs(diferencia_moral) <= 2 and poblacion_total > mejor_poblacion:
+                        # Moral prácticamente igual (±2%), pero más tropas
+                        es_mejor = True
                 
-                # Comparar moral con margen de tolerancia
-                diferencia_moral = moral_efectiva - mejor_moral
+                # No puede llegar a la ventana fuera del bonus de noche
+                if es_mejor and viables is not None and not viables[orden][idx]:
+                    es_mejor = False
                 
-                if diferencia_moral > 5:
-                    # Moral significativamente mejor (>5% de diferencia)
-                    es_mejor = True
-                elif diferencia_moral > 0:
-                    # Moral ligeramente mejor
-                    es_mejor = True
-                elif abs(diferencia_moral) <= 2 and poblacion_total > mejor_poblacion:
-                    # Moral prácticamente igual (±2%), pero más tropas
-                    es_mejor = True
+                # Jugador desconectado a la hora de envío: combinación descartada
+                if es_mejor and disponibilidad:
+                    es_mejor = conectado(pueblo, idx)
                 
                 if es_mejor:
-                    mejor_moral = moral_efectiva
-                    mejor_poblacion = poblacion_total
-                    mejor_pueblo = pueblo
+                    if puntuaciones is not None:
+                        mejor_puntuacion = puntuacion
+                    else:
+                        mejor_moral = moral_efectiva
+                        mejor_poblacion = poblacion_total
                     mejor_objetivo_idx = idx
-                    
-                    # Calcular datos del ataque
-                    coord_objetivo = objetivo['coordenadas']
-                    distancia = calcular_distancia(pueblo['coordenadas'], coord_objetivo)
-                    tiempo_viaje_mins = calcular_tiempo_viaje(distancia, tipo_tropa, mundo)
-                    
-                    mejor_asignacion = {
-                        'pueblo_atacante': coordenadas_a_string(pueblo['coordenadas']),
-                        'nombre_pueblo': pueblo['nombre'],
-                        'jugador': pueblo['jugador'],
-                        'distancia': round(distancia, 2),
-                        'tiempo_viaje': tiempo_a_string(tiempo_viaje_mins),
-                        'tiempo_viaje_minutos': round(tiempo_viaje_mins, 2),
-                        'moral': moral
-                    }
-                    
-                    # Si hay hora de llegada, calcular hora de envío
-                    if hora_llegada:
-                        hora_envio = hora_llegada - timedelta(minutes=tiempo_viaje_mins)
-                        mejor_asignacion['hora_llegada'] = hora_llegada.strftime('%d/%m/%Y %H:%M:%S')
-                        mejor_asignacion['hora_envio'] = hora_envio.strftime('%d/%m/%Y %H:%M:%S')
-                    
-                    # Preservar información adicional si existe
-                    if 'tipo_off' in pueblo:
-                        mejor_asignacion['tipo_off'] = pueblo['tipo_off']
-                    if 'tropas' in pueblo:
-                        mejor_asignacion['tropas'] = pueblo['tropas']
-                    if 'poblacion_ofensiva' in pueblo:
-                        mejor_asignacion['poblacion_ofensiva'] = pueblo['poblacion_ofensiva']
-                    if 'village_id' in pueblo:
-                        mejor_asignacion['village_id'] = pueblo['village_id']
-                    
-                    # Añadir coordenadas del objetivo
-                    mejor_asignacion['coordenadas_objetivo'] = objetivo['coordenadas']
+                    mejor_entrada = entrada
         
-        # Asignar la mejor combinación encontrada
-        if mejor_asignacion:
-            objetivos_info[mejor_objetivo_idx]['ataques_asignados'].append(mejor_asignacion)
-            objetivos_info[mejor_objetivo_idx]['ataques_necesarios'] -= 1
-            pueblos_disponibles.remove(mejor_pueblo)
-            
-            # Actualizar estadísticas (usar la moral real del ataque, no la penalizada)
-            moral_real = mejor_asignacion['moral']
-            plan['estadisticas_moral']['moral_promedio'] += moral_real
-            if moral_real == 100:
-                plan['estadisticas_moral']['ataques_100_moral'] += 1
-            elif moral_real < 50:
-                plan['estadisticas_moral']['ataques_baja_moral'] += 1
-        else:
+        if mejor_entrada is None:
             break
+        
+        # Asignar la mejor combinación encontrada (con pesos, la moral solo de la elegida)
+        if puntuaciones is not None:
+            objetivo = objetivos_info[mejor_objetivo_idx]['objetivo']
+            mejor_moral = calcular_moral(mejor_entrada[1].get('puntos_jugador', 0), objetivo.get('puntos_defensor', 0))
+        asignar(mejor_entrada, mejor_objetivo_idx, mejor_moral)
     
     # Construir el plan final
     total_ataques = 0
-    for obj_info in objetivos_info:
+    for idx, obj_info in enumerate(objetivos_info):
         objetivo = obj_info['objetivo']
         ataques = obj_info['ataques_asignados']
         
@@ -454,6 +1049,18 @@ def asignar_optimizando_moral(pueblos_atacantes, objetivos, ataques_por_objetivo
         })
         
         total_ataques += len(ataques)
+        anotar_prioridad(plan, objetivo, len(ataques), len(ataques) + max(obj_info['ataques_necesarios'], 0),
+                          politica_prioridad)
+        
+        if disponibilidad:
+            _anotar_descartes(plan, objetivo['coordenadas'], descartes_por_objetivo.get(idx, 0),
+                              len(ataques), len(ataques) + obj_info['ataques_necesarios'])
+    
+    if ventana:
+        aplicar_ventana_llegada(plan, ventana[0], ventana[1], hora_actual, bonus_noche=True, disponibilidad=disponibilidad)
+        plan['ventana_llegada']['pares_descartados'] = fuera_de_ventana
+    elif hora_llegada:
+        formatear_horas_plan(plan, '%d/%m/%Y')
     
     # Calcular moral promedio
     if total_ataques > 0:
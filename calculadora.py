@@ -4,7 +4,14 @@ Incluye funciones para calcular distancias, tiempos de viaje, moral, etc.
 """
 
 import math
-from config_mundos import obtener_velocidad_tropa, obtener_config
+from datetime import datetime, timedelta
+from config_mundos import obtener_velocidad_tropa, obtener_config, obtener_tabla_velocidades, TROPAS_A_UNIDAD
+
+# NumPy es opcional: si está instalado, las funciones por lotes lo usan
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Velocidades de tropas en minutos por campo (configuración estándar)
 # DEPRECATED: Usar obtener_velocidad_tropa() de config_mundos
@@ -40,6 +47,25 @@ def calcular_distancia(coord1, coord2):
     return math.sqrt((x2 - x1)**2 + (y2 - y1)**2)
 
 
+def calcular_distancia_cuadrada(coord1, coord2):
+    """
+    Calcula el cuadrado de la distancia entre dos coordenadas.
+    
+    Con coordenadas enteras es un entero exacto y conserva el orden de
+    calcular_distancia, así que sirve para comparar candidatos sin raíz.
+    
+    Args:
+        coord1: tupla (x, y) de la primera coordenada
+        coord2: tupla (x, y) de la segunda coordenada
+    
+    Returns:
+        int: distancia al cuadrado
+    """
+    dx = coord2[0] - coord1[0]
+    dy = coord2[1] - coord1[1]
+    return dx * dx + dy * dy
+
+
 def calcular_tiempo_viaje(distancia, tipo_tropa='noble', mundo='es95'):
     """
     Calcula el tiempo de viaje de una tropa.
@@ -84,6 +110,170 @@ def calcular_moral(puntos_atacante, puntos_defensor):
     return int(moral_decimal * 100)
 
 
+def _separar_coordenadas(coordenadas):
+    """
+    Separa una secuencia de coordenadas en listas de X e Y.
+    
+    Args:
+        coordenadas: secuencia de tuplas (x, y) o array (n, 2)
+    
+    Returns:
+        tuple: (lista_x, lista_y)
+    """
+    xs = [c[0] for c in coordenadas]
+    ys = [c[1] for c in coordenadas]
+    return xs, ys
+
+
+def calcular_distancias(origen, destinos):
+    """
+    Calcula la distancia de una coordenada a muchas otras.
+    
+    Args:
+        origen: tupla (x, y)
+        destinos: secuencia de tuplas (x, y) o array (n, 2)
+    
+    Returns:
+        array (NumPy) o list: distancias en campos, en el orden de destinos
+    """
+    x0, y0 = origen
+    
+    if np is not None:
+        destinos = np.asarray(destinos, dtype=np.int64).reshape(-1, 2)
+        dx = destinos[:, 0] - x0
+        dy = destinos[:, 1] - y0
+        return np.sqrt(dx * dx + dy * dy)
+    
+    sqrt = math.sqrt
+    return [sqrt((x - x0)**2 + (y - y0)**2) for x, y in destinos]
+
+
+def matriz_distancias(origenes, destinos):
+    """
+    Calcula todas las distancias entre dos conjuntos de coordenadas.
+    
+    Args:
+        origenes: secuencia de tuplas (x, y) o array (n, 2)
+        destinos: secuencia de tuplas (x, y) o array (m, 2)
+    
+    Returns:
+        array (NumPy, forma n x m) o list de listas: distancia[i][j] de origenes[i] a destinos[j]
+    """
+    if np is not None:
+        origenes = np.asarray(origenes, dtype=np.int64).reshape(-1, 2)
+        destinos = np.asarray(destinos, dtype=np.int64).reshape(-1, 2)
+        dx = origenes[:, 0, None] - destinos[None, :, 0]
+        dy = origenes[:, 1, None] - destinos[None, :, 1]
+        return np.sqrt(dx * dx + dy * dy)
+    
+    destinos_x, destinos_y = _separar_coordenadas(destinos)
+    sqrt = math.sqrt
+    return [
+        [sqrt((xd - xo)**2 + (yd - yo)**2) for xd, yd in zip(destinos_x, destinos_y)]
+        for xo, yo in origenes
+    ]
+
+
+def calcular_tiempos_viaje(distancias, tipo_tropa='noble', mundo='es95'):
+    """
+    Calcula el tiempo de viaje de muchas distancias con la misma tropa.
+    
+    La velocidad se consulta una sola vez para todo el lote.
+    
+    Args:
+        distancias: secuencia o array de distancias (admite matrices de NumPy)
+        tipo_tropa: tipo de tropa (por defecto 'noble')
+        mundo: identificador del mundo (por defecto 'es95')
+    
+    Returns:
+        array (NumPy) o list: tiempos en minutos
+    """
+    velocidad = obtener_velocidad_tropa(tipo_tropa, mundo)
+    
+    if np is not None:
+        return np.asarray(distancias, dtype=np.float64) * velocidad
+    
+    return [distancia * velocidad for distancia in distancias]
+
+
+def unidades_mas_lentas(pueblos, mundo=None, por_defecto='noble'):
+    """
+    Determina la unidad más lenta de cada pueblo según sus 'tropas'.
+    
+    Si el pueblo lleva nobles, manda el noble (es la unidad más lenta).
+    Los pueblos sin tropas conocidas usan por_defecto.
+    
+    Args:
+        pueblos: lista de pueblos (con 'tropas' opcional)
+        mundo: identificador del mundo (None = mundo seleccionado)
+        por_defecto: unidad para pueblos sin tropas
+    
+    Returns:
+        list: nombre de la unidad más lenta de cada pueblo, en el mismo orden
+    """
+    tabla = obtener_tabla_velocidades(mundo)
+    claves = list(TROPAS_A_UNIDAD)
+    unidades = [TROPAS_A_UNIDAD[clave] for clave in claves]
+    velocidades = [tabla[unidad] for unidad in unidades]
+    
+    if np is not None and pueblos:
+        # Matriz pueblos x unidades con la velocidad de las unidades presentes
+        cantidades = np.array(
+            [[pueblo.get('tropas', {}).get(clave, 0) or 0 for clave in claves] for pueblo in pueblos],
+            dtype=np.float64
+        )
+        segundos = np.where(cantidades > 0, np.array(velocidades), 0.0)
+        lentas = segundos.argmax(axis=1)
+        presentes = segundos.max(axis=1) > 0
+        return [unidades[i] if presente else por_defecto for i, presente in zip(lentas.tolist(), presentes.tolist())]
+    
+    resultado = []
+    for pueblo in pueblos:
+        tropas = pueblo.get('tropas', {})
+        unidad_lenta = por_defecto
+        mas_lenta = 0
+        for clave, unidad, velocidad in zip(claves, unidades, velocidades):
+            if tropas.get(clave, 0) and velocidad > mas_lenta:
+                mas_lenta = velocidad
+                unidad_lenta = unidad
+        resultado.append(unidad_lenta)
+    return resultado
+
+
+def calcular_morales(puntos_atacantes, puntos_defensores):
+    """
+    Calcula la moral de muchos pares atacante/defensor con la misma fórmula que calcular_moral().
+    
+    Con NumPy se aplica broadcasting: por ejemplo, puntos_atacantes de forma
+    (n, 1) y puntos_defensores de forma (m,) dan la matriz de moral n x m.
+    Sin NumPy, cualquiera de los dos puede ser un número suelto.
+    
+    Args:
+        puntos_atacantes: puntos de los atacantes (secuencia, array o número)
+        puntos_defensores: puntos de los defensores (secuencia, array o número)
+    
+    Returns:
+        array (NumPy, enteros) o list: moral entre 30 y 100
+    """
+    if np is not None:
+        atacantes = np.asarray(puntos_atacantes, dtype=np.float64)
+        defensores = np.asarray(puntos_defensores, dtype=np.float64)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = defensores / atacantes
+            moral = np.minimum(ratio * 3 + 0.3, 1.0) * 100
+        
+        sin_datos = (atacantes == 0) | (defensores == 0)
+        return np.where(sin_datos, 100, np.trunc(np.nan_to_num(moral))).astype(np.int64)
+    
+    if not isinstance(puntos_atacantes, (list, tuple)):
+        puntos_atacantes = [puntos_atacantes] * len(puntos_defensores)
+    elif not isinstance(puntos_defensores, (list, tuple)):
+        puntos_defensores = [puntos_defensores] * len(puntos_atacantes)
+    
+    return [calcular_moral(atacante, defensor) for atacante, defensor in zip(puntos_atacantes, puntos_defensores)]
+
+
 def tiempo_a_string(minutos):
     """
     Convierte minutos a formato legible (hh:mm:ss).
@@ -100,6 +290,188 @@ def tiempo_a_string(minutos):
     return f"{horas:02d}:{mins:02d}:{segs:02d}"
 
 
+# Horas de envío/llegada: enteros en milisegundos desde esta época (hora del servidor)
+EPOCA_MS = datetime(1970, 1, 1)
+MS_POR_DIA = 86400000
+
+
+def datetime_a_ms(fecha):
+    """
+    Convierte un datetime a milisegundos enteros desde EPOCA_MS.
+    
+    Args:
+        fecha: datetime sin zona horaria (hora del servidor)
+    
+    Returns:
+        int: milisegundos
+    """
+    return (fecha - EPOCA_MS) // timedelta(milliseconds=1)
+
+
+def ms_a_datetime(ms):
+    """
+    Convierte milisegundos desde EPOCA_MS a datetime.
+    
+    Args:
+        ms: milisegundos enteros
+    
+    Returns:
+        datetime: fecha y hora
+    """
+    return EPOCA_MS + timedelta(milliseconds=ms)
+
+
+def tramos_sin_bonus_noche(inicio_ms, fin_ms, horas_noche):
+    """
+    Parte una ventana de llegada quitando las horas del bonus de noche.
+    
+    Args:
+        inicio_ms: inicio de la ventana en milisegundos
+        fin_ms: fin de la ventana en milisegundos
+        horas_noche: (hora_inicio, hora_fin) del bonus o None (puede pasar de
+                     medianoche, p. ej. (23, 7))
+    
+    Returns:
+        list: tramos (inicio_ms, fin_ms) de la ventana fuera del bonus, en orden
+    """
+    if not horas_noche:
+        return [(inicio_ms, fin_ms)]
+    
+    hora_inicio, hora_fin = horas_noche
+    duracion = ((hora_fin - hora_inicio) % 24) * 3600000
+    if duracion == 0:
+        return [(inicio_ms, fin_ms)]
+    
+    tramos = []
+    desde = inicio_ms
+    # Noches que pueden tocar la ventana (empiezan como mucho un día antes)
+    dia = inicio_ms // MS_POR_DIA - 1
+    while desde <= fin_ms:
+        noche_inicio = dia * MS_POR_DIA + hora_inicio * 3600000
+        noche_fin = noche_inicio + duracion
+        dia += 1
+        if noche_fin <= desde:
+            continue
+        if noche_inicio > desde:
+            tramos.append((desde, min(noche_inicio - 1, fin_ms)))
+        desde = noche_fin
+    return tramos
+
+
+def mascara_llegada_posible(tiempos_viaje_ms, tramos, ahora_ms=None):
+    """
+    Indica qué ataques pueden llegar dentro de algún tramo si se envían ya.
+    
+    Un ataque es posible si, saliendo no antes de ahora_ms, llega como
+    tarde al final del último tramo. Sin ahora_ms basta con que haya tramos.
+    
+    Args:
+        tiempos_viaje_ms: secuencia o array de tiempos de viaje (admite matrices de NumPy)
+        tramos: tramos de llegada (de tramos_sin_bonus_noche)
+        ahora_ms: (opcional) primera hora de envío posible
+    
+    Returns:
+        array (NumPy) o list: True donde el ataque puede llegar a tiempo
+    """
+    if not tramos:
+        limite = -math.inf
+    elif ahora_ms is None:
+        limite = math.inf
+    else:
+        limite = tramos[-1][1] - ahora_ms
+    
+    if np is not None:
+        return np.asarray(tiempos_viaje_ms) <= limite
+    
+    return [tiempo <= limite for tiempo in tiempos_viaje_ms]
+
+
+def colocar_llegada(tramos, tiempo_viaje_ms, objetivo_ms, ahora_ms=None):
+    """
+    Mejor llegada de un ataque dentro de los tramos de la ventana.
+    
+    Se elige el punto más cercano a objetivo_ms (el centro de la ventana)
+    entre los que se pueden alcanzar saliendo no antes de ahora_ms.
+    
+    Args:
+        tramos: tramos de llegada (de tramos_sin_bonus_noche)
+        tiempo_viaje_ms: tiempo de viaje del ataque
+        objetivo_ms: llegada preferida
+        ahora_ms: (opcional) primera hora de envío posible
+    
+    Returns:
+        tuple: (inicio_tramo, fin_tramo, llegada) con el tramo ya recortado a lo
+               alcanzable, o None si no llega a ningún tramo
+    """
+    primera = -math.inf if ahora_ms is None else ahora_ms + tiempo_viaje_ms
+    mejor = None
+    for inicio, fin in tramos:
+        if fin < primera:
+            continue
+        inicio = max(inicio, primera)
+        llegada = min(max(objetivo_ms, inicio), fin)
+        if mejor is None or abs(llegada - objetivo_ms) < abs(mejor[2] - objetivo_ms):
+            mejor = (inicio, fin, llegada)
+    return mejor
+
+
+class FormateadorHoras:
+    """
+    Formatea horas en milisegundos como "fecha hh:mm:ss:mmm".
+    
+    El prefijo de fecha se calcula una vez por día y se reutiliza; la hora se
+    obtiene con aritmética entera, sin crear un datetime por ataque.
+    """
+    
+    def __init__(self, formato_fecha='%d/%m/%Y', con_ms=True):
+        """
+        Args:
+            formato_fecha: formato strftime de la parte de fecha
+            con_ms: añadir ":mmm" con los milisegundos
+        """
+        self.formato_fecha = formato_fecha
+        self.con_ms = con_ms
+        self._prefijos = {}
+    
+    def _prefijo(self, dia):
+        prefijo = self._prefijos.get(dia)
+        if prefijo is None:
+            prefijo = (EPOCA_MS + timedelta(days=dia)).strftime(self.formato_fecha)
+            self._prefijos[dia] = prefijo
+        return prefijo
+    
+    def formatear(self, ms):
+        """
+        Formatea una hora en milisegundos.
+        
+        Args:
+            ms: milisegundos desde EPOCA_MS
+        
+        Returns:
+            str: hora formateada
+        """
+        dia, resto = divmod(ms, MS_POR_DIA)
+        horas, resto = divmod(resto, 3600000)
+        minutos, resto = divmod(resto, 60000)
+        segundos, milis = divmod(resto, 1000)
+        if self.con_ms:
+            return f"{self._prefijo(dia)} {horas:02d}:{minutos:02d}:{segundos:02d}:{milis:03d}"
+        return f"{self._prefijo(dia)} {horas:02d}:{minutos:02d}:{segundos:02d}"
+    
+    def formatear_lote(self, valores):
+        """
+        Formatea una lista de horas en milisegundos.
+        
+        Args:
+            valores: iterable de milisegundos
+        
+        Returns:
+            list: horas formateadas
+        """
+        formatear = self.formatear
+        return [formatear(ms) for ms in valores]
+
+
 def parse_coordenadas(coord_str):
     """
     Convierte una cadena de coordenadas a tupla.
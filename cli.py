@@ -0,0 +1,486 @@
+"""
+Organizador de Ofensivas - Guerras Tribales (modo sin menús)
+Genera un plan de ataque y sus exportaciones desde argumentos o un archivo
+de configuración, para usarlo en cron o en scripts.
+
+Ejemplo:
+    python cli.py --csv ofensivas.csv --objetivos data/objetivos.txt \\
+        --categoria Nobles --metodo moral --tropa auto \\
+        --ventana "02:00:00 16/11/2025" "06:00:00 16/11/2025" \\
+        --exportar texto bbcode jugadores --salida planes/noche
+
+Los módulos del planificador se importan solo después de leer los
+argumentos, así que `python cli.py --help` arranca al instante.
+"""
+
+import argparse
+import json
+import sys
+
+METODOS = ('distancia', 'balanceado', 'sincronizado', 'moral', 'trenes', 'oleadas')
+TIPOS_OFF = ('SUPER', 'FULL', '3/4', 'MEDIA')
+FORMATOS_EXPORTACION = ('texto', 'coordenadas', 'bbcode', 'json', 'binario', 'jugadores', 'bbcode_partes')
+
+# Valores por defecto (se aplican después del archivo de configuración)
+VALORES_POR_DEFECTO = {
+    'objetivos': 'data/objetivos.txt',
+    'categoria': [],
+    'metodo': 'moral',
+    'tropa': 'noble',
+    'ataques': 5,
+    'mundo': 'es95',
+    'exportar': ['texto'],
+    'salida': 'plan_ataque',
+    'prioridad': 'estricta',
+    'optimo': False,
+    'formato_jugador': 'bbcode',
+    'sin_api': False,
+    'silencioso': False
+}
+
+
+def crear_parser():
+    """Crea el parser de argumentos (sin importar nada del planificador)"""
+    parser = argparse.ArgumentParser(
+        prog='cli.py',
+        description='Genera un plan de ataque de Guerras Tribales sin menús interactivos.',
+        epilog='Las opciones de la línea de comandos tienen prioridad sobre --config.'
+    )
+    parser.add_argument('--config', metavar='ARCHIVO',
+                        help='archivo JSON con las opciones (mismos nombres, con _ en lugar de -)')
+    parser.add_argument('--csv', metavar='ARCHIVO', help='CSV de ofensivas exportado del juego')
+    parser.add_argument('--objetivos', metavar='ARCHIVO', help='archivo de objetivos (por defecto data/objetivos.txt)')
+    parser.add_argument('--categoria', action='append', metavar='NOMBRE',
+                        help='categoría de objetivos a usar (repetible; por defecto todas)')
+    parser.add_argument('--filtro', choices=TIPOS_OFF, help='usar solo ofensivas de este tipo')
+    parser.add_argument('--tipo-off', dest='tipo_off', choices=TIPOS_OFF,
+                        help='tipo de OFF exigido en todos los objetivos (método moral)')
+    parser.add_argument('--mixta', nargs=2, type=int, metavar=('SUPER', 'FULL'),
+                        help='composición mixta por objetivo (método moral)')
+    parser.add_argument('--metodo', choices=METODOS, help='método de asignación (por defecto moral)')
+    parser.add_argument('--prioridad', choices=('estricta', 'ponderada'),
+                        help='reparto entre prioridades de objetivos cuando faltan ofensivas (por defecto estricta)')
+    parser.add_argument('--pesos', metavar='"moral=1,tiempo=0.5"',
+                        help='puntuación ponderada (método moral): moral, tiempo, poblacion, tipo_off, balance')
+    parser.add_argument('--optimo', action='store_true', default=None,
+                        help='reparto óptimo con el algoritmo húngaro (método moral; pesos por defecto si no hay --pesos)')
+    parser.add_argument('--tropa', metavar='TIPO', help="tipo de tropa para los tiempos o 'auto' (por defecto noble)")
+    parser.add_argument('--ataques', type=int, metavar='N', help='ataques por objetivo (por defecto 5)')
+    parser.add_argument('--mundo', metavar='ID', help='mundo (por defecto es95)')
+    parser.add_argument('--llegada', metavar='"YYYY-MM-DD HH:MM:SS"', help='hora de llegada (métodos sincronizado, trenes y moral; primera oleada en oleadas)')
+    parser.add_argument('--ventana', nargs=2, metavar=('INICIO', 'FIN'),
+                        help='ventana de llegada "HH:MM:SS DD/MM/YYYY" (método moral)')
+    parser.add_argument('--desde', metavar='"YYYY-MM-DD HH:MM:SS"',
+                        help='primera hora de envío posible con --ventana o --metodo oleadas (por defecto, ahora)')
+    parser.add_argument('--regiones', choices=('distancia', 'categoria', 'continente'),
+                        help='dividir en regiones independientes y resolverlas en paralelo')
+    parser.add_argument('--alcance', type=float, metavar='CAMPOS',
+                        help='alcance para --regiones (por defecto, distancia máxima de nobles del mundo)')
+    parser.add_argument('--procesos', type=int, metavar='N', help='procesos para --regiones (por defecto, núcleos)')
+    parser.add_argument('--optimizar', type=float, metavar='SEGUNDOS',
+                        help='mejorar el plan con búsqueda local durante SEGUNDOS (swap/relocate)')
+    parser.add_argument('--nobles', metavar='ARCHIVO',
+                        help='pueblos con nobles para --metodo trenes (x|y|nombre|jugador|puntos|nobles)')
+    parser.add_argument('--nobles-por-tren', dest='nobles_por_tren', type=int, metavar='N',
+                        help='nobles por objetivo en --metodo trenes (por defecto 4)')
+    parser.add_argument('--limpiezas', type=int, metavar='N',
+                        help='ataques de limpieza antes de los nobles (por defecto 1)')
+    parser.add_argument('--separacion-tren', dest='separacion_tren', type=int, metavar='MS',
+                        help='milisegundos entre llegadas de un tren (por defecto 100)')
+    parser.add_argument('--oleadas', type=int, metavar='N',
+                        help='oleadas en --metodo oleadas (por defecto 3)')
+    parser.add_argument('--horas-oleadas', dest='horas_oleadas', type=float, metavar='HORAS',
+                        help='horas entre las llegadas de dos oleadas (por defecto 24)')
+    parser.add_argument('--disponibilidad', metavar='ARCHIVO',
+                        help='horarios de conexión de los jugadores ("Jugador: 07:00-01:00" por línea)')
+    parser.add_argument('--separacion', type=float, metavar='SEGUNDOS',
+                        help='separación mínima entre envíos de un mismo jugador (sincronizado o --ventana)')
+    parser.add_argument('--margen', type=float, metavar='SEGUNDOS',
+                        help='retraso de llegada permitido al repartir envíos sin --ventana (por defecto 0)')
+    parser.add_argument('--fakes', type=int, metavar='N',
+                        help='añadir N fakes por objetivo, con llegadas en la ventana del plan real')
+    parser.add_argument('--objetivos-fakes', dest='objetivos_fakes', metavar='ARCHIVO',
+                        help='objetivos de los fakes (por defecto, los del plan)')
+    parser.add_argument('--limite-fakes', dest='limite_fakes', type=int, metavar='N',
+                        help='fakes máximos por pueblo (por defecto 5)')
+    parser.add_argument('--pueblos-fakes', dest='pueblos_fakes', metavar='ARCHIVO',
+                        help='pueblos que envían fakes (x|y|nombre|jugador|puntos; por defecto, todos los '
+                             'pueblos de los jugadores del CSV según la API)')
+    parser.add_argument('--exportar', nargs='+', choices=FORMATOS_EXPORTACION, metavar='FORMATO',
+                        help=f"formatos a generar: {', '.join(FORMATOS_EXPORTACION)} (por defecto texto)")
+    parser.add_argument('--salida', metavar='PREFIJO', help='ruta base de los archivos generados')
+    parser.add_argument('--formato-jugador', dest='formato_jugador', choices=('texto', 'bbcode', 'envios'),
+                        help='formato de las órdenes por jugador')
+    parser.add_argument('--limite', type=int, metavar='BYTES', help='tamaño máximo de cada parte BBCode')
+    parser.add_argument('--sin-api', dest='sin_api', action='store_true', default=None,
+                        help='no consultar la API del juego (puntos y moral quedan en 0)')
+    parser.add_argument('--silencioso', action='store_true', default=None, help='no mostrar el resumen del plan')
+    return parser
+
+
+def _validar_config(parser, config, archivo):
+    """
+    Convierte y comprueba los valores de --config como si vinieran de la línea de comandos.
+    
+    Aplica el mismo 'type' y 'choices' que cada opción del parser; las opciones
+    con varios valores esperan una lista y los interruptores, true o false.
+    
+    Args:
+        parser: parser de crear_parser
+        config: dict leído del JSON
+        archivo: ruta del JSON (para los mensajes)
+    
+    Returns:
+        dict: valores convertidos
+    """
+    def convertir(accion, valor):
+        if accion.type is not None and isinstance(valor, str):
+            try:
+                valor = accion.type(valor)
+            except (TypeError, ValueError):
+                parser.error(f"{archivo}: valor no válido para {accion.dest}: {valor!r}")
+        elif accion.type in (int, float):
+            if isinstance(valor, bool) or not isinstance(valor, (int, float)) or (
+                    accion.type is int and valor != int(valor)):
+                parser.error(f"{archivo}: {accion.dest} debe ser un número")
+            valor = accion.type(valor)
+        elif accion.type is None and not isinstance(valor, str):
+            parser.error(f"{archivo}: {accion.dest} debe ser texto")
+        if accion.choices is not None and valor not in accion.choices:
+            parser.error(f"{archivo}: {accion.dest} debe ser uno de: {', '.join(map(str, accion.choices))}")
+        return valor
+    
+    validado = {}
+    for accion in parser._actions:
+        if accion.dest not in config or config[accion.dest] is None:
+            continue
+        valor = config[accion.dest]
+        if accion.nargs == 0:
+            # Interruptores (store_true)
+            if not isinstance(valor, bool):
+                parser.error(f"{archivo}: {accion.dest} debe ser true o false")
+        elif accion.nargs is not None or isinstance(accion, argparse._AppendAction):
+            if not isinstance(valor, list):
+                parser.error(f"{archivo}: {accion.dest} debe ser una lista")
+            if isinstance(accion.nargs, int) and len(valor) != accion.nargs:
+                parser.error(f"{archivo}: {accion.dest} necesita {accion.nargs} valores")
+            if accion.nargs == '+' and not valor:
+                parser.error(f"{archivo}: {accion.dest} necesita al menos un valor")
+            valor = [convertir(accion, elemento) for elemento in valor]
+        else:
+            valor = convertir(accion, valor)
+        validado[accion.dest] = valor
+    return validado
+
+
+def cargar_opciones(argv=None):
+    """
+    Lee los argumentos y los combina con el archivo de configuración.
+    
+    Args:
+        argv: lista de argumentos (None = sys.argv)
+    
+    Returns:
+        argparse.Namespace: opciones finales
+    """
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    
+    config = {}
+    if args.config:
+        try:
+            with open(args.config, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            parser.error(f"no se pudo leer {args.config}: {e}")
+        if not isinstance(config, dict):
+            parser.error(f"{args.config} debe contener un objeto JSON")
+        desconocidas = set(config) - set(vars(args))
+        if desconocidas:
+            parser.error(f"opciones desconocidas en {args.config}: {', '.join(sorted(desconocidas))}")
+        config = _validar_config(parser, config, args.config)
+    
+    for clave, valor in vars(args).items():
+        if valor is None:
+            valor = config.get(clave, VALORES_POR_DEFECTO.get(clave))
+            setattr(args, clave, valor)
+    
+    if not args.csv:
+        parser.error('falta --csv (o "csv" en --config)')
+    if args.metodo in ('sincronizado', 'trenes', 'oleadas') and not args.llegada:
+        parser.error(f'el método {args.metodo} necesita --llegada')
+    if args.llegada and args.metodo in ('distancia', 'balanceado'):
+        parser.error(f'el método {args.metodo} no admite --llegada')
+    if args.llegada and args.ventana:
+        parser.error('--llegada y --ventana no se usan juntas (con ventana, la llegada es su centro)')
+    if args.metodo in ('trenes', 'oleadas') and (args.regiones or args.disponibilidad or args.optimizar or args.separacion):
+        parser.error(f'el método {args.metodo} no admite --regiones, --disponibilidad, --optimizar ni --separacion')
+    if (args.oleadas or args.horas_oleadas) and args.metodo != 'oleadas':
+        parser.error('--oleadas y --horas-oleadas solo se usan con el método oleadas')
+    if (args.pesos or args.optimo) and args.metodo != 'moral':
+        parser.error('--pesos y --optimo solo se usan con el método moral')
+    if args.pesos:
+        from puntuacion import leer_pesos
+        try:
+            args.pesos = leer_pesos(args.pesos)
+        except ValueError as e:
+            parser.error(f'--pesos: {e}')
+        if args.optimo and args.pesos['balance']:
+            parser.error('--optimo no admite el peso balance (depende del orden del reparto voraz)')
+    if args.ventana and args.metodo != 'moral':
+        parser.error('--ventana solo se usa con el método moral')
+    if args.desde and not (args.ventana or args.metodo == 'oleadas'):
+        parser.error('--desde solo se usa con --ventana o el método oleadas')
+    if args.disponibilidad and not (args.metodo in ('sincronizado', 'moral') and (args.llegada or args.ventana)):
+        parser.error('--disponibilidad necesita horas de envío (--llegada o --ventana)')
+    if (args.objetivos_fakes or args.limite_fakes or args.pueblos_fakes) and not args.fakes:
+        parser.error('--objetivos-fakes, --limite-fakes y --pueblos-fakes necesitan --fakes')
+    return args
+
+
+def cargar_objetivos(args):
+    """
+    Carga los objetivos del archivo (por categorías si las hay).
+    
+    Returns:
+        tuple: (objetivos, grupos) con grupos = índices de objetivos de cada categoría
+    """
+    from importador import leer_categorias_objetivos, leer_objetivos_por_categoria, leer_objetivos_desde_archivo
+    
+    usar_api = not args.sin_api
+    categorias = args.categoria or list(leer_categorias_objetivos(args.objetivos))
+    if not categorias:
+        return leer_objetivos_desde_archivo(args.objetivos, mundo=args.mundo, usar_api=usar_api), []
+    
+    objetivos = []
+    grupos = []
+    for categoria in categorias:
+        de_categoria = leer_objetivos_por_categoria(args.objetivos, categoria, mundo=args.mundo, usar_api=usar_api)
+        grupos.append(list(range(len(objetivos), len(objetivos) + len(de_categoria))))
+        objetivos.extend(de_categoria)
+    return objetivos, grupos
+
+
+def generar_plan(args, pueblos, objetivos, grupos=None, disponibilidad=None):
+    """Genera el plan con el método elegido (por regiones si se pidió --regiones)"""
+    from datetime import datetime
+    from asignador import (
+        asignar_ataques_por_distancia,
+        asignar_con_sincronizacion,
+        balancear_por_jugador,
+        asignar_optimizando_moral
+    )
+    
+    if args.metodo == 'trenes':
+        from trenes import planificar_trenes, SEPARACION_TREN_MS
+        from importador import leer_pueblos_desde_archivo
+        pueblos_nobles = leer_pueblos_desde_archivo(args.nobles) if args.nobles else None
+        return planificar_trenes(
+            pueblos, objetivos, datetime.strptime(args.llegada, '%Y-%m-%d %H:%M:%S'), pueblos_nobles,
+            args.nobles_por_tren or 4, args.limpiezas or 1,
+            SEPARACION_TREN_MS if args.separacion_tren is None else args.separacion_tren, args.mundo, args.prioridad
+        )
+    
+    if args.metodo == 'oleadas':
+        from oleadas import planificar_oleadas, HORAS_ENTRE_OLEADAS
+        return planificar_oleadas(
+            pueblos, objetivos, datetime.strptime(args.llegada, '%Y-%m-%d %H:%M:%S'), args.oleadas or 3,
+            args.horas_oleadas or HORAS_ENTRE_OLEADAS, args.ataques, args.mundo, args.tropa,
+            datetime.strptime(args.desde, '%Y-%m-%d %H:%M:%S') if args.desde else datetime.now(), args.prioridad
+        )
+    
+    if args.regiones and args.metodo != 'moral':
+        from planificador_paralelo import planificar_en_paralelo
+        hora_llegada = datetime.strptime(args.llegada, '%Y-%m-%d %H:%M:%S') if args.llegada else None
+        return planificar_en_paralelo(
+            pueblos, objetivos, args.metodo, args.regiones, args.alcance, grupos, args.procesos,
+            mundo=args.mundo, tipo_tropa=args.tropa, ataques_por_objetivo=args.ataques, hora_llegada=hora_llegada,
+            disponibilidad=disponibilidad, politica_prioridad=args.prioridad
+        )
+    
+    if args.metodo == 'distancia':
+        return asignar_ataques_por_distancia(pueblos, objetivos, args.ataques, args.mundo, args.tropa,
+                                             politica_prioridad=args.prioridad)
+    if args.metodo == 'balanceado':
+        return balancear_por_jugador(pueblos, objetivos, args.ataques, args.mundo, args.tropa,
+                                     politica_prioridad=args.prioridad)
+    if args.metodo == 'sincronizado':
+        hora_llegada = datetime.strptime(args.llegada, '%Y-%m-%d %H:%M:%S')
+        return asignar_con_sincronizacion(pueblos, objetivos, hora_llegada, args.ataques, args.mundo, args.tropa,
+                                          disponibilidad, args.prioridad)
+    
+    # Método moral: mismo número de ataques y tipo de OFF para todos los objetivos
+    ataques_por_objetivo = {}
+    tipo_off_por_objetivo = {}
+    for objetivo in objetivos:
+        coord_str = f"{objetivo['coordenadas'][0]}|{objetivo['coordenadas'][1]}"
+        if args.mixta:
+            num_super, num_full = args.mixta
+            ataques_por_objetivo[coord_str] = num_super + num_full
+            tipo_off_por_objetivo[coord_str] = {'tipo': 'MIXTA', 'SUPER': num_super, 'FULL': num_full}
+        else:
+            ataques_por_objetivo[coord_str] = args.ataques
+            tipo_off_por_objetivo[coord_str] = args.tipo_off
+    
+    ventana = None
+    if args.ventana:
+        hora_inicio = datetime.strptime(args.ventana[0], '%H:%M:%S %d/%m/%Y')
+        hora_fin = datetime.strptime(args.ventana[1], '%H:%M:%S %d/%m/%Y')
+        if hora_fin <= hora_inicio:
+            raise ValueError('la hora de fin de la ventana debe ser posterior a la de inicio')
+        ventana = (hora_inicio, hora_fin)
+    hora_actual = datetime.strptime(args.desde, '%Y-%m-%d %H:%M:%S') if args.desde else datetime.now()
+    hora_llegada = datetime.strptime(args.llegada, '%Y-%m-%d %H:%M:%S') if args.llegada else None
+    
+    filtro_tipo = tipo_off_por_objetivo if (args.mixta or args.tipo_off) else None
+    if args.regiones:
+        from planificador_paralelo import planificar_en_paralelo
+        plan = planificar_en_paralelo(
+            pueblos, objetivos, 'moral', args.regiones, args.alcance, grupos, args.procesos,
+            mundo=args.mundo, tipo_tropa=args.tropa, ataques_por_objetivo=ataques_por_objetivo,
+            hora_llegada=hora_llegada, tipo_off_por_objetivo=filtro_tipo, disponibilidad=disponibilidad, ventana=ventana, hora_actual=hora_actual,
+            politica_prioridad=args.prioridad, pesos=args.pesos, optimo=args.optimo
+        )
+    else:
+        plan = asignar_optimizando_moral(pueblos, objetivos, ataques_por_objetivo, args.mundo, args.tropa,
+                                         hora_llegada, filtro_tipo, disponibilidad, ventana, hora_actual, args.prioridad,
+                                         args.pesos, args.optimo)
+    return plan
+
+
+def anadir_fakes(args, plan, pueblos, objetivos):
+    """Planifica los fakes (--fakes) y los mezcla con el plan real"""
+    from fakes import planificar_fakes, anadir_fakes_al_plan, pueblos_para_fakes, FAKES_POR_PUEBLO
+    from importador import leer_pueblos_desde_archivo, leer_objetivos_desde_archivo
+    
+    if args.pueblos_fakes:
+        pueblos_fakes = leer_pueblos_desde_archivo(args.pueblos_fakes)
+    else:
+        pueblos_fakes = pueblos_para_fakes(pueblos, args.mundo, usar_api=not args.sin_api)
+    if args.objetivos_fakes:
+        objetivos_fakes = leer_objetivos_desde_archivo(args.objetivos_fakes, mundo=args.mundo, usar_api=not args.sin_api)
+    else:
+        objetivos_fakes = objetivos
+    
+    plan_fakes = planificar_fakes(pueblos_fakes, objetivos_fakes, args.fakes, args.limite_fakes or FAKES_POR_PUEBLO,
+                                  mundo=args.mundo, plan_real=plan)
+    anadir_fakes_al_plan(plan, plan_fakes)
+
+
+def exportar(args, plan):
+    """
+    Genera los formatos pedidos.
+    
+    Texto, coordenadas y BBCode (y el resumen) se escriben en un solo
+    recorrido del plan.
+    
+    Returns:
+        list: rutas generadas
+    """
+    import os
+    from exportador import (
+        SalidaTexto, SalidaCoordenadas, SalidaBBCode, SalidaResumenConsola,
+        exportar_plan, exportar_por_jugador, exportar_bbcode_por_partes, LIMITE_BBCODE_POR_DEFECTO
+    )
+    
+    prefijo = args.salida
+    carpeta = os.path.dirname(prefijo)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    
+    salidas = []
+    if 'texto' in args.exportar:
+        salidas.append(SalidaTexto(f"{prefijo}.txt"))
+    if 'coordenadas' in args.exportar:
+        salidas.append(SalidaCoordenadas(f"{prefijo}_coordenadas.txt"))
+    if 'bbcode' in args.exportar:
+        salidas.append(SalidaBBCode(f"{prefijo}_bbcode.txt"))
+    if not args.silencioso:
+        salidas.append(SalidaResumenConsola())
+    
+    rutas = []
+    if salidas:
+        exportar_plan(plan, salidas)
+        rutas.extend(salida.ruta_archivo for salida in salidas if salida.ruta_archivo)
+    
+    if 'json' in args.exportar:
+        from importador import guardar_plan_json
+        guardar_plan_json(plan, f"{prefijo}.json")
+        rutas.append(f"{prefijo}.json")
+    if 'binario' in args.exportar:
+        from plan_binario import guardar_plan_binario, EXTENSION_PLAN_BINARIO
+        guardar_plan_binario(plan, f"{prefijo}{EXTENSION_PLAN_BINARIO}")
+        rutas.append(f"{prefijo}{EXTENSION_PLAN_BINARIO}")
+    if 'jugadores' in args.exportar:
+        rutas.extend(exportar_por_jugador(plan, f"{prefijo}_jugadores", args.formato_jugador).values())
+    if 'bbcode_partes' in args.exportar:
+        rutas.extend(exportar_bbcode_por_partes(plan, f"{prefijo}_bbcode", args.limite or LIMITE_BBCODE_POR_DEFECTO))
+    return rutas
+
+
+def main(argv=None):
+    """
+    Punto de entrada sin menús.
+    
+    Returns:
+        int: código de salida (0 = plan generado)
+    """
+    args = cargar_opciones(argv)
+    
+    from config_mundos import seleccionar_mundo, cargar_mundo_local
+    from importador import leer_csv_ofensivas
+    
+    cargar_mundo_local(args.mundo)
+    seleccionar_mundo(args.mundo)
+    
+    pueblos = leer_csv_ofensivas(args.csv, args.filtro, mundo=args.mundo, usar_api=not args.sin_api)
+    if not pueblos:
+        print("❌ No se pudieron cargar los pueblos", file=sys.stderr)
+        return 1
+    
+    objetivos, grupos = cargar_objetivos(args)
+    if not objetivos:
+        print("❌ No se pudieron cargar los objetivos", file=sys.stderr)
+        return 1
+    
+    disponibilidad = None
+    if args.disponibilidad:
+        from disponibilidad import leer_disponibilidad
+        disponibilidad = leer_disponibilidad(args.disponibilidad)
+    
+    try:
+        plan = generar_plan(args, pueblos, objetivos, grupos, disponibilidad)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    
+    from asignador import mostrar_objetivos_incompletos, mostrar_prioridades
+    if disponibilidad:
+        mostrar_objetivos_incompletos(plan)
+    mostrar_prioridades(plan)
+    
+    if args.optimizar:
+        from datetime import datetime
+        from optimizador import optimizar_plan
+        hora_actual = datetime.strptime(args.desde, '%Y-%m-%d %H:%M:%S') if args.desde else datetime.now()
+        optimizar_plan(plan, pueblos, objetivos, args.optimizar, args.mundo, disponibilidad=disponibilidad,
+                       hora_actual=hora_actual)
+    
+    if args.separacion:
+        from programador import programar_envios
+        try:
+            programar_envios(plan, round(args.separacion * 1000), round((args.margen or 0) * 1000), disponibilidad)
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 1
+    
+    if args.fakes:
+        anadir_fakes(args, plan, pueblos, objetivos)
+    
+    rutas = exportar(args, plan)
+    print(f"✅ Plan generado: {sum(len(o['ataques']) for o in plan['objetivos'])} ataques, {len(rutas)} archivos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
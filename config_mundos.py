@@ -3,6 +3,8 @@ Configuración de mundos de Guerras Tribales
 Datos obtenidos de TWStats
 """
 
+from types import MappingProxyType
+
 # Configuraciones disponibles por mundo
 CONFIGURACIONES_MUNDOS = {
     'es95': {
@@ -14,7 +16,8 @@ CONFIGURACIONES_MUNDOS = {
         'paladin_activado': True,
         'distancia_maxima_nobles': 70,
         'proteccion_principiantes_dias': 5,
-        'destruccion_edificios': True
+        'destruccion_edificios': True,
+        'bonus_noche': {'inicio': 0, 'fin': 8}
     },
     'estandar': {
         'nombre': 'Configuración Estándar',
@@ -25,7 +28,8 @@ CONFIGURACIONES_MUNDOS = {
         'paladin_activado': True,
         'distancia_maxima_nobles': 100,
         'proteccion_principiantes_dias': 3,
-        'destruccion_edificios': True
+        'destruccion_edificios': True,
+        'bonus_noche': {'inicio': 0, 'fin': 8}
     },
     'rapido': {
         'nombre': 'Mundo Rápido',
@@ -36,7 +40,8 @@ CONFIGURACIONES_MUNDOS = {
         'paladin_activado': True,
         'distancia_maxima_nobles': 100,
         'proteccion_principiantes_dias': 3,
-        'destruccion_edificios': True
+        'destruccion_edificios': True,
+        'bonus_noche': None
     }
 }
 
@@ -57,9 +62,57 @@ VELOCIDADES_TROPAS_BASE = {
     'noble': 35
 }
 
+# Velocidad asumida para tropas desconocidas (minutos por campo)
+VELOCIDAD_TROPA_DESCONOCIDA = 30
+
+# Nombres de las unidades en get_unit_info.xml -> nombres internos
+UNIDADES_XML = {
+    'spear': 'lanza',
+    'sword': 'espada',
+    'axe': 'hacha',
+    'archer': 'arquero',
+    'spy': 'explorador',
+    'light': 'caballeria_ligera',
+    'marcher': 'arquero_montado',
+    'heavy': 'caballeria_pesada',
+    'ram': 'ariete',
+    'catapult': 'catapulta',
+    'knight': 'paladin',
+    'snob': 'noble'
+}
+
+# Claves de 'tropas' de los pueblos (CSV de ofensivas) -> nombres internos
+TROPAS_A_UNIDAD = {
+    'lanzas': 'lanza',
+    'espadas': 'espada',
+    'hachas': 'hacha',
+    'arqueros': 'arquero',
+    'exploradores': 'explorador',
+    'ligeras': 'caballeria_ligera',
+    'arq_caballo': 'arquero_montado',
+    'arqueros_caballo': 'arquero_montado',
+    'pesadas': 'caballeria_pesada',
+    'arietes': 'ariete',
+    'catapultas': 'catapulta',
+    'paladin': 'paladin',
+    'nobles': 'noble'
+}
+
+# tipo_tropa especial: cada ataque viaja a la velocidad de su unidad más lenta
+TROPA_AUTOMATICA = 'auto'
+
+# Carpeta con los XML descargados de cada mundo ({id}_get_config.xml, {id}_get_unit_info.xml)
+CARPETA_XML_MUNDOS = 'data/mundos'
+
+# Carpeta donde se guardan las configuraciones compiladas desde XML
+CARPETA_CACHE_MUNDOS = 'data/cache_mundos'
+
 # Configuración actual (se puede cambiar en runtime)
 CONFIG_ACTUAL = 'es95'
 
+# Tablas de velocidad compiladas por mundo (ver obtener_tabla_velocidades)
+_TABLAS_VELOCIDAD = {}
+
 
 def obtener_config(mundo='es95'):
     """
@@ -74,6 +127,101 @@ def obtener_config(mundo='es95'):
     return CONFIGURACIONES_MUNDOS.get(mundo, CONFIGURACIONES_MUNDOS['estandar'])
 
 
+def compilar_tabla_velocidades(mundo='es95'):
+    """
+    Compila la tabla de velocidades de todas las tropas de un mundo.
+    
+    Incluye la velocidad del mundo y el modificador de unidades:
+    segundos_por_campo = minutos_base * 60 / (velocidad * modificador_velocidad_unidad)
+    Si el mundo se cargó desde XML se usan sus velocidades exactas.
+    
+    Args:
+        mundo: identificador del mundo
+    
+    Returns:
+        MappingProxyType: {tipo_tropa: segundos por campo} (inmutable)
+    """
+    config = obtener_config(mundo)
+    factor = config.get('velocidad', 1) * config['modificador_velocidad_unidad']
+    
+    # Mundos cargados desde XML: velocidades exactas ya escaladas por el mundo
+    exactas = config.get('velocidades_tropas', {})
+    
+    return MappingProxyType({
+        tropa: exactas[tropa] * 60 if tropa in exactas else minutos * 60 / factor
+        for tropa, minutos in VELOCIDADES_TROPAS_BASE.items()
+    })
+
+
+def obtener_tabla_velocidades(mundo=None):
+    """
+    Obtiene la tabla de velocidades de un mundo, compilándola solo la primera vez.
+    
+    Args:
+        mundo: identificador del mundo (por defecto el mundo seleccionado)
+    
+    Returns:
+        MappingProxyType: {tipo_tropa: segundos por campo}
+    """
+    if mundo is None:
+        mundo = CONFIG_ACTUAL
+    
+    tabla = _TABLAS_VELOCIDAD.get(mundo)
+    if tabla is None:
+        tabla = _TABLAS_VELOCIDAD[mundo] = compilar_tabla_velocidades(mundo)
+    return tabla
+
+
+def segundos_por_campo(tipo_tropa, mundo=None):
+    """
+    Obtiene los segundos por campo de una tropa desde la tabla compilada.
+    
+    Args:
+        tipo_tropa: tipo de tropa
+        mundo: identificador del mundo (por defecto el mundo seleccionado)
+    
+    Returns:
+        float: segundos por campo
+    """
+    tabla = obtener_tabla_velocidades(mundo)
+    segundos = tabla.get(tipo_tropa)
+    if segundos is None:
+        # Tropa desconocida: misma proporción que el resto de la tabla
+        segundos = VELOCIDAD_TROPA_DESCONOCIDA * tabla['noble'] / VELOCIDADES_TROPAS_BASE['noble']
+    return segundos
+
+
+def horas_bonus_noche(mundo=None):
+    """
+    Horas del bonus de noche de un mundo.
+    
+    Args:
+        mundo: identificador del mundo (por defecto el mundo seleccionado)
+    
+    Returns:
+        tuple: (hora_inicio, hora_fin) o None si el mundo no tiene bonus de noche
+    """
+    bonus = obtener_config(mundo or CONFIG_ACTUAL).get('bonus_noche')
+    if not bonus:
+        return None
+    return bonus['inicio'], bonus['fin']
+
+
+def seleccionar_mundo(mundo):
+    """
+    Selecciona el mundo actual y compila su tabla de velocidades.
+    
+    Args:
+        mundo: identificador del mundo
+    
+    Returns:
+        MappingProxyType: tabla de velocidades del mundo
+    """
+    global CONFIG_ACTUAL
+    CONFIG_ACTUAL = mundo
+    return obtener_tabla_velocidades(mundo)
+
+
 def obtener_velocidad_tropa(tipo_tropa, mundo='es95'):
     """
     Obtiene la velocidad de una tropa para un mundo específico.
@@ -85,11 +233,7 @@ def obtener_velocidad_tropa(tipo_tropa, mundo='es95'):
     Returns:
         float: minutos por campo
     """
-    config = obtener_config(mundo)
-    velocidad_base = VELOCIDADES_TROPAS_BASE.get(tipo_tropa, 30)
-    modificador = config['modificador_velocidad_unidad']
-    
-    return velocidad_base / modificador
+    return segundos_por_campo(tipo_tropa, mundo) / 60
 
 
 def listar_mundos_disponibles():
@@ -111,9 +255,166 @@ def agregar_mundo(id_mundo, config):
         config: diccionario con la configuración
     """
     CONFIGURACIONES_MUNDOS[id_mundo] = config
+    _TABLAS_VELOCIDAD.pop(id_mundo, None)
     print(f"✅ Configuración de '{id_mundo}' agregada/actualizada")
 
 
+def _leer_xml(ruta_archivo):
+    """
+    Lee un XML de configuración del juego como diccionario anidado.
+    
+    Args:
+        ruta_archivo: ruta al archivo XML
+    
+    Returns:
+        dict: {etiqueta: texto o dict}
+    """
+    import xml.etree.ElementTree as ET
+    
+    def a_dict(elemento):
+        if len(elemento) == 0:
+            return (elemento.text or '').strip()
+        return {hijo.tag: a_dict(hijo) for hijo in elemento}
+    
+    return a_dict(ET.parse(ruta_archivo).getroot())
+
+
+def _numero(texto, defecto=0):
+    try:
+        valor = float(texto)
+    except (TypeError, ValueError):
+        return defecto
+    return int(valor) if valor.is_integer() else valor
+
+
+def compilar_config_xml(ruta_config, ruta_unidades, nombre=None):
+    """
+    Compila la configuración de un mundo desde get_config.xml y get_unit_info.xml.
+    
+    Args:
+        ruta_config: ruta al XML de configuración del mundo (interface.php?func=get_config)
+        ruta_unidades: ruta al XML de unidades (interface.php?func=get_unit_info)
+        nombre: (opcional) nombre descriptivo del mundo
+    
+    Returns:
+        dict: configuración con el mismo formato que CONFIGURACIONES_MUNDOS,
+            más 'velocidades_tropas' (minutos por campo exactos) y 'tipo_moral'
+    """
+    config_xml = _leer_xml(ruta_config)
+    unidades_xml = _leer_xml(ruta_unidades)
+    
+    juego = config_xml.get('game', {})
+    nobles = config_xml.get('snob', {})
+    principiantes = config_xml.get('newbie', {})
+    construccion = config_xml.get('build', {})
+    noche = config_xml.get('night', {})
+    tipo_moral = _numero(config_xml.get('moral'), 1)
+    
+    velocidades = {}
+    for unidad, datos in unidades_xml.items():
+        if unidad in UNIDADES_XML and isinstance(datos, dict):
+            velocidades[UNIDADES_XML[unidad]] = float(datos['speed'])
+    
+    return {
+        'nombre': nombre or 'Mundo (XML)',
+        'velocidad': _numero(config_xml.get('speed'), 1),
+        'modificador_velocidad_unidad': _numero(config_xml.get('unit_speed'), 1),
+        'moral_activada': tipo_moral != 0,
+        'tipo_moral': tipo_moral,
+        'arqueros_activados': _numero(juego.get('archer')) != 0,
+        'paladin_activado': _numero(juego.get('knight')) != 0,
+        'distancia_maxima_nobles': _numero(nobles.get('max_dist'), 100),
+        'proteccion_principiantes_dias': _numero(principiantes.get('days'), 0),
+        'destruccion_edificios': _numero(construccion.get('destroy'), 1) != 0,
+        'bonus_noche': {
+            'inicio': _numero(noche.get('start_hour')),
+            'fin': _numero(noche.get('end_hour'), 8)
+        } if isinstance(noche, dict) and _numero(noche.get('active')) != 0 else None,
+        'velocidades_tropas': velocidades
+    }
+
+
+def _firma_archivo(ruta_archivo):
+    import os
+    info = os.stat(ruta_archivo)
+    return [os.path.abspath(ruta_archivo), info.st_mtime_ns, info.st_size]
+
+
+def cargar_mundo_desde_xml(id_mundo, ruta_config, ruta_unidades, nombre=None, carpeta_cache=CARPETA_CACHE_MUNDOS):
+    """
+    Carga la configuración exacta de un mundo desde sus XML y la registra.
+    
+    El resultado compilado se guarda en disco: mientras los XML no cambien
+    (o si ya no están disponibles) se usa la caché sin volver a leerlos.
+    
+    Args:
+        id_mundo: identificador del mundo (ej: 'es95')
+        ruta_config: ruta al XML de configuración del mundo
+        ruta_unidades: ruta al XML de unidades
+        nombre: (opcional) nombre descriptivo del mundo
+        carpeta_cache: carpeta de la caché (None para no usarla)
+    
+    Returns:
+        dict: configuración del mundo (o None si no hay XML ni caché)
+    """
+    import json
+    import os
+    
+    ruta_cache = os.path.join(carpeta_cache, f"{id_mundo}.json") if carpeta_cache else None
+    
+    try:
+        firmas = [_firma_archivo(ruta_config), _firma_archivo(ruta_unidades)]
+    except FileNotFoundError:
+        firmas = None
+    
+    cache = None
+    if ruta_cache and os.path.exists(ruta_cache):
+        with open(ruta_cache, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    
+    if cache and (firmas is None or cache.get('firmas') == firmas):
+        config = cache['config']
+    elif firmas is None:
+        print(f"❌ No se encontraron los XML de '{id_mundo}' ni una caché previa")
+        return None
+    else:
+        config = compilar_config_xml(ruta_config, ruta_unidades, nombre or f"Mundo {id_mundo.upper()}")
+        if ruta_cache:
+            os.makedirs(carpeta_cache, exist_ok=True)
+            with open(ruta_cache, 'w', encoding='utf-8') as f:
+                json.dump({'firmas': firmas, 'config': config}, f, indent=2, ensure_ascii=False)
+    
+    agregar_mundo(id_mundo, config)
+    return config
+
+
+def cargar_mundo_local(id_mundo, carpeta=CARPETA_XML_MUNDOS, carpeta_cache=CARPETA_CACHE_MUNDOS):
+    """
+    Carga un mundo desde la carpeta local de XML si existen sus archivos o su caché.
+    
+    Busca {carpeta}/{id_mundo}_get_config.xml y {carpeta}/{id_mundo}_get_unit_info.xml.
+    Si no hay nada, no hace nada y se sigue usando la configuración escrita a mano.
+    
+    Args:
+        id_mundo: identificador del mundo
+        carpeta: carpeta con los XML
+        carpeta_cache: carpeta de la caché
+    
+    Returns:
+        dict: configuración cargada o None
+    """
+    import os
+    
+    ruta_config = os.path.join(carpeta, f"{id_mundo}_get_config.xml")
+    ruta_unidades = os.path.join(carpeta, f"{id_mundo}_get_unit_info.xml")
+    hay_xml = os.path.exists(ruta_config) and os.path.exists(ruta_unidades)
+    hay_cache = bool(carpeta_cache) and os.path.exists(os.path.join(carpeta_cache, f"{id_mundo}.json"))
+    
+    if not hay_xml and not hay_cache:
+        return None
+    return cargar_mundo_desde_xml(id_mundo, ruta_config, ruta_unidades, carpeta_cache=carpeta_cache)
+
+
 if __name__ == "__main__":
     print("="*80)
     print("📋 CONFIGURACIONES DE MUNDOS DISPONIBLES")
@@ -127,6 +428,19 @@ if __name__ == "__main__":
         print(f"  - Moral: {'Sí' if config['moral_activada'] else 'No'}")
         print(f"  - Distancia nobles: {config['distancia_maxima_nobles']} campos")
     
+    # Mundo de ejemplo cargado desde los XML de prueba (sin conexión)
+    config = cargar_mundo_desde_xml(
+        'ejemplo',
+        'data/fixtures/get_config_ejemplo.xml',
+        'data/fixtures/get_unit_info_ejemplo.xml',
+        carpeta_cache=None
+    )
+    if config:
+        print(f"\n{config['nombre']} (ejemplo, desde XML):")
+        print(f"  - Velocidad: {config['velocidad']}x, unidades: {config['modificador_velocidad_unidad']}x")
+        print(f"  - Noble: {obtener_velocidad_tropa('noble', 'ejemplo'):.6f} min/campo")
+        print(f"  - Distancia nobles: {config['distancia_maxima_nobles']} campos")
+    
     print("\n" + "="*80)
     print("VELOCIDADES DE TROPAS (ES95)")
     print("="*80)
@@ -134,3 +448,21 @@ if __name__ == "__main__":
     for tropa, velocidad in VELOCIDADES_TROPAS_BASE.items():
         vel_mundo = obtener_velocidad_tropa(tropa, 'es95')
         print(f"  {tropa:20} {vel_mundo:.1f} min/campo")
+    
+    # Comparativa: cálculo por llamada frente a tabla compilada
+    import timeit
+    
+    def por_llamada(tipo_tropa='noble', mundo='es95'):
+        config = obtener_config(mundo)
+        return VELOCIDADES_TROPAS_BASE.get(tipo_tropa, 30) / config['modificador_velocidad_unidad']
+    
+    tabla = seleccionar_mundo('es95')
+    repeticiones = 1_000_000
+    t_llamada = timeit.timeit(lambda: 12.5 * por_llamada('noble', 'es95'), number=repeticiones)
+    t_tabla = timeit.timeit(lambda: 12.5 * tabla['noble'], number=repeticiones)
+    
+    print("\n" + "="*80)
+    print(f"BENCHMARK ({repeticiones:,} tiempos de viaje)")
+    print("="*80)
+    print(f"  Por llamada (obtener_config + división): {t_llamada:.3f} s")
+    print(f"  Tabla compilada:                         {t_tabla:.3f} s  ({t_llamada / t_tabla:.1f}x)")
@@ -0,0 +1,431 @@
+"""
+Módulo de defensa
+Calcula, a partir de una lista de ataques entrantes, qué pueblos defensivos
+llegan a tiempo a cada uno, a qué hora deben enviar el apoyo y cómo
+repartirlos (voraz u óptimo)
+"""
+
+import heapq
+import math
+import re
+from datetime import datetime
+
+from asignador import crear_ataque, formatear_horas_plan
+from calculadora import coordenadas_a_string, datetime_a_ms, FormateadorHoras
+from config_mundos import segundos_por_campo
+from indice_espacial import IndiceEspacial
+from puntuacion import asignacion_minima, asignacion_minima_numpy
+
+# NumPy es opcional: si está instalado, la asignación óptima se vectoriza
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Unidad más lenta de un apoyo típico (lanzas y espadas)
+UNIDAD_APOYO = 'espada'
+
+# El apoyo llega este tiempo antes del ataque (para snipes, unos pocos ms)
+MARGEN_APOYO_MS = 1000
+
+METODOS_APOYO = ('voraz', 'optimo')
+
+_PATRON_COORDENADAS = re.compile(r'(\d{1,3})\|(\d{1,3})')
+_PATRON_FECHA_ISO = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+_PATRON_FECHA = re.compile(r'(\d{1,2})[/.](\d{1,2})[/.](\d{4})')
+_PATRON_HORA = re.compile(r'(\d{1,2}):(\d{2}):(\d{2})(?:[:.](\d{3}))?')
+
+
+def parsear_linea_entrante(linea):
+    """
+    Lee un ataque entrante pegado del juego o escrito a mano.
+    
+    La primera coordenada es el pueblo atacado y la segunda (opcional) el
+    origen del ataque; la llegada acepta "DD/MM/YYYY" o "YYYY-MM-DD" y
+    "HH:MM:SS" con milisegundos opcionales (":mmm"), en cualquier orden.
+    Ejemplo: 500|500 480|490 16/11/2025 04:00:00:123
+    
+    Returns:
+        dict: entrante con 'coordenadas', 'origen' y 'llegada_ms', o None si
+              la línea no tiene coordenadas, fecha y hora
+    """
+    coordenadas = [(int(x), int(y)) for x, y in _PATRON_COORDENADAS.findall(linea)]
+    fecha = _PATRON_FECHA_ISO.search(linea)
+    if fecha:
+        anio, mes, dia = (int(valor) for valor in fecha.groups())
+    else:
+        fecha = _PATRON_FECHA.search(linea)
+        if fecha:
+            dia, mes, anio = (int(valor) for valor in fecha.groups())
+    hora = _PATRON_HORA.search(linea)
+    if not coordenadas or not fecha or not hora:
+        return None
+    
+    horas, minutos, segundos, milis = hora.groups()
+    llegada = datetime(anio, mes, dia, int(horas), int(minutos), int(segundos))
+    return {
+        'coordenadas': coordenadas[0],
+        'origen': coordenadas[1] if len(coordenadas) > 1 else None,
+        'llegada_ms': datetime_a_ms(llegada) + int(milis or 0)
+    }
+
+
+def leer_entrantes(ruta_archivo):
+    """
+    Lee la lista de ataques entrantes (uno por línea).
+    Formato: destino [origen] fecha hora[:ms]
+    Ejemplo: 500|500 480|490 16/11/2025 04:00:00:123
+    
+    Args:
+        ruta_archivo: ruta al archivo de entrantes
+    
+    Returns:
+        list: entrantes ordenados por hora de llegada
+    """
+    entrantes = []
+    
+    try:
+        with open(ruta_archivo, 'r', encoding='utf-8') as f:
+            for linea_num, linea in enumerate(f, 1):
+                linea = linea.strip()
+                
+                # Ignorar líneas vacías y comentarios
+                if not linea or linea.startswith('#'):
+                    continue
+                
+                try:
+                    entrante = parsear_linea_entrante(linea)
+                except ValueError as e:
+                    print(f"⚠️  Error en línea {linea_num}: {e}")
+                    continue
+                if entrante is None:
+                    print(f"⚠️  Línea {linea_num} ignorada (formato inválido): {linea}")
+                    continue
+                entrantes.append(entrante)
+        
+        entrantes.sort(key=lambda e: e['llegada_ms'])
+        print(f"✅ {len(entrantes)} ataques entrantes cargados desde {ruta_archivo}")
+    
+    except FileNotFoundError:
+        print(f"❌ Archivo no encontrado: {ruta_archivo}")
+    
+    return entrantes
+
+
+def _alcance_campos(entrante, ahora_ms, margen_ms, segundos_campo, distancia_max):
+    """Distancia máxima desde la que un apoyo enviado ahora llega a tiempo"""
+    disponible_ms = entrante['llegada_ms'] - margen_ms - ahora_ms
+    if disponible_ms < 0:
+        return -1
+    alcance = disponible_ms / (segundos_campo * 1000)
+    return alcance if distancia_max is None else min(alcance, distancia_max)
+
+
+def calcular_alcances(pueblos_defensa, entrantes, unidad=UNIDAD_APOYO, mundo='es95', hora_actual=None,
+                      margen_ms=MARGEN_APOYO_MS, distancia_max=None):
+    """
+    Entrantes a los que llega a tiempo cada pueblo defensivo.
+    
+    Para cada entrante se recorren con el índice espacial solo los pueblos
+    dentro de su alcance (el tiempo que queda hasta la llegada, a la
+    velocidad de la unidad), así que cientos de entrantes contra miles de
+    pueblos no comparan todas las parejas.
+    
+    Args:
+        pueblos_defensa: pueblos que pueden enviar apoyo
+        entrantes: ataques entrantes (de leer_entrantes)
+        unidad: unidad más lenta del apoyo
+        mundo: identificador del mundo
+        hora_actual: (opcional) datetime desde el que se puede enviar (por defecto, ahora)
+        margen_ms: el apoyo llega este tiempo antes del ataque
+        distancia_max: (opcional) distancia máxima de un apoyo
+    
+    Returns:
+        dict: {coordenadas del pueblo: [{'entrante', 'distancia', 'tiempo_viaje_ms',
+               'hora_envio_ms'}, ...]} por orden de llegada del entrante
+    """
+    ahora_ms = datetime_a_ms(hora_actual or datetime.now())
+    segundos_campo = segundos_por_campo(unidad, mundo)
+    indice = IndiceEspacial(pueblos_defensa)
+    
+    alcances = {}
+    for entrante in sorted(entrantes, key=lambda e: e['llegada_ms']):
+        alcance = _alcance_campos(entrante, ahora_ms, margen_ms, segundos_campo, distancia_max)
+        if alcance < 0:
+            continue
+        for d2, pueblo in indice.cercanos(entrante['coordenadas'], alcance):
+            distancia = d2 ** 0.5
+            tiempo_viaje_ms = round(distancia * segundos_campo * 1000)
+            alcances.setdefault(coordenadas_a_string(pueblo['coordenadas']), []).append({
+                'entrante': entrante,
+                'distancia': round(distancia, 2),
+                'tiempo_viaje_ms': tiempo_viaje_ms,
+                'hora_envio_ms': entrante['llegada_ms'] - margen_ms - tiempo_viaje_ms
+            })
+    
+    return alcances
+
+
+def _crear_apoyo(pueblo, opcion, unidad, formateador):
+    """Orden de apoyo con el mismo formato que los ataques del plan"""
+    entrante = opcion['entrante']
+    tiempo_viaje_ms = opcion['tiempo_viaje_ms']
+    return crear_ataque(pueblo, entrante, opcion['distancia'], tiempo_viaje_ms / 60000, tiempo_viaje_ms, 100,
+                        opcion['hora_envio_ms'] + tiempo_viaje_ms, unidad, campos_pueblo=('village_id',),
+                        apoyo=True, llegada_entrante_ms=entrante['llegada_ms'],
+                        llegada_entrante=formateador.formatear(entrante['llegada_ms']))
+
+
+def asignar_apoyos(pueblos_defensa, entrantes, apoyos_por_entrante=1, apoyos_por_pueblo=1, metodo='voraz',
+                   unidad=UNIDAD_APOYO, mundo='es95', hora_actual=None, margen_ms=MARGEN_APOYO_MS,
+                   distancia_max=None):
+    """
+    Reparte los pueblos defensivos entre los ataques entrantes.
+    
+    Cada apoyo sale a la última hora posible para llegar margen_ms antes de
+    su entrante (con un margen de pocos ms sirve para snipes entre nobles).
+    El método voraz atiende los entrantes por orden de llegada con los
+    pueblos más cercanos que llegan a tiempo; el óptimo cubre el máximo de
+    apoyos pedidos con la menor distancia total sin repetir pueblo en un
+    entrante (algoritmo húngaro, o flujo de coste mínimo si los pueblos mandan
+    varios apoyos y los entrantes piden varios).
+    
+    Args:
+        pueblos_defensa: pueblos que pueden enviar apoyo
+        entrantes: ataques entrantes (de leer_entrantes)
+        apoyos_por_entrante: apoyos que necesita cada entrante
+        apoyos_por_pueblo: apoyos máximos que envía cada pueblo
+        metodo: 'voraz' u 'optimo'
+        unidad: unidad más lenta del apoyo
+        mundo: identificador del mundo
+        hora_actual: (opcional) datetime desde el que se puede enviar (por defecto, ahora)
+        margen_ms: el apoyo llega este tiempo antes del ataque
+        distancia_max: (opcional) distancia máxima de un apoyo
+    
+    Returns:
+        dict: plan de apoyos (un objetivo por entrante, órdenes con 'apoyo': True)
+    """
+    if metodo not in METODOS_APOYO:
+        raise ValueError(f"Método de apoyo desconocido: {metodo} (usa {' o '.join(METODOS_APOYO)})")
+    
+    entrantes = sorted(entrantes, key=lambda e: e['llegada_ms'])
+    alcances = calcular_alcances(pueblos_defensa, entrantes, unidad, mundo, hora_actual, margen_ms, distancia_max)
+    por_coordenadas = {coordenadas_a_string(p['coordenadas']): p for p in pueblos_defensa}
+    
+    # Opciones de cada entrante por distancia: [(distancia, coordenadas del pueblo, opción)]
+    opciones = {id(entrante): [] for entrante in entrantes}
+    for coord, opciones_pueblo in alcances.items():
+        for opcion in opciones_pueblo:
+            opciones[id(opcion['entrante'])].append((opcion['distancia'], coord, opcion))
+    for lista in opciones.values():
+        lista.sort(key=lambda o: o[0])
+    
+    asignados = {id(entrante): [] for entrante in entrantes}
+    if metodo == 'voraz':
+        libres = {}
+        for entrante in entrantes:
+            for _, coord, opcion in opciones[id(entrante)]:
+                if len(asignados[id(entrante)]) == apoyos_por_entrante:
+                    break
+                if libres.get(coord, apoyos_por_pueblo) > 0:
+                    libres[coord] = libres.get(coord, apoyos_por_pueblo) - 1
+                    asignados[id(entrante)].append((coord, opcion))
+    else:
+        _asignar_optimo(entrantes, opciones, asignados, alcances, apoyos_por_entrante, apoyos_por_pueblo)
+    
+    plan = {
+        'fecha_creacion': datetime.now().isoformat(),
+        'mundo': mundo,
+        'tipo_tropa': unidad,
+        'objetivos': [],
+        'pueblos_sin_asignar': [],
+        'apoyos': {
+            'metodo': metodo,
+            'margen_ms': margen_ms,
+            'entrantes': len(entrantes),
+            'entrantes_sin_cubrir': []
+        }
+    }
+    
+    formateador = FormateadorHoras('%d/%m/%Y')
+    usados = set()
+    for entrante in entrantes:
+        apoyos = []
+        for coord, opcion in sorted(asignados[id(entrante)], key=lambda a: a[1]['distancia']):
+            usados.add(coord)
+            apoyos.append(_crear_apoyo(por_coordenadas[coord], opcion, unidad, formateador))
+        
+        coord_entrante = coordenadas_a_string(entrante['coordenadas'])
+        origen = coordenadas_a_string(entrante['origen']) if entrante.get('origen') else 'origen desconocido'
+        if len(apoyos) < apoyos_por_entrante:
+            plan['apoyos']['entrantes_sin_cubrir'].append({
+                'coordenadas': coord_entrante,
+                'origen': origen,
+                'llegada_ms': entrante['llegada_ms'],
+                'apoyos_asignados': len(apoyos),
+                'apoyos_pedidos': apoyos_por_entrante
+            })
+        
+        plan['objetivos'].append({
+            'coordenadas': coord_entrante,
+            'nombre': f"Entrante desde {origen}",
+            'jugador_defensor': entrante.get('jugador', 'Desconocido'),
+            'ataques': apoyos,
+            'ataques_asignados': len(apoyos)
+        })
+    
+    formatear_horas_plan(plan, '%d/%m/%Y')
+    
+    plan['pueblos_sin_asignar'] = [
+        {
+            'coordenadas': coordenadas_a_string(p['coordenadas']),
+            'nombre': p['nombre'],
+            'jugador': p['jugador']
+        }
+        for p in pueblos_defensa if coordenadas_a_string(p['coordenadas']) not in usados
+    ]
+    
+    sin_cubrir = plan['apoyos']['entrantes_sin_cubrir']
+    total = sum(len(o['ataques']) for o in plan['objetivos'])
+    print(f"🛡️  {total} apoyos para {len(entrantes)} entrantes ({len(sin_cubrir)} sin cubrir del todo)")
+    return plan
+
+
+def _asignar_optimo(entrantes, opciones, asignados, alcances, apoyos_por_entrante, apoyos_por_pueblo):
+    """
+    Asignación óptima: cubre el máximo de apoyos con la menor distancia
+    total sin que un pueblo mande dos apoyos al mismo entrante.
+    """
+    if apoyos_por_entrante == 1 or apoyos_por_pueblo == 1:
+        _asignar_hungaro(entrantes, opciones, asignados, alcances, apoyos_por_entrante, apoyos_por_pueblo)
+    else:
+        _asignar_flujo(entrantes, opciones, asignados, alcances, apoyos_por_entrante, apoyos_por_pueblo)
+
+
+def _asignar_hungaro(entrantes, opciones, asignados, alcances, apoyos_por_entrante, apoyos_por_pueblo):
+    """
+    Algoritmo húngaro: filas = apoyos pedidos, columnas = huecos de los pueblos.
+    
+    Solo vale si apoyos_por_entrante o apoyos_por_pueblo es 1: con los dos
+    mayores, dos huecos de un pueblo podrían caer en el mismo entrante.
+    
+    Las parejas que no llegan a tiempo cuestan más que cualquier reparto
+    posible, así que el mínimo cubre primero el máximo de apoyos y después
+    minimiza la distancia total.
+    """
+    columnas = [coord for coord in alcances for _ in range(apoyos_por_pueblo)]
+    filas = [entrante for entrante in entrantes for _ in range(apoyos_por_entrante)]
+    if not columnas or not filas:
+        return
+    
+    posicion = {}
+    for j, coord in enumerate(columnas):
+        posicion.setdefault(coord, []).append(j)
+    distancias = {}
+    for entrante in entrantes:
+        distancias[id(entrante)] = {coord: (distancia, opcion) for distancia, coord, opcion in opciones[id(entrante)]}
+    
+    prohibido = 1.0 + sum(max((o[0] for o in opciones[id(e)]), default=0) for e in filas)
+    prohibido *= 2
+    
+    # El algoritmo necesita filas <= columnas: si hay más apoyos pedidos que huecos, se traspone
+    traspuesta = len(filas) > len(columnas)
+    if np is not None:
+        costes = np.full((len(filas), len(columnas)), prohibido)
+        for i, entrante in enumerate(filas):
+            for coord, (distancia, _) in distancias[id(entrante)].items():
+                costes[i, posicion[coord]] = distancia
+        asignacion = asignacion_minima_numpy(costes.T if traspuesta else costes)
+    else:
+        def coste(i, j):
+            if traspuesta:
+                i, j = j, i
+            distancia = distancias[id(filas[i])].get(columnas[j])
+            return prohibido if distancia is None else distancia[0]
+        if traspuesta:
+            asignacion = asignacion_minima(coste, len(columnas), len(filas))
+        else:
+            asignacion = asignacion_minima(coste, len(filas), len(columnas))
+    
+    parejas = [(j, i) for i, j in enumerate(asignacion)] if traspuesta else list(enumerate(asignacion))
+    for i, j in parejas:
+        entrante = filas[i]
+        elegido = distancias[id(entrante)].get(columnas[j])
+        if elegido is not None:
+            asignados[id(entrante)].append((columnas[j], elegido[1]))
+
+
+def _asignar_flujo(entrantes, opciones, asignados, alcances, apoyos_por_entrante, apoyos_por_pueblo):
+    """
+    Flujo de coste mínimo, para cuando los pueblos mandan varios apoyos y los
+    entrantes piden varios.
+    
+    Red: origen → entrante (apoyos_por_entrante) → pueblo (un apoyo por
+    pareja, coste = distancia) → destino (apoyos_por_pueblo). Cada camino
+    más corto (Dijkstra con potenciales) añade un apoyo, así que el flujo
+    final cubre el máximo de apoyos y, entre esos repartos, con la menor
+    distancia total; un pueblo nunca manda dos apoyos al mismo entrante.
+    """
+    pueblos = list(alcances)
+    n, m = len(entrantes), len(pueblos)
+    origen, destino = n + m, n + m + 1
+    indice = {coord: n + k for k, coord in enumerate(pueblos)}
+    
+    # Aristas: [nodo destino, capacidad restante, coste, posición de la arista inversa]
+    red = [[] for _ in range(n + m + 2)]
+    
+    def arista(desde, hasta, capacidad, coste):
+        red[desde].append([hasta, capacidad, coste, len(red[hasta])])
+        red[hasta].append([desde, 0, -coste, len(red[desde]) - 1])
+    
+    for i, entrante in enumerate(entrantes):
+        arista(origen, i, apoyos_por_entrante, 0)
+        for distancia, coord, _ in opciones[id(entrante)]:
+            arista(i, indice[coord], 1, distancia)
+    for coord in pueblos:
+        arista(indice[coord], destino, apoyos_por_pueblo, 0)
+    
+    potencial = [0.0] * len(red)
+    while True:
+        distancias = [math.inf] * len(red)
+        previo = [None] * len(red)
+        cerrados = [False] * len(red)
+        distancias[origen] = 0.0
+        pendientes = [(0.0, origen)]
+        while pendientes:
+            distancia, nodo = heapq.heappop(pendientes)
+            if cerrados[nodo]:
+                continue
+            # Un nodo cerrado no se vuelve a relajar: con distancias reales el
+            # redondeo deja costes reducidos de -1e-13 que formarían ciclos
+            cerrados[nodo] = True
+            if nodo == destino:
+                break
+            for posicion, (siguiente, capacidad, coste, _) in enumerate(red[nodo]):
+                if capacidad > 0 and not cerrados[siguiente]:
+                    candidata = distancia + coste + potencial[nodo] - potencial[siguiente]
+                    if candidata < distancias[siguiente]:
+                        distancias[siguiente] = candidata
+                        previo[siguiente] = (nodo, posicion)
+                        heapq.heappush(pendientes, (candidata, siguiente))
+        if distancias[destino] == math.inf:
+            break
+        # Los nodos sin cerrar se quedan en la distancia del destino
+        for nodo, distancia in enumerate(distancias):
+            potencial[nodo] += min(distancia, distancias[destino])
+        
+        # Un apoyo más por el camino encontrado
+        nodo = destino
+        while nodo != origen:
+            anterior, posicion = previo[nodo]
+            arista_usada = red[anterior][posicion]
+            arista_usada[1] -= 1
+            red[nodo][arista_usada[3]][1] += 1
+            nodo = anterior
+    
+    # Parejas entrante-pueblo con flujo, de la más cercana a la más lejana
+    for i, entrante in enumerate(entrantes):
+        usados = {pueblos[hasta - n] for hasta, capacidad, _, _ in red[i] if n <= hasta < n + m and capacidad == 0}
+        for _, coord, opcion in opciones[id(entrante)]:
+            if coord in usados:
+                asignados[id(entrante)].append((coord, opcion))
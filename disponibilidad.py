@@ -0,0 +1,212 @@
+"""
+Módulo de disponibilidad de jugadores
+Horarios en los que cada jugador está conectado para enviar ataques,
+indexados para comprobar una hora de envío en O(log k)
+"""
+
+import re
+from bisect import bisect_right
+
+from calculadora import MS_POR_DIA
+
+# "07:00-01:00" (también con – o —), varios separados por comas
+_PATRON_INTERVALO = re.compile(r'(\d{1,2}):(\d{2})\s*[-–—]\s*(\d{1,2}):(\d{2})')
+
+
+def _hora_a_ms(horas, minutos):
+    """Milisegundos desde las 00:00 (24:00 es el final del día)"""
+    horas, minutos = int(horas), int(minutos)
+    if not (0 <= horas <= 24 and 0 <= minutos < 60) or (horas == 24 and minutos):
+        raise ValueError(f"Hora inválida: {horas:02d}:{minutos:02d}")
+    return (horas * 60 + minutos) * 60000
+
+
+class Disponibilidad:
+    """
+    Intervalos diarios de conexión por jugador.
+    
+    Cada jugador guarda dos listas ordenadas (inicios y fines en ms del día)
+    de intervalos ya unidos y sin solapes, así que disponible() es una
+    búsqueda binaria. Los intervalos que pasan de medianoche (07:00-01:00)
+    se parten en dos. Los jugadores sin horario se consideran siempre
+    disponibles.
+    """
+    
+    def __init__(self, intervalos_por_jugador=None):
+        """
+        Args:
+            intervalos_por_jugador: (opcional) {jugador: [("07:00", "01:00"), ...]}
+        """
+        self._intervalos = {}
+        self._indice = {}
+        for jugador, intervalos in (intervalos_por_jugador or {}).items():
+            for inicio, fin in intervalos:
+                self.agregar(jugador, inicio, fin)
+    
+    def __len__(self):
+        return len(self._intervalos)
+    
+    def __contains__(self, jugador):
+        return jugador in self._intervalos
+    
+    def jugadores(self):
+        """Jugadores con horario, en orden de alta"""
+        return list(self._intervalos)
+    
+    def agregar(self, jugador, inicio, fin):
+        """
+        Añade un intervalo diario a un jugador.
+        
+        Args:
+            jugador: nombre del jugador
+            inicio: hora de inicio "HH:MM"
+            fin: hora de fin "HH:MM" (si es anterior al inicio, termina al día siguiente)
+        """
+        inicio_ms = _hora_a_ms(*inicio.split(':'))
+        fin_ms = _hora_a_ms(*fin.split(':'))
+        
+        tramos = self._intervalos.setdefault(jugador, [])
+        if inicio_ms == fin_ms:
+            tramos.append((0, MS_POR_DIA))
+        elif inicio_ms < fin_ms:
+            tramos.append((inicio_ms, fin_ms))
+        else:
+            tramos.append((inicio_ms, MS_POR_DIA))
+            tramos.append((0, fin_ms))
+        
+        self._indice.pop(jugador, None)
+    
+    def _indice_jugador(self, jugador):
+        """(inicios, fines) ordenados y sin solapes, construidos una vez por jugador"""
+        indice = self._indice.get(jugador)
+        if indice is None:
+            inicios, fines = [], []
+            for inicio, fin in sorted(self._intervalos[jugador]):
+                if fines and inicio <= fines[-1]:
+                    fines[-1] = max(fines[-1], fin)
+                else:
+                    inicios.append(inicio)
+                    fines.append(fin)
+            indice = (inicios, fines)
+            self._indice[jugador] = indice
+        return indice
+    
+    def disponible(self, jugador, hora_ms):
+        """
+        Indica si un jugador está conectado a una hora.
+        
+        Args:
+            jugador: nombre del jugador
+            hora_ms: hora en milisegundos (como 'hora_envio_ms' de los ataques)
+        
+        Returns:
+            bool: True si la hora cae en alguno de sus intervalos (o no tiene horario)
+        """
+        if jugador not in self._intervalos:
+            return True
+        inicios, fines = self._indice_jugador(jugador)
+        hora_del_dia = hora_ms % MS_POR_DIA
+        i = bisect_right(inicios, hora_del_dia) - 1
+        return i >= 0 and hora_del_dia < fines[i]
+    
+    def recortar_llegadas(self, jugador, tramos, tiempo_viaje_ms):
+        """
+        Recorta tramos de llegada a los que se llega enviando con el jugador conectado.
+        
+        Cada envío del rango (llegada - tiempo de viaje) cae en alguno de sus
+        intervalos, así que mover el envío dentro del tramo recortado no lo
+        saca de su horario.
+        
+        Args:
+            jugador: nombre del jugador
+            tramos: [(inicio_ms, fin_ms)] de llegada, ordenados y con los dos extremos incluidos
+            tiempo_viaje_ms: tiempo de viaje del ataque
+        
+        Returns:
+            list: tramos (inicio_ms, fin_ms) de llegada recortados (los mismos si no tiene horario)
+        """
+        if jugador not in self._intervalos:
+            return list(tramos)
+        inicios, fines = self._indice_jugador(jugador)
+        
+        recortados = []
+        for inicio, fin in tramos:
+            desde, hasta = inicio - tiempo_viaje_ms, fin - tiempo_viaje_ms
+            dia = desde - desde % MS_POR_DIA
+            while dia <= hasta:
+                for inicio_dia, fin_dia in zip(inicios, fines):
+                    # Intervalos [inicio, fin): el último envío posible es fin - 1 ms
+                    envio_desde = max(desde, dia + inicio_dia)
+                    envio_hasta = min(hasta, dia + fin_dia - 1)
+                    if envio_desde > envio_hasta:
+                        continue
+                    llegada_desde, llegada_hasta = envio_desde + tiempo_viaje_ms, envio_hasta + tiempo_viaje_ms
+                    # Lo que sigue tras la medianoche (07:00-01:00) continúa el tramo anterior
+                    if recortados and llegada_desde <= recortados[-1][1] + 1:
+                        recortados[-1] = (recortados[-1][0], llegada_hasta)
+                    else:
+                        recortados.append((llegada_desde, llegada_hasta))
+                dia += MS_POR_DIA
+        return recortados
+
+
+def parsear_linea_disponibilidad(linea):
+    """
+    Lee una línea "Jugador: 07:00-01:00, 14:00-15:30".
+    
+    Returns:
+        tuple: (jugador, [(inicio, fin), ...]) o None si la línea no tiene horarios
+    """
+    coincidencias = list(_PATRON_INTERVALO.finditer(linea))
+    if not coincidencias:
+        return None
+    
+    jugador = linea[:coincidencias[0].start()].strip().rstrip(':').strip()
+    if not jugador:
+        return None
+    
+    intervalos = [(f"{m.group(1)}:{m.group(2)}", f"{m.group(3)}:{m.group(4)}") for m in coincidencias]
+    return jugador, intervalos
+
+
+def leer_disponibilidad(ruta_archivo):
+    """
+    Lee los horarios de conexión de los jugadores.
+    Formato: una línea por jugador, "Jugador: HH:MM-HH:MM[, HH:MM-HH:MM...]"
+    Ejemplo: Raba: 07:00-01:00
+    
+    Args:
+        ruta_archivo: ruta al archivo de horarios
+    
+    Returns:
+        Disponibilidad: horarios indexados (vacío si el archivo no existe)
+    """
+    disponibilidad = Disponibilidad()
+    
+    try:
+        with open(ruta_archivo, 'r', encoding='utf-8') as f:
+            for linea_num, linea in enumerate(f, 1):
+                linea = linea.strip()
+                
+                # Ignorar líneas vacías y comentarios
+                if not linea or linea.startswith('#'):
+                    continue
+                
+                datos = parsear_linea_disponibilidad(linea)
+                if datos is None:
+                    print(f"⚠️  Línea {linea_num} ignorada (formato inválido): {linea}")
+                    continue
+                
+                jugador, intervalos = datos
+                try:
+                    for inicio, fin in intervalos:
+                        disponibilidad.agregar(jugador, inicio, fin)
+                except ValueError as e:
+                    print(f"⚠️  Error en línea {linea_num}: {e}")
+        
+        print(f"✅ Horarios de {len(disponibilidad)} jugadores cargados desde {ruta_archivo}")
+    
+    except FileNotFoundError:
+        print(f"❌ Archivo no encontrado: {ruta_archivo}")
+    
+    return disponibilidad
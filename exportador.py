@@ -3,265 +3,527 @@ Módulo para exportar planes de ataque
 Genera archivos listos para copiar/pegar en Guerras Tribales
 """
 
-from calculadora import coordenadas_a_string
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
+from calculadora import coordenadas_a_string, datetime_a_ms
+from config_mundos import UNIDADES_XML
 
-def exportar_comandos_texto(plan, ruta_archivo):
+
+def _poblacion_tropas(tropas):
     """
-    Exporta comandos en formato de texto simple.
+    Suma la población ofensiva de un diccionario de tropas.
     
     Args:
-        plan: diccionario con el plan de ataque
-        ruta_archivo: ruta donde guardar el archivo
+        tropas: diccionario con las tropas del ataque
+    
+    Returns:
+        int: total de tropas
+    """
+    return (
+        tropas.get('hachas', 0) +
+        tropas.get('ligeras', 0) +
+        tropas.get('arq_caballo', 0) +
+        tropas.get('arietes', 0) +
+        tropas.get('catapultas', 0)
+    )
+
+
+class SalidaExportacion:
+    """
+    Formato de exportación alimentado por exportar_plan().
+    
+    Cada formato acumula su texto en memoria y lo vuelca de una sola vez
+    al terminar el recorrido, en lugar de escribir línea a línea.
     """
-    with open(ruta_archivo, 'w', encoding='utf-8') as f:
-        f.write("=" * 80 + "\n")
-        f.write("PLAN DE ATAQUE - GUERRAS TRIBALES\n")
-        f.write("=" * 80 + "\n\n")
+    
+    mensaje = "✅ Plan exportado a: {ruta}"
+    
+    def __init__(self, ruta_archivo=None):
+        """
+        Args:
+            ruta_archivo: archivo de salida (None para formatos de consola)
+        """
+        self.ruta_archivo = ruta_archivo
+        self._partes = []
+        self.escribir = self._partes.append
+    
+    def inicio(self, plan):
+        """Se llama una vez antes del primer objetivo"""
+    
+    def objetivo(self, idx, objetivo):
+        """Se llama al empezar cada objetivo (idx empieza en 1)"""
+    
+    def ataque(self, i, ataque, objetivo):
+        """Se llama por cada ataque del objetivo actual (i empieza en 1)"""
+    
+    def fin_objetivo(self, idx, objetivo, distancias):
+        """Se llama al terminar cada objetivo con la lista de distancias de sus ataques"""
+    
+    def final(self, plan, agregados):
+        """Se llama una vez al terminar el recorrido con los agregados compartidos"""
+    
+    def texto(self):
+        """
+        Returns:
+            str: todo el texto generado
+        """
+        return ''.join(self._partes)
+    
+    def volcar(self):
+        """Escribe el texto generado en el archivo de salida"""
+        with open(self.ruta_archivo, 'w', encoding='utf-8') as f:
+            f.write(self.texto())
+        print(self.mensaje.format(ruta=self.ruta_archivo))
+
+
+class SalidaTexto(SalidaExportacion):
+    """Comandos en formato de texto simple"""
+    
+    mensaje = "✅ Comandos exportados a: {ruta}"
+    
+    def inicio(self, plan):
+        escribir = self.escribir
+        escribir("=" * 80 + "\n")
+        escribir("PLAN DE ATAQUE - GUERRAS TRIBALES\n")
+        escribir("=" * 80 + "\n\n")
         
         if 'mundo' in plan:
-            from config_mundos import obtener_config, obtener_velocidad_tropa
+            from config_mundos import obtener_config, obtener_velocidad_tropa, TROPA_AUTOMATICA
             config = obtener_config(plan['mundo'])
-            f.write(f"🌍 Mundo: {config['nombre']} (Velocidad: {config['velocidad']}x)\n")
+            escribir(f"🌍 Mundo: {config['nombre']} (Velocidad: {config['velocidad']}x)\n")
             
-            if 'tipo_tropa' in plan:
+            if plan.get('tipo_tropa') == TROPA_AUTOMATICA:
+                # Cada ataque lleva su propia unidad más lenta en 'tropa_lenta'
+                escribir("🏃 Tipo de tropa: automática (velocidad de la unidad más lenta de cada ataque)\n")
+            elif 'tipo_tropa' in plan:
                 velocidad = obtener_velocidad_tropa(plan['tipo_tropa'], plan['mundo'])
-                f.write(f"🏃 Tipo de tropa: {plan['tipo_tropa']} ({velocidad:.1f} min/campo)\n")
+                escribir(f"🏃 Tipo de tropa: {plan['tipo_tropa']} ({velocidad:.1f} min/campo)\n")
         
         if 'ventana_llegada' in plan:
-            f.write(f"⏰ Ventana de llegada: {plan['ventana_llegada']['inicio']} - {plan['ventana_llegada']['fin']}\n")
-            f.write(f"🎯 Objetivo central: {plan['ventana_llegada']['objetivo']}\n")
+            escribir(f"⏰ Ventana de llegada: {plan['ventana_llegada']['inicio']} - {plan['ventana_llegada']['fin']}\n")
+            if 'bonus_noche' in plan['ventana_llegada']:
+                escribir(f"🌙 Sin llegadas en el bonus de noche ({plan['ventana_llegada']['bonus_noche']})\n")
+            escribir(f"🎯 Objetivo central: {plan['ventana_llegada']['objetivo']}\n")
         elif 'hora_llegada_objetivo' in plan:
-            f.write(f"🎯 Hora de llegada objetivo: {plan['hora_llegada_objetivo']}\n")
+            escribir(f"🎯 Hora de llegada objetivo: {plan['hora_llegada_objetivo']}\n")
         
-        f.write("\n")
+        if 'oleadas' in plan:
+            escribir(f"🌊 Oleadas: {' | '.join(plan['oleadas']['llegadas'])}\n")
         
-        for idx, objetivo in enumerate(plan['objetivos'], 1):
-            f.write(f"\n{'='*80}\n")
-            f.write(f"OBJETIVO #{idx}: {objetivo['nombre']} ({objetivo['coordenadas']})\n")
-            f.write(f"Defensor: {objetivo.get('jugador_defensor', 'Desconocido')}\n")
-            f.write(f"Ataques asignados: {len(objetivo['ataques'])}\n")
-            f.write(f"{'='*80}\n\n")
-            
-            for i, ataque in enumerate(objetivo['ataques'], 1):
-                f.write(f"  Ataque {i}:\n")
-                f.write(f"    Desde: {ataque['pueblo_atacante']} ({ataque['nombre_pueblo']})\n")
-                f.write(f"    Jugador: {ataque['jugador']}\n")
-                
-                # Si tiene tipo de OFF, mostrarlo
-                if 'tipo_off' in ataque:
-                    f.write(f"    Tipo: {ataque['tipo_off']}\n")
-                
-                # Si tiene tropas, mostrarlas
-                if 'tropas' in ataque:
-                    tropas = ataque['tropas']
-                    f.write(f"    Tropas: {tropas.get('hachas', 0)} hachas, ")
-                    f.write(f"{tropas.get('ligeras', 0)} ligeras, ")
-                    f.write(f"{tropas.get('arietes', 0)} arietes\n")
-                
-                f.write(f"    Distancia: {ataque['distancia']} campos\n")
-                f.write(f"    Tiempo: {ataque['tiempo_viaje']}\n")
-                f.write(f"    Moral: {ataque['moral']}%\n")
-                
-                if 'hora_envio' in ataque:
-                    f.write(f"    ⏰ Enviar a las: {ataque['hora_envio']}\n")
-                
-                f.write("\n")
+        escribir("\n")
+    
+    def objetivo(self, idx, objetivo):
+        self.escribir(
+            f"\n{'='*80}\n"
+            f"OBJETIVO #{idx}: {objetivo['nombre']} ({objetivo['coordenadas']})\n"
+            f"Defensor: {objetivo.get('jugador_defensor', 'Desconocido')}\n"
+            f"Ataques asignados: {len(objetivo['ataques'])}\n"
+            f"{'='*80}\n\n"
+        )
+    
+    def ataque(self, i, ataque, objetivo):
+        escribir = self.escribir
+        escribir(f"  Ataque {i}:\n")
+        escribir(f"    Desde: {ataque['pueblo_atacante']} ({ataque['nombre_pueblo']})\n")
+        escribir(f"    Jugador: {ataque['jugador']}\n")
         
-        # Resumen por jugador
-        resumen_jugadores = {}
-        for objetivo in plan['objetivos']:
-            for ataque in objetivo['ataques']:
-                jugador = ataque['jugador']
-                if jugador not in resumen_jugadores:
-                    resumen_jugadores[jugador] = {
-                        'total_ataques': 0,
-                        'total_tropas': 0,
-                        'tipo_off': ataque.get('tipo_off', 'N/A')
-                    }
-                resumen_jugadores[jugador]['total_ataques'] += 1
-                
-                if 'tropas' in ataque:
-                    tropas = ataque['tropas']
-                    resumen_jugadores[jugador]['total_tropas'] += (
-                        tropas.get('hachas', 0) +
-                        tropas.get('ligeras', 0) +
-                        tropas.get('arq_caballo', 0) +
-                        tropas.get('arietes', 0) +
-                        tropas.get('catapultas', 0)
-                    )
+        # Si tiene tipo de OFF, mostrarlo
+        if 'tipo_off' in ataque:
+            escribir(f"    Tipo: {ataque['tipo_off']}\n")
+        
+        # Ataques de un tren de nobles: papel y orden de llegada
+        if 'rol' in ataque:
+            escribir(f"    Tren: {ataque['rol']} (llega en {ataque['orden']}º lugar)\n")
+        
+        # Oleadas: número de oleada y vuelta de la ofensiva a su pueblo
+        if 'oleada' in ataque:
+            escribir(f"    Oleada: {ataque['oleada']} (vuelve a las {ataque['hora_regreso']})\n")
+        
+        # Fakes: una sola unidad, para esconder los ataques reales
+        if ataque.get('fake'):
+            escribir(f"    Fake: enviar solo 1 {ataque['tropa_lenta']}\n")
+        
+        # Apoyos del calculador de defensa: ataque al que se adelantan
+        if ataque.get('apoyo'):
+            escribir(f"    Apoyo: llega antes del ataque de las {ataque['llegada_entrante']}\n")
         
+        # Si tiene tropas, mostrarlas
+        if 'tropas' in ataque:
+            tropas = ataque['tropas']
+            escribir(f"    Tropas: {tropas.get('hachas', 0)} hachas, ")
+            escribir(f"{tropas.get('ligeras', 0)} ligeras, ")
+            escribir(f"{tropas.get('arietes', 0)} arietes\n")
+        
+        escribir(f"    Distancia: {ataque['distancia']} campos\n")
+        if 'tropa_lenta' in ataque:
+            escribir(f"    Tiempo: {ataque['tiempo_viaje']} ({ataque['tropa_lenta']})\n")
+        else:
+            escribir(f"    Tiempo: {ataque['tiempo_viaje']}\n")
+        escribir(f"    Moral: {ataque['moral']}%\n")
+        
+        if 'hora_envio' in ataque:
+            escribir(f"    ⏰ Enviar a las: {ataque['hora_envio']}\n")
+        
+        escribir("\n")
+    
+    def final(self, plan, agregados):
+        escribir = self.escribir
+        resumen_jugadores = agregados['resumen_jugadores']
+        
+        # Resumen por jugador
         if resumen_jugadores:
-            f.write(f"\n{'='*80}\n")
-            f.write(f"📊 RESUMEN POR JUGADOR\n")
-            f.write(f"{'='*80}\n\n")
+            escribir(f"\n{'='*80}\n")
+            escribir(f"📊 RESUMEN POR JUGADOR\n")
+            escribir(f"{'='*80}\n\n")
             
             for jugador, datos in sorted(resumen_jugadores.items(), key=lambda x: x[1]['total_ataques'], reverse=True):
-                f.write(f"  {jugador}:\n")
-                f.write(f"    Ofensivas: {datos['total_ataques']}\n")
+                escribir(f"  {jugador}:\n")
+                escribir(f"    Ofensivas: {datos['total_ataques']}\n")
                 if datos['total_tropas'] > 0:
-                    f.write(f"    Total tropas: {datos['total_tropas']:,}\n")
-                f.write("\n")
+                    escribir(f"    Total tropas: {datos['total_tropas']:,}\n")
+                escribir("\n")
         
         # Pueblos sin asignar
         if plan.get('pueblos_sin_asignar'):
-            f.write(f"\n{'='*80}\n")
-            f.write(f"PUEBLOS SIN ASIGNAR ({len(plan['pueblos_sin_asignar'])})\n")
-            f.write(f"{'='*80}\n\n")
+            escribir(f"\n{'='*80}\n")
+            escribir(f"PUEBLOS SIN ASIGNAR ({len(plan['pueblos_sin_asignar'])})\n")
+            escribir(f"{'='*80}\n\n")
             
             for pueblo in plan['pueblos_sin_asignar']:
-                f.write(f"  • {pueblo['coordenadas']} - {pueblo['nombre']} ({pueblo['jugador']})\n")
+                escribir(f"  • {pueblo['coordenadas']} - {pueblo['nombre']} ({pueblo['jugador']})\n")
         
         # Balance de jugadores
         if 'balance_jugadores' in plan:
-            f.write(f"\n{'='*80}\n")
-            f.write("BALANCE DE ATAQUES POR JUGADOR\n")
-            f.write(f"{'='*80}\n\n")
+            escribir(f"\n{'='*80}\n")
+            escribir("BALANCE DE ATAQUES POR JUGADOR\n")
+            escribir(f"{'='*80}\n\n")
             
             for jugador, ataques in plan['balance_jugadores'].items():
-                f.write(f"  {jugador}: {ataques} ataques\n")
+                escribir(f"  {jugador}: {ataques} ataques\n")
+
+
+class SalidaCoordenadas(SalidaExportacion):
+    """Formato simple para copiar/pegar coordenadas en GT"""
     
-    print(f"✅ Comandos exportados a: {ruta_archivo}")
+    mensaje = "✅ Coordenadas exportadas a: {ruta}"
+    
+    def objetivo(self, idx, objetivo):
+        self.escribir(f"\n# {objetivo['nombre']} - {objetivo['coordenadas']}\n")
+    
+    def ataque(self, i, ataque, objetivo):
+        # Formato: coordenadas_origen coordenadas_destino
+        self.escribir(f"{ataque['pueblo_atacante']} -> {objetivo['coordenadas']}\n")
 
 
-def exportar_para_copiar(plan, ruta_archivo):
+def _tropas_bbcode(ataque):
     """
-    Exporta en formato simple para copiar/pegar coordenadas en GT.
+    Genera la celda de tropas con iconos BBCode.
     
     Args:
-        plan: plan de ataque
-        ruta_archivo: archivo de salida
+        ataque: diccionario del ataque
+    
+    Returns:
+        str: contenido de la celda ('-' si no hay tropas)
     """
-    with open(ruta_archivo, 'w', encoding='utf-8') as f:
-        for objetivo in plan['objetivos']:
-            f.write(f"\n# {objetivo['nombre']} - {objetivo['coordenadas']}\n")
-            
-            for ataque in objetivo['ataques']:
-                # Formato: coordenadas_origen coordenadas_destino
-                f.write(f"{ataque['pueblo_atacante']} -> {objetivo['coordenadas']}\n")
+    if ataque.get('fake'):
+        codigo = next((xml for xml, unidad in UNIDADES_XML.items() if unidad == ataque['tropa_lenta']), 'ram')
+        return f"1[unit]{codigo}[/unit] (fake)"
     
-    print(f"✅ Coordenadas exportadas a: {ruta_archivo}")
+    if 'tropas' not in ataque:
+        return "-"
+    
+    tropas = ataque['tropas']
+    tropas_texto = []
+    if tropas.get('hachas', 0) > 0:
+        tropas_texto.append(f"{tropas['hachas']}[unit]axe[/unit]")
+    if tropas.get('ligeras', 0) > 0:
+        tropas_texto.append(f"{tropas['ligeras']}[unit]light[/unit]")
+    if tropas.get('arq_caballo', 0) > 0:
+        tropas_texto.append(f"{tropas['arq_caballo']}[unit]marcher[/unit]")
+    if tropas.get('arietes', 0) > 0:
+        tropas_texto.append(f"{tropas['arietes']}[unit]ram[/unit]")
+    if tropas.get('catapultas', 0) > 0:
+        tropas_texto.append(f"{tropas['catapultas']}[unit]catapult[/unit]")
+    return ' '.join(tropas_texto)
 
 
-def exportar_bbcode(plan, ruta_archivo):
+def _lanzar_bbcode(ataque, mundo):
     """
-    Exporta el plan en formato BBCode para foros.
+    Genera la celda con el enlace directo a la plaza de reuniones.
     
     Args:
-        plan: plan de ataque
-        ruta_archivo: archivo de salida
+        ataque: diccionario del ataque
+        mundo: identificador del mundo
+    
+    Returns:
+        str: contenido de la celda ('-' si faltan datos)
     """
-    with open(ruta_archivo, 'w', encoding='utf-8') as f:
-        f.write("[b][size=14]PLAN DE ATAQUE[/size][/b]\n\n")
+    if 'village_id' in ataque and 'coordenadas_objetivo' in ataque:
+        village_id = ataque['village_id']
+        x_obj, y_obj = ataque['coordenadas_objetivo']
+        url = f"https://{mundo}.guerrastribales.es/game.php?village={village_id}&screen=place&x={x_obj}&y={y_obj}"
+        return f"[url={url}]Lanzar[/url]"
+    return "-"
+
+
+def _fila_bbcode(ataque, mundo):
+    """
+    Genera la fila BBCode de un ataque.
+    
+    Args:
+        ataque: diccionario del ataque
+        mundo: identificador del mundo (para el enlace de lanzamiento)
+    
+    Returns:
+        str: fila de la tabla terminada en salto de línea
+    """
+    fila = (
+        f"[*][coord]{ataque['pueblo_atacante']}[/coord]"
+        f"[|][player]{ataque['jugador']}[/player]"
+        f"[|]{_tropas_bbcode(ataque)}"
+        f"[|]{ataque['moral']}%"
+    )
+    
+    if 'hora_envio' in ataque:
+        fila += f"[|]{ataque['hora_envio']}"
+    
+    return fila + f"[|]{_lanzar_bbcode(ataque, mundo)}\n"
+
+
+def _cabecera_tabla_bbcode(objetivo):
+    """
+    Genera la apertura de la tabla BBCode de un objetivo.
+    
+    Args:
+        objetivo: diccionario del objetivo
+    
+    Returns:
+        str: etiqueta [table] y fila de títulos
+    """
+    cabecera = "[table]\n[**]Desde[||]Jugador[||]Tropas[||]Moral"
+    if objetivo['ataques'] and 'hora_envio' in objetivo['ataques'][0]:
+        cabecera += "[||]Hora Envío"
+    return cabecera + "[||]Lanzar[/**]\n"
+
+
+class SalidaBBCode(SalidaExportacion):
+    """Plan en formato BBCode para foros"""
+    
+    mensaje = "✅ BBCode exportado a: {ruta}"
+    
+    def inicio(self, plan):
+        self.mundo = plan.get('mundo', 'es95')
+        escribir = self.escribir
+        escribir("[b][size=14]PLAN DE ATAQUE[/size][/b]\n\n")
         
         if 'ventana_llegada' in plan:
-            f.write(f"[b]⏰ Ventana de llegada:[/b] {plan['ventana_llegada']['inicio']} - {plan['ventana_llegada']['fin']}\n")
-            f.write(f"[b]🎯 Objetivo central:[/b] {plan['ventana_llegada']['objetivo']}\n\n")
+            escribir(f"[b]⏰ Ventana de llegada:[/b] {plan['ventana_llegada']['inicio']} - {plan['ventana_llegada']['fin']}\n")
+            escribir(f"[b]🎯 Objetivo central:[/b] {plan['ventana_llegada']['objetivo']}\n\n")
         elif 'hora_llegada_objetivo' in plan:
-            f.write(f"[b]🎯 Hora de llegada:[/b] {plan['hora_llegada_objetivo']}\n\n")
-        
-        for idx, objetivo in enumerate(plan['objetivos'], 1):
-            f.write(f"[b][size=12]Objetivo #{idx}: {objetivo['nombre']}[/size][/b]\n")
-            f.write(f"[b]Coordenadas:[/b] [coord]{objetivo['coordenadas']}[/coord]\n")
-            f.write(f"[b]Ataques:[/b] {len(objetivo['ataques'])}\n\n")
-            
-            f.write("[table]\n")
-            f.write("[**]Desde[||]Jugador[||]Tropas[||]Moral")
-            
-            if objetivo['ataques'] and 'hora_envio' in objetivo['ataques'][0]:
-                f.write("[||]Hora Envío")
-            
-            f.write("[||]Lanzar[/**]\n")
-            
-            for ataque in objetivo['ataques']:
-                f.write(f"[*][coord]{ataque['pueblo_atacante']}[/coord]")
-                f.write(f"[|][player]{ataque['jugador']}[/player]")
-                
-                # Columna de tropas con iconos BBCode
-                if 'tropas' in ataque:
-                    tropas = ataque['tropas']
-                    tropas_texto = []
-                    if tropas.get('hachas', 0) > 0:
-                        tropas_texto.append(f"{tropas['hachas']}[unit]axe[/unit]")
-                    if tropas.get('ligeras', 0) > 0:
-                        tropas_texto.append(f"{tropas['ligeras']}[unit]light[/unit]")
-                    if tropas.get('arq_caballo', 0) > 0:
-                        tropas_texto.append(f"{tropas['arq_caballo']}[unit]marcher[/unit]")
-                    if tropas.get('arietes', 0) > 0:
-                        tropas_texto.append(f"{tropas['arietes']}[unit]ram[/unit]")
-                    if tropas.get('catapultas', 0) > 0:
-                        tropas_texto.append(f"{tropas['catapultas']}[unit]catapult[/unit]")
-                    f.write(f"[|]{' '.join(tropas_texto)}")
-                else:
-                    f.write("[|]-")
-                
-                f.write(f"[|]{ataque['moral']}%")
-                
-                if 'hora_envio' in ataque:
-                    f.write(f"[|]{ataque['hora_envio']}")
-                
-                # Columna Lanzar con enlace directo
-                if 'village_id' in ataque and 'coordenadas_objetivo' in ataque:
-                    village_id = ataque['village_id']
-                    x_obj, y_obj = ataque['coordenadas_objetivo']
-                    mundo = plan.get('mundo', 'es95')
-                    url = f"https://{mundo}.guerrastribales.es/game.php?village={village_id}&screen=place&x={x_obj}&y={y_obj}"
-                    f.write(f"[|][url={url}]Lanzar[/url]")
-                else:
-                    f.write("[|]-")
-                
-                f.write("\n")
-            
-            f.write("[/table]\n\n")
-        
-        # Crear resumen por jugador
-        resumen_jugadores = {}
-        for objetivo in plan['objetivos']:
-            for ataque in objetivo['ataques']:
-                jugador = ataque['jugador']
-                if jugador not in resumen_jugadores:
-                    resumen_jugadores[jugador] = {
-                        'total_ataques': 0,
-                        'total_tropas': 0,
-                        'tipo_off': ataque.get('tipo_off', 'N/A')
-                    }
-                resumen_jugadores[jugador]['total_ataques'] += 1
-                
-                # Sumar tropas
-                if 'tropas' in ataque:
-                    tropas = ataque['tropas']
-                    resumen_jugadores[jugador]['total_tropas'] += (
-                        tropas.get('hachas', 0) +
-                        tropas.get('ligeras', 0) +
-                        tropas.get('arq_caballo', 0) +
-                        tropas.get('arietes', 0) +
-                        tropas.get('catapultas', 0)
-                    )
+            escribir(f"[b]🎯 Hora de llegada:[/b] {plan['hora_llegada_objetivo']}\n\n")
+    
+    def objetivo(self, idx, objetivo):
+        self.escribir(
+            f"[b][size=12]Objetivo #{idx}: {objetivo['nombre']}[/size][/b]\n"
+            f"[b]Coordenadas:[/b] [coord]{objetivo['coordenadas']}[/coord]\n"
+            f"[b]Ataques:[/b] {len(objetivo['ataques'])}\n\n"
+        )
+        self.escribir(_cabecera_tabla_bbcode(objetivo))
+    
+    def ataque(self, i, ataque, objetivo):
+        self.escribir(_fila_bbcode(ataque, self.mundo))
+    
+    def fin_objetivo(self, idx, objetivo, distancias):
+        self.escribir("[/table]\n\n")
+    
+    def final(self, plan, agregados):
+        escribir = self.escribir
+        resumen_jugadores = agregados['resumen_jugadores']
         
         # Escribir resumen
         if resumen_jugadores:
-            f.write("[b][size=12]📊 RESUMEN POR JUGADOR[/size][/b]\n\n")
-            f.write("[table]\n")
-            f.write("[**]Jugador[||]Ofensivas[||]Total Tropas[/**]\n")
+            escribir("[b][size=12]📊 RESUMEN POR JUGADOR[/size][/b]\n\n")
+            escribir("[table]\n")
+            escribir("[**]Jugador[||]Ofensivas[||]Total Tropas[/**]\n")
             
             # Ordenar por número de ofensivas (descendente)
             for jugador, datos in sorted(resumen_jugadores.items(), key=lambda x: x[1]['total_ataques'], reverse=True):
-                f.write(f"[*][player]{jugador}[/player]")
-                f.write(f"[|]{datos['total_ataques']}")
+                escribir(f"[*][player]{jugador}[/player]")
+                escribir(f"[|]{datos['total_ataques']}")
                 if datos['total_tropas'] > 0:
-                    f.write(f"[|]{datos['total_tropas']:,}")
+                    escribir(f"[|]{datos['total_tropas']:,}")
                 else:
-                    f.write("[|]-")
-                f.write("\n")
+                    escribir("[|]-")
+                escribir("\n")
             
-            f.write("[/table]\n")
+            escribir("[/table]\n")
         
         if 'balance_jugadores' in plan:
-            f.write("\n[b]Balance de ataques:[/b]\n")
+            escribir("\n[b]Balance de ataques:[/b]\n")
             for jugador, ataques in plan['balance_jugadores'].items():
-                f.write(f"• {jugador}: {ataques} ataques\n")
+                escribir(f"• {jugador}: {ataques} ataques\n")
+
+
+class SalidaResumenConsola(SalidaExportacion):
+    """Resumen del plan en consola"""
+    
+    def __init__(self):
+        super().__init__()
+        self._cuerpo = []
+    
+    def objetivo(self, idx, objetivo):
+        self._cuerpo.append(f"\nObjetivo {idx}: {objetivo['nombre']} ({objetivo['coordenadas']})\n")
+        self._cuerpo.append(f"  Ataques: {len(objetivo['ataques'])}\n")
+    
+    def fin_objetivo(self, idx, objetivo, distancias):
+        if distancias:
+            self._cuerpo.append(f"  Distancia promedio: {sum(distancias)/len(distancias):.2f} campos\n")
+            self._cuerpo.append(f"  Distancia min/max: {min(distancias):.2f} / {max(distancias):.2f}\n")
+    
+    def final(self, plan, agregados):
+        escribir = self.escribir
+        escribir("\n" + "="*80 + "\n")
+        escribir("📋 RESUMEN DEL PLAN DE ATAQUE\n")
+        escribir("="*80 + "\n")
+        
+        escribir(f"\n🎯 Objetivos: {agregados['num_objetivos']}\n")
+        escribir(f"⚔️  Total de ataques: {agregados['total_ataques']}\n")
+        
+        if plan.get('pueblos_sin_asignar'):
+            escribir(f"📍 Pueblos sin asignar: {len(plan['pueblos_sin_asignar'])}\n")
+        
+        if 'hora_llegada_objetivo' in plan:
+            escribir(f"⏰ Hora de llegada: {plan['hora_llegada_objetivo']}\n")
+        
+        escribir("\n" + "-"*80 + "\n")
+        self._partes.extend(self._cuerpo)
+        
+        if 'balance_jugadores' in plan:
+            escribir("\n" + "-"*80 + "\n")
+            escribir("\n⚖️  Balance de ataques por jugador:\n")
+            for jugador, ataques in sorted(plan['balance_jugadores'].items(), key=lambda x: x[1], reverse=True):
+                escribir(f"  {jugador}: {ataques} ataques\n")
+        
+        escribir("\n" + "="*80 + "\n")
+    
+    def volcar(self):
+        print(self.texto(), end='')
+
+
+def exportar_plan(plan, salidas, objetivos=None):
+    """
+    Recorre el plan una sola vez y alimenta todos los formatos de salida.
+    
+    Los agregados compartidos (resumen por jugador, totales, distancias por
+    objetivo) se calculan durante el mismo recorrido.
+    
+    Args:
+        plan: plan de ataque (o los metadatos si los objetivos llegan aparte)
+        salidas: lista de SalidaExportacion
+        objetivos: (opcional) iterable de objetivos, por ejemplo un LectorPlanJSON.
+            Por defecto se usa plan['objetivos']. Con un lector incremental, los
+            campos de cabecera (mundo, ventana...) solo se ven si el archivo los
+            guarda antes de la lista de objetivos
+    
+    Returns:
+        dict: agregados calculados durante el recorrido
+    """
+    iterador = iter(plan['objetivos'] if objetivos is None else objetivos)
+    # Leer el primer objetivo antes de empezar: un lector incremental
+    # solo conoce los metadatos de cabecera una vez que ha empezado
+    primero = next(iterador, None)
+    
+    for salida in salidas:
+        salida.inicio(plan)
+    
+    resumen_jugadores = {}
+    total_ataques = 0
+    num_objetivos = 0
+    
+    por_objetivo = [salida.objetivo for salida in salidas]
+    por_ataque = [salida.ataque for salida in salidas]
+    por_fin_objetivo = [salida.fin_objetivo for salida in salidas]
+    
+    objetivo = primero
+    while objetivo is not None:
+        num_objetivos += 1
+        for llamar in por_objetivo:
+            llamar(num_objetivos, objetivo)
+        
+        distancias = []
+        for i, ataque in enumerate(objetivo['ataques'], 1):
+            for llamar in por_ataque:
+                llamar(i, ataque, objetivo)
+            
+            if 'distancia' in ataque:
+                distancias.append(ataque['distancia'])
+            
+            jugador = ataque['jugador']
+            datos = resumen_jugadores.get(jugador)
+            if datos is None:
+                datos = resumen_jugadores[jugador] = {
+                    'total_ataques': 0,
+                    'total_tropas': 0,
+                    'tipo_off': ataque.get('tipo_off', 'N/A')
+                }
+            datos['total_ataques'] += 1
+            
+            if 'tropas' in ataque:
+                datos['total_tropas'] += _poblacion_tropas(ataque['tropas'])
+        
+        total_ataques += len(objetivo['ataques'])
+        for llamar in por_fin_objetivo:
+            llamar(num_objetivos, objetivo, distancias)
+        
+        objetivo = next(iterador, None)
+    
+    agregados = {
+        'resumen_jugadores': resumen_jugadores,
+        'total_ataques': total_ataques,
+        'num_objetivos': num_objetivos
+    }
+    
+    for salida in salidas:
+        salida.final(plan, agregados)
+        salida.volcar()
+    
+    return agregados
+
+
+def exportar_comandos_texto(plan, ruta_archivo):
+    """
+    Exporta comandos en formato de texto simple.
+    
+    Args:
+        plan: diccionario con el plan de ataque
+        ruta_archivo: ruta donde guardar el archivo
+    """
+    exportar_plan(plan, [SalidaTexto(ruta_archivo)])
+
+
+def exportar_para_copiar(plan, ruta_archivo):
+    """
+    Exporta en formato simple para copiar/pegar coordenadas en GT.
+    
+    Args:
+        plan: plan de ataque
+        ruta_archivo: archivo de salida
+    """
+    exportar_plan(plan, [SalidaCoordenadas(ruta_archivo)])
+
+
+def exportar_bbcode(plan, ruta_archivo):
+    """
+    Exporta el plan en formato BBCode para foros.
     
-    print(f"✅ BBCode exportado a: {ruta_archivo}")
+    Args:
+        plan: plan de ataque
+        ruta_archivo: archivo de salida
+    """
+    exportar_plan(plan, [SalidaBBCode(ruta_archivo)])
 
 
 def mostrar_resumen_consola(plan):
@@ -271,39 +533,453 @@ def mostrar_resumen_consola(plan):
     Args:
         plan: plan de ataque
     """
-    print("\n" + "="*80)
-    print("📋 RESUMEN DEL PLAN DE ATAQUE")
-    print("="*80)
+    exportar_plan(plan, [SalidaResumenConsola()])
+
+
+def exportar_todos_formatos(plan, prefijo, objetivos=None):
+    """
+    Exporta texto, coordenadas y BBCode y muestra el resumen en un solo recorrido.
     
-    total_ataques = sum(len(obj['ataques']) for obj in plan['objetivos'])
+    Args:
+        plan: plan de ataque
+        prefijo: ruta base de los archivos (sin extensión)
+        objetivos: (opcional) iterable de objetivos, por ejemplo un LectorPlanJSON
     
-    print(f"\n🎯 Objetivos: {len(plan['objetivos'])}")
-    print(f"⚔️  Total de ataques: {total_ataques}")
+    Returns:
+        list: rutas de los archivos generados
+    """
+    salidas = [
+        SalidaTexto(f"{prefijo}.txt"),
+        SalidaCoordenadas(f"{prefijo}_coordenadas.txt"),
+        SalidaBBCode(f"{prefijo}_bbcode.txt"),
+        SalidaResumenConsola()
+    ]
+    exportar_plan(plan, salidas, objetivos)
+    return [salida.ruta_archivo for salida in salidas if salida.ruta_archivo]
+
+
+# Límite por defecto de cada mensaje BBCode (bytes UTF-8)
+LIMITE_BBCODE_POR_DEFECTO = 10000
+
+
+def _bytes_utf8(texto):
+    return len(texto.encode('utf-8'))
+
+
+class _PaginadorBBCode:
+    """
+    Reparte bloques y filas de tabla BBCode en partes de tamaño limitado.
+    
+    Nunca corta una fila: si no cabe, cierra la tabla, termina la parte
+    y la reabre en la siguiente con su cabecera de continuación.
+    """
+    
+    def __init__(self, limite_bytes, cabecera_inicial):
+        self.limite_bytes = limite_bytes
+        self.numero = 1
+        self._partes = [cabecera_inicial]
+        self._tamano = _bytes_utf8(cabecera_inicial)
+        self._tabla = None
+        self._tabla_en_parte = False
+    
+    def _cabe(self, tamano):
+        return self._tamano + tamano <= self.limite_bytes
+    
+    def _agregar(self, texto, tamano):
+        self._partes.append(texto)
+        self._tamano += tamano
     
-    if plan.get('pueblos_sin_asignar'):
-        print(f"📍 Pueblos sin asignar: {len(plan['pueblos_sin_asignar'])}")
+    def _cortar(self):
+        """Termina la parte actual y empieza la siguiente"""
+        if self._tabla and self._tabla_en_parte:
+            self._partes.append(self._tabla['cierre'])
+        parte = ''.join(self._partes)
+        
+        self.numero += 1
+        cabecera = f"[b][size=14]PLAN DE ATAQUE (parte {self.numero})[/size][/b]\n\n"
+        self._partes = [cabecera]
+        self._tamano = _bytes_utf8(cabecera)
+        self._tabla_en_parte = False
+        return parte
     
-    if 'hora_llegada_objetivo' in plan:
-        print(f"⏰ Hora de llegada: {plan['hora_llegada_objetivo']}")
+    def bloque(self, texto):
+        """
+        Añade un bloque que no se puede partir.
+        
+        Returns:
+            str: parte completada (o None)
+        """
+        tamano = _bytes_utf8(texto)
+        parte = None
+        if not self._cabe(tamano) and len(self._partes) > 1:
+            parte = self._cortar()
+        if not self._cabe(tamano):
+            raise ValueError(f"El límite de {self.limite_bytes} bytes es demasiado pequeño para un bloque de {tamano} bytes")
+        self._agregar(texto, tamano)
+        return parte
     
-    print("\n" + "-"*80)
+    def abrir_tabla(self, titulo, titulo_continuacion, cabecera, cierre="[/table]\n"):
+        """Registra una tabla; su título se escribe junto con la primera fila"""
+        self._tabla = {
+            'titulo': titulo + cabecera,
+            'continuacion': titulo_continuacion + cabecera,
+            'cierre': cierre,
+            'tamano_cierre': _bytes_utf8(cierre)
+        }
+        self._tabla_en_parte = False
+        self._titulo_escrito = False
     
-    for idx, objetivo in enumerate(plan['objetivos'], 1):
-        print(f"\nObjetivo {idx}: {objetivo['nombre']} ({objetivo['coordenadas']})")
-        print(f"  Ataques: {len(objetivo['ataques'])}")
+    def fila(self, texto):
+        """
+        Añade una fila a la tabla abierta.
         
-        if objetivo['ataques']:
-            distancias = [a['distancia'] for a in objetivo['ataques']]
-            print(f"  Distancia promedio: {sum(distancias)/len(distancias):.2f} campos")
-            print(f"  Distancia min/max: {min(distancias):.2f} / {max(distancias):.2f}")
+        Returns:
+            str: parte completada (o None)
+        """
+        tabla = self._tabla
+        parte = None
+        
+        for intento in range(2):
+            necesario = _bytes_utf8(texto) + tabla['tamano_cierre']
+            if not self._tabla_en_parte:
+                encabezado = tabla['continuacion'] if self._titulo_escrito else tabla['titulo']
+                necesario += _bytes_utf8(encabezado)
+            
+            if self._cabe(necesario):
+                if not self._tabla_en_parte:
+                    self._agregar(encabezado, _bytes_utf8(encabezado))
+                    self._tabla_en_parte = True
+                    self._titulo_escrito = True
+                self._agregar(texto, _bytes_utf8(texto))
+                return parte
+            
+            if intento == 0 and len(self._partes) > 1:
+                parte = self._cortar()
+            else:
+                break
+        
+        raise ValueError(f"El límite de {self.limite_bytes} bytes es demasiado pequeño para una fila de la tabla")
+    
+    def cerrar_tabla(self):
+        """
+        Cierra la tabla abierta (el cierre ya estaba reservado).
+        
+        Returns:
+            str: parte completada (o None)
+        """
+        tabla = self._tabla
+        parte = None
+        if not self._titulo_escrito:
+            # Tabla sin filas: título, cabecera y cierre van juntos
+            parte = self.bloque(tabla['titulo'] + tabla['cierre'])
+        elif self._tabla_en_parte:
+            self._agregar(tabla['cierre'], tabla['tamano_cierre'])
+        self._tabla = None
+        self._tabla_en_parte = False
+        return parte
+    
+    def terminar(self):
+        """
+        Returns:
+            str: última parte
+        """
+        return ''.join(self._partes)
+
+
+def generar_bbcode_por_partes(plan, limite_bytes=LIMITE_BBCODE_POR_DEFECTO, objetivos=None):
+    """
+    Genera el plan en BBCode como partes autocontenidas de tamaño limitado.
+    
+    Es un generador: cada parte se produce en cuanto se completa, sin
+    generar el plan entero. Ninguna fila se corta y cada parte cierra
+    sus tablas; las tablas partidas se reabren con un título de continuación.
+    
+    Args:
+        plan: plan de ataque (o los metadatos si los objetivos llegan aparte)
+        limite_bytes: tamaño máximo de cada parte en bytes UTF-8
+        objetivos: (opcional) iterable de objetivos, por ejemplo un LectorPlanJSON
+    
+    Yields:
+        str: cada parte del BBCode
+    """
+    iterador = iter(plan['objetivos'] if objetivos is None else objetivos)
+    primero = next(iterador, None)
+    mundo = plan.get('mundo', 'es95')
+    
+    cabecera = "[b][size=14]PLAN DE ATAQUE[/size][/b]\n\n"
+    if 'ventana_llegada' in plan:
+        cabecera += f"[b]⏰ Ventana de llegada:[/b] {plan['ventana_llegada']['inicio']} - {plan['ventana_llegada']['fin']}\n"
+        cabecera += f"[b]🎯 Objetivo central:[/b] {plan['ventana_llegada']['objetivo']}\n\n"
+    elif 'hora_llegada_objetivo' in plan:
+        cabecera += f"[b]🎯 Hora de llegada:[/b] {plan['hora_llegada_objetivo']}\n\n"
+    
+    paginador = _PaginadorBBCode(limite_bytes, cabecera)
+    resumen_jugadores = {}
+    
+    idx = 0
+    objetivo = primero
+    while objetivo is not None:
+        idx += 1
+        paginador.abrir_tabla(
+            f"[b][size=12]Objetivo #{idx}: {objetivo['nombre']}[/size][/b]\n"
+            f"[b]Coordenadas:[/b] [coord]{objetivo['coordenadas']}[/coord]\n"
+            f"[b]Ataques:[/b] {len(objetivo['ataques'])}\n\n",
+            f"[b][size=12]Objetivo #{idx}: {objetivo['nombre']} (continuación)[/size][/b]\n"
+            f"[b]Coordenadas:[/b] [coord]{objetivo['coordenadas']}[/coord]\n\n",
+            _cabecera_tabla_bbcode(objetivo),
+            "[/table]\n\n"
+        )
+        
+        for ataque in objetivo['ataques']:
+            parte = paginador.fila(_fila_bbcode(ataque, mundo))
+            if parte:
+                yield parte
+            
+            datos = resumen_jugadores.setdefault(ataque['jugador'], {'total_ataques': 0, 'total_tropas': 0})
+            datos['total_ataques'] += 1
+            if 'tropas' in ataque:
+                datos['total_tropas'] += _poblacion_tropas(ataque['tropas'])
+        
+        parte = paginador.cerrar_tabla()
+        if parte:
+            yield parte
+        
+        objetivo = next(iterador, None)
+    
+    if resumen_jugadores:
+        paginador.abrir_tabla(
+            "[b][size=12]📊 RESUMEN POR JUGADOR[/size][/b]\n\n",
+            "[b][size=12]📊 RESUMEN POR JUGADOR (continuación)[/size][/b]\n\n",
+            "[table]\n[**]Jugador[||]Ofensivas[||]Total Tropas[/**]\n"
+        )
+        for jugador, datos in sorted(resumen_jugadores.items(), key=lambda x: x[1]['total_ataques'], reverse=True):
+            total_tropas = f"{datos['total_tropas']:,}" if datos['total_tropas'] > 0 else "-"
+            parte = paginador.fila(f"[*][player]{jugador}[/player][|]{datos['total_ataques']}[|]{total_tropas}\n")
+            if parte:
+                yield parte
+        parte = paginador.cerrar_tabla()
+        if parte:
+            yield parte
     
     if 'balance_jugadores' in plan:
-        print("\n" + "-"*80)
-        print("\n⚖️  Balance de ataques por jugador:")
-        for jugador, ataques in sorted(plan['balance_jugadores'].items(), key=lambda x: x[1], reverse=True):
-            print(f"  {jugador}: {ataques} ataques")
+        parte = paginador.bloque("\n[b]Balance de ataques:[/b]\n")
+        if parte:
+            yield parte
+        for jugador, ataques in plan['balance_jugadores'].items():
+            parte = paginador.bloque(f"• {jugador}: {ataques} ataques\n")
+            if parte:
+                yield parte
+    
+    yield paginador.terminar()
+
+
+def exportar_bbcode_por_partes(plan, ruta_base, limite_bytes=LIMITE_BBCODE_POR_DEFECTO):
+    """
+    Exporta el plan en BBCode partido en archivos de tamaño limitado.
+    
+    Args:
+        plan: plan de ataque
+        ruta_base: ruta base de los archivos (se añade _parteN.txt)
+        limite_bytes: tamaño máximo de cada parte en bytes UTF-8
+    
+    Returns:
+        list: rutas de los archivos generados
+    """
+    rutas = []
+    for numero, parte in enumerate(generar_bbcode_por_partes(plan, limite_bytes), 1):
+        ruta = f"{ruta_base}_parte{numero}.txt"
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(parte)
+        rutas.append(ruta)
+    
+    print(f"✅ BBCode exportado en {len(rutas)} partes (máx. {limite_bytes} bytes): {ruta_base}_parte*.txt")
+    return rutas
+
+
+# Formatos de hora_envio que generan los asignadores (con y sin milisegundos)
+_FORMATOS_HORA_ENVIO = ('%Y-%m-%d %H:%M:%S:%f', '%d/%m/%Y %H:%M:%S:%f', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M:%S')
+
+FORMATOS_POR_JUGADOR = ('texto', 'bbcode', 'envios')
+
+
+def _clave_orden_envio(ataque):
+    """
+    Clave para ordenar ataques por hora de envío.
+    
+    Si el ataque no tiene hora de envío, se ordena por tiempo de viaje
+    descendente (el más largo se lanza primero).
+    
+    Args:
+        ataque: diccionario del ataque
+    
+    Returns:
+        tuple: clave de ordenación
+    """
+    if 'hora_envio_ms' in ataque:
+        return (0, ataque['hora_envio_ms'], 0)
+    hora_envio = ataque.get('hora_envio')
+    if hora_envio:
+        # En ventanas de llegada la hora es un rango "inicio hasta fin"
+        hora_envio = hora_envio.split(' hasta ')[0]
+        for formato in _FORMATOS_HORA_ENVIO:
+            try:
+                return (0, datetime_a_ms(datetime.strptime(hora_envio, formato)), 0)
+            except ValueError:
+                continue
+    return (1, 0, -ataque.get('tiempo_viaje_minutos', 0))
+
+
+def _nombre_archivo_jugador(jugador, usados):
+    """
+    Convierte un nombre de jugador en un nombre de archivo seguro y único.
+    
+    Args:
+        jugador: nombre del jugador
+        usados: conjunto de nombres ya usados (se actualiza)
+    
+    Returns:
+        str: nombre base del archivo
+    """
+    base = re.sub(r'[^\w\-]+', '_', jugador).strip('_') or 'jugador'
+    nombre = base
+    sufijo = 2
+    while nombre.lower() in usados:
+        nombre = f"{base}_{sufijo}"
+        sufijo += 1
+    usados.add(nombre.lower())
+    return nombre
+
+
+def _ordenes_texto(jugador, ordenes, plan):
+    partes = [
+        "=" * 80 + "\n",
+        f"ÓRDENES DE {jugador}\n",
+        "=" * 80 + "\n\n",
+        f"Ataques: {len(ordenes)}\n"
+    ]
+    if 'ventana_llegada' in plan:
+        partes.append(f"⏰ Ventana de llegada: {plan['ventana_llegada']['inicio']} - {plan['ventana_llegada']['fin']}\n")
+        if 'bonus_noche' in plan['ventana_llegada']:
+            partes.append(f"🌙 Sin llegadas en el bonus de noche ({plan['ventana_llegada']['bonus_noche']})\n")
+    elif 'hora_llegada_objetivo' in plan:
+        partes.append(f"🎯 Hora de llegada objetivo: {plan['hora_llegada_objetivo']}\n")
+    partes.append("\n")
+    
+    for i, (ataque, objetivo) in enumerate(ordenes, 1):
+        partes.append(f"  Ataque {i}:\n")
+        if 'hora_envio' in ataque:
+            partes.append(f"    ⏰ Enviar a las: {ataque['hora_envio']}\n")
+        partes.append(f"    Desde: {ataque['pueblo_atacante']} ({ataque['nombre_pueblo']})\n")
+        partes.append(f"    Hacia: {objetivo['coordenadas']} ({objetivo['nombre']})\n")
+        if 'tipo_off' in ataque:
+            partes.append(f"    Tipo: {ataque['tipo_off']}\n")
+        if 'rol' in ataque:
+            partes.append(f"    Tren: {ataque['rol']} (llega en {ataque['orden']}º lugar)\n")
+        if 'oleada' in ataque:
+            partes.append(f"    Oleada: {ataque['oleada']} (vuelve a las {ataque['hora_regreso']})\n")
+        if ataque.get('fake'):
+            partes.append(f"    Fake: enviar solo 1 {ataque['tropa_lenta']}\n")
+        if ataque.get('apoyo'):
+            partes.append(f"    Apoyo: llega antes del ataque de las {ataque['llegada_entrante']}\n")
+        if 'tropa_lenta' in ataque:
+            partes.append(f"    Tiempo: {ataque['tiempo_viaje']} ({ataque['tropa_lenta']})\n")
+        else:
+            partes.append(f"    Tiempo: {ataque['tiempo_viaje']}\n")
+        partes.append(f"    Moral: {ataque['moral']}%\n\n")
+    
+    return ''.join(partes)
+
+
+def _ordenes_bbcode(jugador, ordenes, plan):
+    mundo = plan.get('mundo', 'es95')
+    con_hora = any('hora_envio' in ataque for ataque, _ in ordenes)
+    
+    partes = [f"[b][size=12]Órdenes de [player]{jugador}[/player][/size][/b]\n\n"]
+    if 'ventana_llegada' in plan:
+        partes.append(f"[b]⏰ Ventana de llegada:[/b] {plan['ventana_llegada']['inicio']} - {plan['ventana_llegada']['fin']}\n\n")
+    elif 'hora_llegada_objetivo' in plan:
+        partes.append(f"[b]🎯 Hora de llegada:[/b] {plan['hora_llegada_objetivo']}\n\n")
+    
+    partes.append("[table]\n[**]Desde[||]Objetivo[||]Tropas[||]Moral")
+    if con_hora:
+        partes.append("[||]Hora Envío")
+    partes.append("[||]Lanzar[/**]\n")
+    
+    for ataque, objetivo in ordenes:
+        partes.append(
+            f"[*][coord]{ataque['pueblo_atacante']}[/coord]"
+            f"[|][coord]{objetivo['coordenadas']}[/coord]"
+            f"[|]{_tropas_bbcode(ataque)}"
+            f"[|]{ataque['moral']}%"
+        )
+        if con_hora:
+            partes.append(f"[|]{ataque.get('hora_envio', '-')}")
+        partes.append(f"[|]{_lanzar_bbcode(ataque, mundo)}\n")
+    
+    partes.append("[/table]\n")
+    return ''.join(partes)
+
+
+def _ordenes_envios(jugador, ordenes, plan):
+    partes = [f"# {jugador} - {len(ordenes)} envíos\n"]
+    for ataque, objetivo in ordenes:
+        hora = ataque.get('hora_envio', ataque['tiempo_viaje'])
+        partes.append(f"{hora} | {ataque['pueblo_atacante']} -> {objetivo['coordenadas']} | {ataque['nombre_pueblo']}\n")
+    return ''.join(partes)
+
+
+_GENERADORES_POR_JUGADOR = {
+    'texto': _ordenes_texto,
+    'bbcode': _ordenes_bbcode,
+    'envios': _ordenes_envios
+}
+
+
+def exportar_por_jugador(plan, carpeta, formato='bbcode', max_hilos=None):
+    """
+    Exporta un archivo por jugador atacante con sus órdenes ordenadas por hora de envío.
+    
+    Los ataques se reparten por jugador en un solo recorrido del plan y
+    la generación/escritura de los archivos se reparte en un grupo de hilos.
+    
+    Args:
+        plan: plan de ataque
+        carpeta: carpeta de salida (se crea si no existe)
+        formato: 'texto', 'bbcode' o 'envios' (lista de envíos de una línea)
+        max_hilos: (opcional) número máximo de hilos de escritura
+    
+    Returns:
+        dict: {jugador: ruta_archivo}
+    """
+    if formato not in _GENERADORES_POR_JUGADOR:
+        raise ValueError(f"Formato desconocido: {formato}. Usa uno de {', '.join(FORMATOS_POR_JUGADOR)}")
+    
+    generar = _GENERADORES_POR_JUGADOR[formato]
+    
+    # Un solo recorrido: repartir los ataques por jugador
+    por_jugador = {}
+    for objetivo in plan['objetivos']:
+        for ataque in objetivo['ataques']:
+            por_jugador.setdefault(ataque['jugador'], []).append((ataque, objetivo))
+    
+    os.makedirs(carpeta, exist_ok=True)
+    usados = set()
+    rutas = {
+        jugador: os.path.join(carpeta, f"{_nombre_archivo_jugador(jugador, usados)}.txt")
+        for jugador in por_jugador
+    }
+    
+    def escribir_jugador(jugador):
+        ordenes = sorted(por_jugador[jugador], key=lambda orden: _clave_orden_envio(orden[0]))
+        with open(rutas[jugador], 'w', encoding='utf-8') as f:
+            f.write(generar(jugador, ordenes, plan))
+    
+    with ThreadPoolExecutor(max_workers=max_hilos) as ejecutor:
+        # list() propaga cualquier error de escritura
+        list(ejecutor.map(escribir_jugador, por_jugador))
     
-    print("\n" + "="*80)
+    print(f"✅ {len(rutas)} archivos de jugador exportados a: {carpeta}")
+    return rutas
 
 
 if __name__ == "__main__":
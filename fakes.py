@@ -0,0 +1,297 @@
+"""
+Módulo de fakes masivos
+Reparte ataques con tropa mínima desde todos los pueblos disponibles
+sobre listas grandes de objetivos, para esconder los ataques reales
+"""
+
+from datetime import datetime
+
+from asignador import crear_ataque, formatear_horas_plan, formato_fecha_plan
+from calculadora import calcular_moral, coordenadas_a_string
+from config_mundos import segundos_por_campo
+from indice_espacial import IndiceEspacial
+
+# NumPy es opcional: si está instalado, las distancias se calculan por lotes
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Unidad de los fakes (1 ariete) y fakes por pueblo por defecto
+TROPA_FAKE = 'ariete'
+FAKES_POR_PUEBLO = 5
+
+
+def ventana_de_plan(plan):
+    """
+    Ventana de llegada de un plan real en milisegundos.
+    
+    Returns:
+        tuple: (inicio_ms, fin_ms) de las llegadas del plan, o None si no tiene horas
+    """
+    inicio = fin = None
+    for objetivo in plan['objetivos']:
+        for ataque in objetivo['ataques']:
+            if 'hora_llegada_ms' not in ataque:
+                continue
+            llegada = ataque['hora_llegada_ms']
+            hasta = ataque.get('hora_llegada_hasta_ms', llegada)
+            inicio = llegada if inicio is None else min(inicio, llegada)
+            fin = hasta if fin is None else max(fin, hasta)
+    return None if inicio is None else (inicio, fin)
+
+
+def pueblos_para_fakes(pueblos, mundo=None, usar_api=True):
+    """
+    Todos los pueblos de los jugadores de la lista, para enviar fakes.
+    
+    Con la API se añaden los pueblos no ofensivos de esos jugadores (los
+    fakes solo necesitan una unidad); sin ella se usan los de la lista.
+    
+    Args:
+        pueblos: pueblos ofensivos (del CSV)
+        mundo: código del mundo para consultar la API
+        usar_api: si True, consulta la API
+    
+    Returns:
+        list: pueblos sin coordenadas repetidas (primero los de la lista)
+    """
+    todos = list(pueblos)
+    if not (mundo and usar_api):
+        return todos
+    
+    try:
+        from api_gt import APIGuerrasTribales
+        
+        api = APIGuerrasTribales(mundo)
+        conocidas = {pueblo['coordenadas'] for pueblo in todos}
+        nuevos = [p for p in api.pueblos_de_jugadores({p['jugador'] for p in todos}) if p['coordenadas'] not in conocidas]
+        todos.extend(nuevos)
+        print(f"✅ {len(nuevos)} pueblos no ofensivos añadidos para fakes desde la API")
+    except ImportError:
+        print("⚠️  Módulo api_gt no disponible")
+    except Exception as e:
+        print(f"⚠️  Error al consultar API: {e}")
+    
+    return todos
+
+
+def _cercanos_numpy(xs, ys, coordenadas, limite, bloque):
+    """
+    (d2, índice de pueblo) por orden de distancia a unas coordenadas.
+    
+    Se ordenan bloques de los más cercanos (np.partition) en lugar de toda
+    la lista, así que un objetivo que solo necesita unos pocos fakes no
+    ordena miles de pueblos. Con la misma distancia se respeta el orden de
+    la lista de pueblos, igual que IndiceEspacial.cercanos().
+    """
+    ox, oy = coordenadas
+    posiciones = np.arange(len(xs))
+    ultimo = None
+    while True:
+        d2 = (xs - ox) ** 2 + (ys - oy) ** 2
+        mascara = np.ones(len(xs), dtype=bool) if limite is None else d2 <= limite
+        if ultimo is not None:
+            d2_ultimo, p_ultimo = ultimo
+            mascara &= (d2 > d2_ultimo) | ((d2 == d2_ultimo) & (posiciones > p_ultimo))
+        quedan = np.flatnonzero(mascara)
+        if not len(quedan):
+            return
+        
+        if len(quedan) > bloque:
+            # Umbral del bloque; los empates con él entran todos para no saltarse ninguno
+            umbral = np.partition(d2[quedan], bloque - 1)[bloque - 1]
+            quedan = quedan[d2[quedan] <= umbral]
+        orden = quedan[np.argsort(d2[quedan], kind='stable')]
+        
+        distancias = d2[orden].tolist()
+        indices = orden.tolist()
+        yield from zip(distancias, indices)
+        ultimo = (distancias[-1], indices[-1])
+        bloque *= 2
+
+
+def _candidatos_numpy(pueblos, objetivos, pedidos, distancia_max):
+    """Candidatos de cada objetivo con NumPy (bloques de varias veces lo pedido)"""
+    xs = np.fromiter((p['coordenadas'][0] for p in pueblos), dtype=np.int64, count=len(pueblos))
+    ys = np.fromiter((p['coordenadas'][1] for p in pueblos), dtype=np.int64, count=len(pueblos))
+    limite = None if distancia_max is None else distancia_max * distancia_max
+    return [_cercanos_numpy(xs, ys, objetivo['coordenadas'], limite, max(64, 4 * pedido))
+            for objetivo, pedido in zip(objetivos, pedidos)]
+
+
+def _candidatos_indice(pueblos, objetivos, pedidos, distancia_max):
+    """Candidatos de cada objetivo recorriendo la rejilla en anillos (sin NumPy)"""
+    indice = IndiceEspacial(pueblos)
+    posicion = {id(pueblo): i for i, pueblo in enumerate(pueblos)}
+    return [((d2, posicion[id(pueblo)]) for d2, pueblo in indice.cercanos(objetivo['coordenadas'], distancia_max))
+            for objetivo in objetivos]
+
+
+def planificar_fakes(pueblos, objetivos, fakes_por_objetivo=10, limite_por_pueblo=FAKES_POR_PUEBLO, ventana_ms=None,
+                     mundo='es95', tropa=TROPA_FAKE, distancia_max=None, plan_real=None):
+    """
+    Reparte fakes (un ataque con tropa mínima) sobre muchos objetivos.
+    
+    Los fakes se asignan por rondas: en cada ronda cada objetivo que aún
+    necesita fakes recibe el pueblo más cercano con fakes libres que todavía
+    no le ha atacado, así que los objetivos se reparten los pueblos cercanos
+    en lugar de agotarlos los primeros de la lista. Cada objetivo recorre sus
+    candidatos una sola vez, ordenados por distancia (con NumPy, por bloques;
+    sin NumPy, con el índice espacial). Las llegadas se reparten a lo largo
+    de la ventana, que por defecto es la del plan real.
+    
+    Args:
+        pueblos: pueblos que pueden enviar fakes (ofensivos o no)
+        objetivos: lista de objetivos
+        fakes_por_objetivo: int o dict {coord_string: numero}
+        limite_por_pueblo: fakes máximos que envía cada pueblo
+        ventana_ms: (opcional) (inicio_ms, fin_ms) de llegada
+        mundo: identificador del mundo
+        tropa: unidad que viaja en el fake (por defecto ariete)
+        distancia_max: (opcional) distancia máxima de un fake
+        plan_real: (opcional) plan real: se toma su ventana de llegada y no se
+                   usan sus pueblos atacantes
+    
+    Returns:
+        dict: plan de fakes (ataques con 'fake': True)
+    """
+    if plan_real is not None:
+        if ventana_ms is None:
+            ventana_ms = ventana_de_plan(plan_real)
+        ocupados = {ataque['pueblo_atacante'] for objetivo in plan_real['objetivos'] for ataque in objetivo['ataques']}
+        pueblos = [p for p in pueblos if coordenadas_a_string(p['coordenadas']) not in ocupados]
+    else:
+        pueblos = list(pueblos)
+    
+    plan = {
+        'fecha_creacion': datetime.now().isoformat(),
+        'mundo': mundo,
+        'tipo_tropa': tropa,
+        'objetivos': [],
+        'pueblos_sin_asignar': [],
+        'fakes': {
+            'total': 0,
+            'limite_por_pueblo': limite_por_pueblo,
+            'pueblos_usados': 0,
+            'objetivos_incompletos': []
+        }
+    }
+    
+    pedidos = []
+    for objetivo in objetivos:
+        if isinstance(fakes_por_objetivo, dict):
+            pedidos.append(fakes_por_objetivo.get(coordenadas_a_string(objetivo['coordenadas']), 0))
+        else:
+            pedidos.append(fakes_por_objetivo)
+    
+    # Candidatos de cada objetivo por distancia (iteradores perezosos de (d2, índice de pueblo))
+    generar = _candidatos_numpy if np is not None else _candidatos_indice
+    candidatos = generar(pueblos, objetivos, pedidos, distancia_max) if pueblos else [iter(()) for _ in objetivos]
+    
+    libres = [limite_por_pueblo] * len(pueblos)
+    asignados = [[] for _ in objetivos]
+    activos = [i for i, cantidad in enumerate(pedidos) if cantidad > 0]
+    
+    # Rondas: un fake por objetivo activo en cada ronda
+    while activos:
+        siguientes = []
+        for i in activos:
+            for d2, p in candidatos[i]:
+                if libres[p] > 0:
+                    libres[p] -= 1
+                    asignados[i].append((d2, p))
+                    if len(asignados[i]) < pedidos[i]:
+                        siguientes.append(i)
+                    break
+            # Sin más candidatos: el objetivo queda incompleto
+        activos = siguientes
+    
+    # Tiempos de viaje por lotes
+    segundos = segundos_por_campo(tropa, mundo)
+    todos_d2 = [d2 for lista in asignados for d2, _ in lista]
+    if np is not None:
+        distancias = np.sqrt(np.asarray(todos_d2, dtype=np.float64)).tolist()
+    else:
+        distancias = [d2 ** 0.5 for d2 in todos_d2]
+    
+    posicion = 0
+    for i, objetivo in enumerate(objetivos):
+        ataques = []
+        cantidad = len(asignados[i])
+        for k, (_, p) in enumerate(asignados[i]):
+            pueblo = pueblos[p]
+            distancia = distancias[posicion]
+            posicion += 1
+            llegada_ms = None
+            if ventana_ms is not None:
+                # Llegadas repartidas a lo largo de la ventana
+                inicio, fin = ventana_ms
+                llegada_ms = inicio + (fin - inicio) * (k + 1) // (cantidad + 1)
+            moral = calcular_moral(pueblo.get('puntos_jugador', 0), objetivo.get('puntos_defensor', 0))
+            ataques.append(crear_ataque(pueblo, objetivo, distancia, distancia * segundos / 60,
+                                        round(distancia * segundos * 1000), moral, llegada_ms, tropa,
+                                        campos_pueblo=('village_id',), fake=True))
+        
+        if cantidad < pedidos[i]:
+            plan['fakes']['objetivos_incompletos'].append({
+                'coordenadas': coordenadas_a_string(objetivo['coordenadas']),
+                'fakes_asignados': cantidad,
+                'fakes_pedidos': pedidos[i]
+            })
+        
+        plan['objetivos'].append({
+            'coordenadas': coordenadas_a_string(objetivo['coordenadas']),
+            'nombre': objetivo['nombre'],
+            'jugador_defensor': objetivo.get('jugador_defensor', 'Desconocido'),
+            'ataques': ataques,
+            'ataques_asignados': cantidad
+        })
+    
+    if ventana_ms is not None:
+        formatear_horas_plan(plan, '%d/%m/%Y')
+    
+    plan['fakes']['total'] = len(todos_d2)
+    plan['fakes']['pueblos_usados'] = sum(1 for restantes in libres if restantes < limite_por_pueblo)
+    plan['pueblos_sin_asignar'] = [
+        {
+            'coordenadas': coordenadas_a_string(p['coordenadas']),
+            'nombre': p['nombre'],
+            'jugador': p['jugador']
+        }
+        for p, restantes in zip(pueblos, libres) if restantes == limite_por_pueblo
+    ]
+    
+    resumen = plan['fakes']
+    print(f"🎭 {resumen['total']} fakes desde {resumen['pueblos_usados']} pueblos "
+          f"({len(resumen['objetivos_incompletos'])} objetivos incompletos)")
+    return plan
+
+
+def anadir_fakes_al_plan(plan, plan_fakes):
+    """
+    Mezcla los fakes en el plan real para exportar una sola lista de órdenes.
+    
+    Los fakes a un objetivo del plan se añaden a sus ataques; el resto de
+    objetivos de fakes se añaden al final.
+    
+    Args:
+        plan: plan real (se modifica en el sitio)
+        plan_fakes: plan generado por planificar_fakes
+    """
+    formato = formato_fecha_plan(plan)
+    
+    por_coordenadas = {objetivo['coordenadas']: objetivo for objetivo in plan['objetivos']}
+    for objetivo_fake in plan_fakes['objetivos']:
+        if not objetivo_fake['ataques']:
+            continue
+        objetivo = por_coordenadas.get(objetivo_fake['coordenadas'])
+        if objetivo is None:
+            plan['objetivos'].append(objetivo_fake)
+        else:
+            objetivo['ataques'].extend(objetivo_fake['ataques'])
+            objetivo['ataques_asignados'] = len(objetivo['ataques'])
+    plan['fakes'] = plan_fakes['fakes']
+    
+    # Las horas de los fakes con el mismo formato de fecha que el plan
+    formatear_horas_plan(plan, formato)
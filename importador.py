@@ -210,8 +210,9 @@ def leer_csv_ofensivas(ruta_archivo, filtro_tipo=None, mundo=None, usar_api=True
 def leer_pueblos_desde_archivo(ruta_archivo):
     """
     Lee pueblos desde un archivo de texto.
-    Formato esperado: coordenadas|nombre_pueblo|nombre_jugador|puntos_jugador
+    Formato esperado: coordenadas|nombre_pueblo|nombre_jugador|puntos_jugador[|nobles]
     Ejemplo: 500|500|Pueblo1|jugador1|50000
+    Con nobles (para trenes): 500|500|Pueblo1|jugador1|50000|4
     
     Args:
         ruta_archivo: ruta al archivo con los datos
@@ -246,6 +247,8 @@ def leer_pueblos_desde_archivo(ruta_archivo):
                         'jugador': partes[3] if len(partes) > 3 else "Desconocido",
                         'puntos_jugador': int(partes[4]) if len(partes) > 4 else 0
                     }
+                    if len(partes) > 5:
+                        pueblo['nobles'] = int(partes[5])
                     
                     pueblos.append(pueblo)
                     
@@ -575,6 +578,249 @@ def cargar_plan_json(ruta_archivo):
         return None
 
 
+def _json_compacto(valor):
+    return json.dumps(valor, ensure_ascii=False, separators=(', ', ': '))
+
+
+class EscritorPlanJSON:
+    """
+    Escribe un plan JSON de forma incremental, objetivo a objetivo.
+
+    El archivo resultante es JSON estándar compatible con cargar_plan_json():
+    primero los metadatos, después la lista 'objetivos' y al final los
+    campos de cierre (pueblos_sin_asignar, estadísticas, etc.).
+    """
+
+    def __init__(self, ruta_archivo, metadatos=None):
+        """
+        Abre el archivo de salida.
+
+        Args:
+            ruta_archivo: ruta donde guardar el plan
+            metadatos: (opcional) campos del plan a escribir antes de los objetivos
+        """
+        self.ruta_archivo = ruta_archivo
+        self.objetivos_escritos = 0
+        self._metadatos = dict(metadatos or {})
+        self._finales = {}
+        self._cabecera_escrita = False
+        self._objetivo_abierto = False
+        self._ataques_objetivo = 0
+        self._archivo = open(ruta_archivo, 'w', encoding='utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_excepcion, *args):
+        if tipo_excepcion is None:
+            self.cerrar()
+        else:
+            self._archivo.close()
+
+    def actualizar_metadatos(self, campos):
+        """
+        Añade campos de cabecera. Solo es posible antes del primer objetivo.
+
+        Args:
+            campos: diccionario con los campos a añadir
+        """
+        if self._cabecera_escrita:
+            raise ValueError("Los metadatos ya se escribieron, usa actualizar_finales()")
+        self._metadatos.update(campos)
+
+    def actualizar_finales(self, campos):
+        """
+        Añade campos que se escribirán después de la lista de objetivos.
+
+        Args:
+            campos: diccionario con los campos a añadir
+        """
+        self._finales.update(campos)
+
+    def _escribir_cabecera(self):
+        if self._cabecera_escrita:
+            return
+        self._archivo.write("{\n")
+        for clave, valor in self._metadatos.items():
+            self._archivo.write(f"  {_json_compacto(clave)}: {_json_compacto(valor)},\n")
+        self._archivo.write('  "objetivos": [')
+        self._cabecera_escrita = True
+
+    def _separador_objetivo(self):
+        if self._objetivo_abierto:
+            raise ValueError("Hay un objetivo abierto, llama a cerrar_objetivo() primero")
+        self._escribir_cabecera()
+        self._archivo.write(",\n    " if self.objetivos_escritos else "\n    ")
+        self.objetivos_escritos += 1
+
+    def escribir_objetivo(self, objetivo):
+        """
+        Escribe un objetivo completo (con sus ataques).
+
+        Args:
+            objetivo: diccionario del objetivo
+        """
+        self._separador_objetivo()
+        self._archivo.write(_json_compacto(objetivo))
+
+    def abrir_objetivo(self, campos):
+        """
+        Empieza un objetivo cuyos ataques se escribirán uno a uno.
+
+        Args:
+            campos: campos del objetivo (sin 'ataques')
+        """
+        self._separador_objetivo()
+        self._archivo.write("{")
+        for clave, valor in campos.items():
+            if clave != 'ataques':
+                self._archivo.write(f"{_json_compacto(clave)}: {_json_compacto(valor)}, ")
+        self._archivo.write('"ataques": [')
+        self._objetivo_abierto = True
+        self._ataques_objetivo = 0
+
+    def escribir_ataque(self, ataque):
+        """
+        Escribe un ataque del objetivo abierto.
+
+        Args:
+            ataque: diccionario del ataque
+        """
+        if not self._objetivo_abierto:
+            raise ValueError("No hay ningún objetivo abierto, llama a abrir_objetivo() primero")
+        self._archivo.write(",\n      " if self._ataques_objetivo else "\n      ")
+        self._archivo.write(_json_compacto(ataque))
+        self._ataques_objetivo += 1
+
+    def cerrar_objetivo(self, campos=None):
+        """
+        Cierra el objetivo abierto.
+
+        Args:
+            campos: (opcional) campos a añadir tras los ataques.
+                Por defecto se añade 'ataques_asignados' con el número de ataques escritos.
+        """
+        if not self._objetivo_abierto:
+            raise ValueError("No hay ningún objetivo abierto")
+        if campos is None:
+            campos = {'ataques_asignados': self._ataques_objetivo}
+        self._archivo.write("\n    ]" if self._ataques_objetivo else "]")
+        for clave, valor in campos.items():
+            self._archivo.write(f", {_json_compacto(clave)}: {_json_compacto(valor)}")
+        self._archivo.write("}")
+        self._objetivo_abierto = False
+
+    def cerrar(self):
+        """Escribe los campos finales y cierra el archivo"""
+        if self._archivo.closed:
+            return
+        if self._objetivo_abierto:
+            self.cerrar_objetivo()
+        self._escribir_cabecera()
+        self._archivo.write("\n  ]" if self.objetivos_escritos else "]")
+        for clave, valor in self._finales.items():
+            self._archivo.write(f",\n  {_json_compacto(clave)}: {_json_compacto(valor)}")
+        self._archivo.write("\n}\n")
+        self._archivo.close()
+        print(f"✅ Plan guardado en: {self.ruta_archivo} ({self.objetivos_escritos} objetivos)")
+
+
+class LectorPlanJSON:
+    """
+    Lee un plan JSON de forma incremental, devolviendo un objetivo cada vez.
+
+    Funciona con cualquier plan JSON (guardar_plan_json o EscritorPlanJSON):
+    solo mantiene en memoria el objetivo actual y un búfer de lectura.
+    Los campos distintos de 'objetivos' quedan en el atributo 'metadatos'
+    (los que van después de la lista, cuando termina la iteración).
+    """
+
+    def __init__(self, ruta_archivo, tamano_bloque=1 << 16):
+        """
+        Args:
+            ruta_archivo: ruta al archivo JSON
+            tamano_bloque: caracteres leídos en cada lectura del archivo
+        """
+        self.ruta_archivo = ruta_archivo
+        self.tamano_bloque = tamano_bloque
+        self.metadatos = {}
+        self._decodificador = json.JSONDecoder()
+
+    def _leer_mas(self, minimo=0):
+        if self._pos > self.tamano_bloque:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        bloque = self._archivo.read(max(self.tamano_bloque, minimo))
+        if not bloque:
+            self._fin = True
+        self._buffer += bloque
+
+    def _siguiente_caracter(self):
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._fin:
+                raise ValueError(f"Fin de archivo inesperado en {self.ruta_archivo}")
+            self._leer_mas()
+
+    def _esperar(self, caracter):
+        encontrado = self._siguiente_caracter()
+        if encontrado != caracter:
+            raise ValueError(f"Se esperaba '{caracter}' y se encontró '{encontrado}' en {self.ruta_archivo}")
+        self._pos += 1
+
+    def _decodificar(self):
+        self._siguiente_caracter()
+        while True:
+            try:
+                valor, fin = self._decodificador.raw_decode(self._buffer, self._pos)
+                # Un número al final del búfer podría estar cortado
+                if fin < len(self._buffer) or self._fin:
+                    self._pos = fin
+                    return valor
+            except json.JSONDecodeError:
+                if self._fin:
+                    raise
+            # Duplicar lo leído evita reanalizar muchas veces un valor grande
+            self._leer_mas(len(self._buffer) - self._pos)
+
+    def __iter__(self):
+        with open(self.ruta_archivo, 'r', encoding='utf-8') as f:
+            self._archivo = f
+            self._buffer = ''
+            self._pos = 0
+            self._fin = False
+
+            self._esperar('{')
+            while True:
+                caracter = self._siguiente_caracter()
+                if caracter == '}':
+                    break
+                if caracter == ',':
+                    self._pos += 1
+                    continue
+
+                clave = self._decodificar()
+                self._esperar(':')
+
+                if clave != 'objetivos':
+                    self.metadatos[clave] = self._decodificar()
+                    continue
+
+                self._esperar('[')
+                while True:
+                    caracter = self._siguiente_caracter()
+                    if caracter == ']':
+                        self._pos += 1
+                        break
+                    if caracter == ',':
+                        self._pos += 1
+                        continue
+                    yield self._decodificar()
+
+
 if __name__ == "__main__":
     # Crear archivos de ejemplo
     print("=== Creando archivos de ejemplo ===\n")
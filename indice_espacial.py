@@ -0,0 +1,147 @@
+"""
+Módulo de índice espacial
+Rejilla de celdas para buscar pueblos por cercanía sin recorrer la lista
+completa en cada consulta
+"""
+
+import heapq
+
+# Lado de celda por defecto en campos
+LADO_CELDA = 20
+
+
+class IndiceEspacial:
+    """
+    Pueblos repartidos en celdas cuadradas de lado fijo.
+    
+    cercanos() recorre las celdas en anillos alrededor del punto y devuelve
+    los pueblos de menor a mayor distancia, así que encontrar los k más
+    cercanos solo visita las celdas de alrededor. Los pueblos se pueden
+    quitar cuando se usan y volver a añadir cuando quedan libres.
+    """
+    
+    def __init__(self, pueblos, lado=LADO_CELDA):
+        """
+        Args:
+            pueblos: lista de pueblos (con 'coordenadas')
+            lado: lado de cada celda en campos
+        """
+        self.lado = lado
+        self._celdas = {}
+        self._orden = {}
+        self._total = 0
+        for orden, pueblo in enumerate(pueblos):
+            x, y = pueblo['coordenadas']
+            self._celdas.setdefault((x // lado, y // lado), []).append(pueblo)
+            self._orden[id(pueblo)] = orden
+            self._total += 1
+        
+        if self._celdas:
+            columnas = [cx for cx, _ in self._celdas]
+            filas = [cy for _, cy in self._celdas]
+            self._limites = (min(columnas), max(columnas), min(filas), max(filas))
+    
+    def __len__(self):
+        return self._total
+    
+    def anadir(self, pueblo, orden=None):
+        """
+        Añade un pueblo al índice (por ejemplo, cuando vuelve a estar libre).
+        
+        Args:
+            pueblo: pueblo con 'coordenadas'
+            orden: (opcional) posición para desempatar; por defecto, detrás de todos
+        """
+        x, y = pueblo['coordenadas']
+        cx, cy = x // self.lado, y // self.lado
+        self._celdas.setdefault((cx, cy), []).append(pueblo)
+        self._orden[id(pueblo)] = len(self._orden) if orden is None else orden
+        self._total += 1
+        
+        if hasattr(self, '_limites'):
+            min_cx, max_cx, min_cy, max_cy = self._limites
+            self._limites = (min(min_cx, cx), max(max_cx, cx), min(min_cy, cy), max(max_cy, cy))
+        else:
+            self._limites = (cx, cx, cy, cy)
+    
+    def quitar(self, pueblo):
+        """Quita un pueblo del índice (ya no aparecerá en cercanos)"""
+        x, y = pueblo['coordenadas']
+        celda = self._celdas.get((x // self.lado, y // self.lado))
+        if celda:
+            for i, otro in enumerate(celda):
+                if otro is pueblo:
+                    del celda[i]
+                    self._total -= 1
+                    return
+    
+    def _anillo(self, cx, cy, radio):
+        """Celdas a distancia de Chebyshev exactamente 'radio' de (cx, cy)"""
+        if radio == 0:
+            yield cx, cy
+            return
+        for dx in range(-radio, radio + 1):
+            yield cx + dx, cy - radio
+            yield cx + dx, cy + radio
+        for dy in range(-radio + 1, radio):
+            yield cx - radio, cy + dy
+            yield cx + radio, cy + dy
+    
+    def cercanos(self, coordenadas, distancia_max=None):
+        """
+        Pueblos por orden de distancia a unas coordenadas.
+        
+        Con la misma distancia se respeta el orden de la lista original.
+        
+        Args:
+            coordenadas: tupla (x, y)
+            distancia_max: (opcional) solo pueblos a esta distancia o menos
+        
+        Yields:
+            tuple: (distancia_cuadrada, pueblo)
+        """
+        if not self._total:
+            return
+        
+        x, y = coordenadas
+        lado = self.lado
+        cx, cy = x // lado, y // lado
+        limite = None if distancia_max is None else distancia_max * distancia_max
+        
+        # Anillos necesarios para cubrir todas las celdas ocupadas
+        min_cx, max_cx, min_cy, max_cy = self._limites
+        radio_total = max(cx - min_cx, max_cx - cx, cy - min_cy, max_cy - cy, 0)
+        if distancia_max is not None:
+            radio_total = min(radio_total, int(distancia_max // lado) + 1)
+        
+        candidatos = []
+        for radio in range(radio_total + 1):
+            for celda in self._anillo(cx, cy, radio):
+                for pueblo in self._celdas.get(celda, ()):
+                    px, py = pueblo['coordenadas']
+                    d2 = (px - x) ** 2 + (py - y) ** 2
+                    if limite is None or d2 <= limite:
+                        heapq.heappush(candidatos, (d2, self._orden[id(pueblo)], pueblo))
+            
+            # Todo pueblo a distancia <= radio * lado ya está en el montículo
+            seguro = (radio * lado) ** 2
+            while candidatos and (candidatos[0][0] <= seguro or radio == radio_total):
+                d2, _, pueblo = heapq.heappop(candidatos)
+                yield d2, pueblo
+    
+    def mas_cercano(self, coordenadas, distancia_max=None, condicion=None):
+        """
+        Pueblo más cercano que cumple una condición.
+        
+        Args:
+            coordenadas: tupla (x, y)
+            distancia_max: (opcional) distancia máxima
+            condicion: (opcional) función pueblo -> bool
+        
+        Returns:
+            tuple: (distancia_cuadrada, pueblo) o None si no hay ninguno
+        """
+        for d2, pueblo in self.cercanos(coordenadas, distancia_max):
+            if condicion is None or condicion(pueblo):
+                return d2, pueblo
+        return None
@@ -15,16 +15,37 @@ from importador import (
     guardar_plan_json,
     cargar_plan_json
 )
+from plan_binario import (
+    guardar_plan_binario,
+    cargar_plan_binario,
+    EXTENSION_PLAN_BINARIO
+)
 from asignador import (
     asignar_ataques_por_distancia,
     asignar_con_sincronizacion,
     balancear_por_jugador,
-    asignar_optimizando_moral
+    asignar_optimizando_moral,
+    mostrar_objetivos_incompletos,
+    mostrar_prioridades
 )
+from pool_ofensivas import PoolOfensivas, TIPOS_OFF
+from planificador_paralelo import planificar_en_paralelo
+from optimizador import optimizar_plan
+from programador import programar_envios
+from disponibilidad import leer_disponibilidad
+from trenes import planificar_trenes, SEPARACION_TREN_MS
+from oleadas import planificar_oleadas, HORAS_ENTRE_OLEADAS
+from puntuacion import leer_pesos
+from fakes import planificar_fakes, anadir_fakes_al_plan, pueblos_para_fakes, FAKES_POR_PUEBLO
+from defensa import leer_entrantes, asignar_apoyos, UNIDAD_APOYO, MARGEN_APOYO_MS
 from exportador import (
     exportar_comandos_texto,
     exportar_para_copiar,
     exportar_bbcode,
+    exportar_todos_formatos,
+    exportar_por_jugador,
+    exportar_bbcode_por_partes,
+    LIMITE_BBCODE_POR_DEFECTO,
     mostrar_resumen_consola
 )
 
@@ -46,6 +67,7 @@ def menu_principal():
         print("  2️⃣  Cargar Plan Existente")
         print("  3️⃣  Crear Archivos de Ejemplo")
         print("  4️⃣  Pruebas y Cálculos")
+        print("  5️⃣  Calcular Apoyos (ataques entrantes)")
         print("  0️⃣  Salir")
         print("\n" + "="*80)
         
@@ -59,6 +81,8 @@ def menu_principal():
             menu_crear_ejemplos()
         elif opcion == "4":
             menu_pruebas()
+        elif opcion == "5":
+            menu_apoyos()
         elif opcion == "0":
             print("\n👋 ¡Hasta luego!")
             break
@@ -67,6 +91,14 @@ def menu_principal():
             input("\nPresiona Enter para continuar...")
 
 
+def pedir_disponibilidad():
+    """Pregunta por el archivo de horarios de los jugadores (None si no se usa)"""
+    ruta = input("\n🕒 Archivo de horarios de los jugadores (Enter para ignorar horarios): ").strip()
+    if not ruta:
+        return None
+    return leer_disponibilidad(ruta) or None
+
+
 def menu_crear_plan():
     """Menú para crear un nuevo plan de ataque"""
     limpiar_pantalla()
@@ -77,6 +109,11 @@ def menu_crear_plan():
     # Usar siempre el mundo ES95
     mundo_seleccionado = 'es95'
     
+    # Configuración exacta desde data/mundos/*.xml (si existe) y tabla de velocidades
+    from config_mundos import seleccionar_mundo, cargar_mundo_local
+    cargar_mundo_local(mundo_seleccionado)
+    seleccionar_mundo(mundo_seleccionado)
+    
     # Cargar pueblos atacantes desde CSV
     print("\n📍 Paso 1: Cargar pueblos atacantes desde CSV")
     
@@ -129,17 +166,13 @@ def menu_crear_plan():
         input("\nPresiona Enter para continuar...")
         return
     
-    # Mostrar total de ofensivas disponibles
-    total_ofensivas = len(pueblos)
-    print(f"\n✅ Total de ofensivas disponibles: {total_ofensivas}")
+    # Pool indexado por tipo de OFF: totales y reservas sin recorrer los pueblos
+    pool = PoolOfensivas(pueblos)
+    print(f"\n✅ Total de ofensivas disponibles: {len(pool)}")
     
     # Si se seleccionó "Todas", contar por tipo
     if filtro_seleccionado == "5":
-        super_count = sum(1 for p in pueblos if p.get('tipo_off') == 'SUPER')
-        full_count = sum(1 for p in pueblos if p.get('tipo_off') == 'FULL')
-        tres_cuartos_count = sum(1 for p in pueblos if p.get('tipo_off') == '3/4')
-        media_count = sum(1 for p in pueblos if p.get('tipo_off') == 'MEDIA')
-        print(f"   📊 Desglose: SUPER={super_count}, FULL={full_count}, 3/4={tres_cuartos_count}, MEDIA={media_count}")
+        print(f"   📊 Desglose: {pool.desglose()}")
     
     # Inicializar variables para el bucle de categorías
     archivo_objetivos = "data/objetivos.txt"
@@ -153,9 +186,7 @@ def menu_crear_plan():
     ataques_por_objetivo_dict = {}
     # Diccionario para guardar tipo de OFF por objetivo
     tipo_off_por_objetivo = {}
-    # Trackear ofensivas ya asignadas por tipo (acumulativo)
-    asignadas_por_tipo = {'SUPER': 0, 'FULL': 0, '3/4': 0, 'MEDIA': 0}
-    ofensivas_restantes = total_ofensivas
+    # Las ofensivas reservadas (total y por tipo) se acumulan en el pool
     
     # Bucle principal: seleccionar categoría → asignar ofensivas → preguntar si continuar
     continuar_agregando = True
@@ -209,7 +240,7 @@ def menu_crear_plan():
             # Marcar categoría como procesada
             categorias_procesadas.append(categoria_seleccionada)
             categorias_disponibles.remove(categoria_seleccionada)
-            
+        
         elif not categorias:
             # No hay categorías, cargar todo
             print("🌍 Consultando API para obtener info de objetivos (necesario para moral)...")
@@ -232,128 +263,109 @@ def menu_crear_plan():
             print("\n📋 Asignar ataques manualmente:")
             
             for i, objetivo in enumerate(objetivos_actuales, 1):
-            coord_str = f"{objetivo['coordenadas'][0]}|{objetivo['coordenadas'][1]}"
-            jugador_def = objetivo.get('jugador_defensor', 'Desconocido')
-            print(f"\n  [{i}/{len(objetivos)}] Objetivo: {coord_str} - {objetivo['nombre']} (Jugador: {jugador_def})")
-            print(f"  🎯 Ofensivas disponibles: {ofensivas_restantes}")
-            
-            # Si se seleccionó "Todas", preguntar tipo de OFF
-            tipo_off_objetivo = None
-            if filtro_seleccionado == "5":
-                print("\n  🎯 ¿Qué tipo de OFF usar para este objetivo?")
-                # Contar totales de cada tipo
-                super_total = sum(1 for p in pueblos if p.get('tipo_off') == 'SUPER')
-                full_total = sum(1 for p in pueblos if p.get('tipo_off') == 'FULL')
-                tres_total = sum(1 for p in pueblos if p.get('tipo_off') == '3/4')
-                media_total = sum(1 for p in pueblos if p.get('tipo_off') == 'MEDIA')
-                
-                # Calcular disponibles (total - asignadas)
-                super_disp = super_total - asignadas_por_tipo['SUPER']
-                full_disp = full_total - asignadas_por_tipo['FULL']
-                tres_disp = tres_total - asignadas_por_tipo['3/4']
-                media_disp = media_total - asignadas_por_tipo['MEDIA']
+                coord_str = f"{objetivo['coordenadas'][0]}|{objetivo['coordenadas'][1]}"
+                jugador_def = objetivo.get('jugador_defensor', 'Desconocido')
+                print(f"\n  [{i}/{len(objetivos_actuales)}] Objetivo: {coord_str} - {objetivo['nombre']} (Jugador: {jugador_def})")
+                print(f"  🎯 Ofensivas disponibles: {pool.disponibles()}")
                 
-                print(f"    1. SUPER (disponibles: {super_disp})")
-                print(f"    2. FULL (disponibles: {full_disp})")
-                print(f"    3. 3/4 (disponibles: {tres_disp})")
-                print(f"    4. MEDIA (disponibles: {media_disp})")
-                print(f"    5. Mixta SUPER+FULL (combinar ambos tipos)")
-                print(f"    6. Cualquiera (usar todas las disponibles)")
+                # Si se seleccionó "Todas", preguntar tipo de OFF
+                tipo_off_objetivo = None
+                if filtro_seleccionado == "5":
+                    print("\n  🎯 ¿Qué tipo de OFF usar para este objetivo?")
+                    # Disponibles por tipo (total - reservadas), O(1) desde el pool
+                    print(f"    1. SUPER (disponibles: {pool.disponibles('SUPER')})")
+                    print(f"    2. FULL (disponibles: {pool.disponibles('FULL')})")
+                    print(f"    3. 3/4 (disponibles: {pool.disponibles('3/4')})")
+                    print(f"    4. MEDIA (disponibles: {pool.disponibles('MEDIA')})")
+                    print(f"    5. Mixta SUPER+FULL (combinar ambos tipos)")
+                    print(f"    6. Cualquiera (usar todas las disponibles)")
+                    
+                    tipo_input = input("    👉 Selecciona tipo (Enter para 6): ").strip() or "6"
+                    if tipo_input == "1":
+                        tipo_off_objetivo = "SUPER"
+                    elif tipo_input == "2":
+                        tipo_off_objetivo = "FULL"
+                    elif tipo_input == "3":
+                        tipo_off_objetivo = "3/4"
+                    elif tipo_input == "4":
+                        tipo_off_objetivo = "MEDIA"
+                    elif tipo_input == "5":
+                        # Modo mixto: preguntar cuántas de cada tipo
+                        tipo_off_objetivo = "MIXTA"
+                    
+                    tipo_off_por_objetivo[coord_str] = tipo_off_objetivo
                 
-                tipo_input = input("    👉 Selecciona tipo (Enter para 6): ").strip() or "6"
-                if tipo_input == "1":
-                    tipo_off_objetivo = "SUPER"
-                elif tipo_input == "2":
-                    tipo_off_objetivo = "FULL"
-                elif tipo_input == "3":
-                    tipo_off_objetivo = "3/4"
-                elif tipo_input == "4":
-                    tipo_off_objetivo = "MEDIA"
-                elif tipo_input == "5":
-                    # Modo mixto: preguntar cuántas de cada tipo
-                    tipo_off_objetivo = "MIXTA"
+                if pool.disponibles() <= 0:
+                    print("  ⚠️  ¡No quedan ofensivas disponibles!")
+                    respuesta = input("  ¿Continuar sin asignar a este objetivo? (s/n, Enter=s): ").strip().lower()
+                    if respuesta != 'n':
+                        ataques_por_objetivo_dict[coord_str] = 0
+                        continue
+                    else:
+                        break
                 
-                tipo_off_por_objetivo[coord_str] = tipo_off_objetivo
-            
-            if ofensivas_restantes == 0:
-                print("  ⚠️  ¡No quedan ofensivas disponibles!")
-                respuesta = input("  ¿Continuar sin asignar a este objetivo? (s/n, Enter=s): ").strip().lower()
-                if respuesta != 'n':
-                    ataques_por_objetivo_dict[coord_str] = 0
-                    continue
+                # Si es modo mixto, preguntar cantidades de cada tipo
+                if tipo_off_objetivo == "MIXTA":
+                    try:
+                        super_disp_actual = pool.disponibles('SUPER')
+                        full_disp_actual = pool.disponibles('FULL')
+                        
+                        print(f"\n    🔄 Modo Mixto - Especifica cantidades:")
+                        num_super = int(input(f"      SUPER (disponibles: {super_disp_actual}): ").strip() or "0")
+                        num_full = int(input(f"      FULL (disponibles: {full_disp_actual}): ").strip() or "0")
+                        
+                        # Validar disponibilidad
+                        if num_super > super_disp_actual:
+                            print(f"      ⚠️  Solo hay {super_disp_actual} SUPER disponibles. Ajustando...")
+                            num_super = super_disp_actual
+                        if num_full > full_disp_actual:
+                            print(f"      ⚠️  Solo hay {full_disp_actual} FULL disponibles. Ajustando...")
+                            num_full = full_disp_actual
+                        
+                        num_ataques = num_super + num_full
+                        ataques_por_objetivo_dict[coord_str] = num_ataques
+                        
+                        # Reservar en el pool (actualiza total y contadores por tipo)
+                        pool.reservar(num_super, 'SUPER')
+                        pool.reservar(num_full, 'FULL')
+                        
+                        # Guardar la composición mixta en el diccionario
+                        tipo_off_por_objetivo[coord_str] = {
+                            'tipo': 'MIXTA',
+                            'SUPER': num_super,
+                            'FULL': num_full
+                        }
+                    except:
+                        print("      ⚠️  Entrada inválida, saltando este objetivo")
+                        ataques_por_objetivo_dict[coord_str] = 0
                 else:
-                    break
-            
-            # Si es modo mixto, preguntar cantidades de cada tipo
-            if tipo_off_objetivo == "MIXTA":
-                try:
-                    super_disp_actual = super_total - asignadas_por_tipo['SUPER']
-                    full_disp_actual = full_total - asignadas_por_tipo['FULL']
-                    
-                    print(f"\n    🔄 Modo Mixto - Especifica cantidades:")
-                    num_super = int(input(f"      SUPER (disponibles: {super_disp_actual}): ").strip() or "0")
-                    num_full = int(input(f"      FULL (disponibles: {full_disp_actual}): ").strip() or "0")
-                    
-                    # Validar disponibilidad
-                    if num_super > super_disp_actual:
-                        print(f"      ⚠️  Solo hay {super_disp_actual} SUPER disponibles. Ajustando...")
-                        num_super = super_disp_actual
-                    if num_full > full_disp_actual:
-                        print(f"      ⚠️  Solo hay {full_disp_actual} FULL disponibles. Ajustando...")
-                        num_full = full_disp_actual
-                    
-                    num_ataques = num_super + num_full
-                    ataques_por_objetivo_dict[coord_str] = num_ataques
-                    ofensivas_restantes -= num_ataques
-                    
-                    # Actualizar contadores por tipo
-                    asignadas_por_tipo['SUPER'] += num_super
-                    asignadas_por_tipo['FULL'] += num_full
-                    
-                    # Guardar la composición mixta en el diccionario
-                    tipo_off_por_objetivo[coord_str] = {
-                        'tipo': 'MIXTA',
-                        'SUPER': num_super,
-                        'FULL': num_full
-                    }
-                except:
-                    print("      ⚠️  Entrada inválida, saltando este objetivo")
-                    ataques_por_objetivo_dict[coord_str] = 0
-            else:
-                # Modo normal (un solo tipo)
-                try:
-                    max_sugerido = min(5, ofensivas_restantes)
-                    num_ataques = int(input(f"    ¿Cuántas ofensivas? (Enter para {max_sugerido}): ").strip() or str(max_sugerido))
+                    # Modo normal (un solo tipo)
+                    try:
+                        max_sugerido = min(5, pool.disponibles())
+                        num_ataques = int(input(f"    ¿Cuántas ofensivas? (Enter para {max_sugerido}): ").strip() or str(max_sugerido))
+                        
+                        if num_ataques > pool.disponibles():
+                            print(f"  ⚠️  Solo hay {pool.disponibles()} ofensivas disponibles. Ajustando...")
+                            num_ataques = pool.disponibles()
                     
-                    if num_ataques > ofensivas_restantes:
-                        print(f"  ⚠️  Solo hay {ofensivas_restantes} ofensivas disponibles. Ajustando...")
-                        num_ataques = ofensivas_restantes
+                    except:
+                        num_ataques = min(5, pool.disponibles())
                     
                     ataques_por_objetivo_dict[coord_str] = num_ataques
-                    ofensivas_restantes -= num_ataques
-                    
-                    # Actualizar contador de asignadas por tipo (solo si se seleccionó tipo específico)
-                    if tipo_off_objetivo and tipo_off_objetivo in asignadas_por_tipo:
-                        asignadas_por_tipo[tipo_off_objetivo] += num_ataques
-                    
-                except:
-                    ataques_por_objetivo_dict[coord_str] = min(5, ofensivas_restantes)
-                    ofensivas_restantes -= ataques_por_objetivo_dict[coord_str]
-                    # Actualizar contador de asignadas por tipo
-                    if tipo_off_objetivo and tipo_off_objetivo in asignadas_por_tipo:
-                        asignadas_por_tipo[tipo_off_objetivo] += ataques_por_objetivo_dict[coord_str]
-        
+                    # Reservar en el pool (por tipo solo si se seleccionó tipo específico)
+                    pool.reservar(num_ataques, tipo_off_objetivo if tipo_off_objetivo in TIPOS_OFF else None)
+            
             # Agregar objetivos actuales a la lista total
             objetivos_totales.extend(objetivos_actuales)
             
             # Preguntar si quiere añadir otra categoría
             if categorias_disponibles:
-                print(f"\n✅ Asignación completa para esta categoría. Ofensivas sin asignar: {ofensivas_restantes}")
+                print(f"\n✅ Asignación completa para esta categoría. Ofensivas sin asignar: {pool.disponibles()}")
                 print(f"\n📊 Quedan {len(categorias_disponibles)} categoría(s) disponible(s): {', '.join(categorias_disponibles)}")
                 continuar = input("¿Deseas añadir otra categoría? (s/n, Enter=n): ").strip().lower()
                 continuar_agregando = (continuar == 's')
             else:
-                print(f"\n✅ Asignación completa. No quedan más categorías. Ofensivas sin asignar: {ofensivas_restantes}")
+                print(f"\n✅ Asignación completa. No quedan más categorías. Ofensivas sin asignar: {pool.disponibles()}")
                 continuar_agregando = False
         
         else:
@@ -369,87 +381,94 @@ def menu_crear_plan():
             print(f"   • Objetivos: {len(objetivos_actuales)}")
             print(f"   • Ofensivas por objetivo: {ataques_por_objetivo}")
             print(f"   • Total necesarias: {total_necesarias}")
-            print(f"   • Disponibles restantes: {ofensivas_restantes}")
-        
-            if total_necesarias > ofensivas_restantes:
+            print(f"   • Disponibles restantes: {pool.disponibles()}")
+            
+            if total_necesarias > pool.disponibles():
                 print(f"\n⚠️  ADVERTENCIA: No hay suficientes ofensivas restantes!")
-                print(f"   Faltan: {total_necesarias - ofensivas_restantes} ofensivas")
+                print(f"   Faltan: {total_necesarias - pool.disponibles()} ofensivas")
                 respuesta = input("\n¿Continuar de todos modos? (s/n, Enter=s): ").strip().lower()
                 if respuesta == 'n':
                     continue
             else:
-                sobrantes = ofensivas_restantes - total_necesarias
+                sobrantes = pool.disponibles() - total_necesarias
                 print(f"   ✅ Sobran: {sobrantes} ofensivas")
             
             # Llenar el diccionario con el mismo valor para todos
             for i, objetivo in enumerate(objetivos_actuales, 1):
                 coord_str = f"{objetivo['coordenadas'][0]}|{objetivo['coordenadas'][1]}"
                 ataques_por_objetivo_dict[coord_str] = ataques_por_objetivo
-                ofensivas_restantes -= ataques_por_objetivo
+                pool.reservar(ataques_por_objetivo)
                 
                 # Si se seleccionó "Todas", preguntar tipo de OFF para cada objetivo
                 if filtro_seleccionado == "5":
-                jugador_def = objetivo.get('jugador_defensor', 'Desconocido')
-                print(f"\n  [{i}/{len(objetivos)}] Objetivo: {coord_str} - {objetivo['nombre']} (Jugador: {jugador_def})")
-                print("  🎯 ¿Qué tipo de OFF usar para este objetivo?")
-                super_disp = sum(1 for p in pueblos if p.get('tipo_off') == 'SUPER')
-                full_disp = sum(1 for p in pueblos if p.get('tipo_off') == 'FULL')
-                tres_disp = sum(1 for p in pueblos if p.get('tipo_off') == '3/4')
-                media_disp = sum(1 for p in pueblos if p.get('tipo_off') == 'MEDIA')
-                
-                print(f"    1. SUPER (disponibles: {super_disp})")
-                print(f"    2. FULL (disponibles: {full_disp})")
-                print(f"    3. 3/4 (disponibles: {tres_disp})")
-                print(f"    4. MEDIA (disponibles: {media_disp})")
-                print(f"    5. Mixta SUPER+FULL (combinar ambos tipos)")
-                print(f"    6. Cualquiera (usar todas las disponibles)")
-                
-                tipo_input = input("    👉 Selecciona tipo (Enter para 6): ").strip() or "6"
-                tipo_off_objetivo = None
-                if tipo_input == "1":
-                    tipo_off_objetivo = "SUPER"
-                elif tipo_input == "2":
-                    tipo_off_objetivo = "FULL"
-                elif tipo_input == "3":
-                    tipo_off_objetivo = "3/4"
-                elif tipo_input == "4":
-                    tipo_off_objetivo = "MEDIA"
-                elif tipo_input == "5":
-                    # Modo mixto en modo fijo
-                    try:
-                        print(f"\n    🔄 Modo Mixto - De las {ataques_por_objetivo} ofensivas, especifica:")
-                        num_super = int(input(f"      SUPER (disponibles: {super_disp}): ").strip() or "0")
-                        num_full = int(input(f"      FULL (disponibles: {full_disp}): ").strip() or "0")
-                        
-                        if num_super + num_full != ataques_por_objetivo:
-                            print(f"      ⚠️  La suma debe ser {ataques_por_objetivo}. Ajustando proporcionalmente...")
-                            total = num_super + num_full
-                            if total > 0:
-                                num_super = round((num_super / total) * ataques_por_objetivo)
-                                num_full = ataques_por_objetivo - num_super
-                        
-                        tipo_off_objetivo = {
-                            'tipo': 'MIXTA',
-                            'SUPER': num_super,
-                            'FULL': num_full
-                        }
-                    except:
-                        print("      ⚠️  Entrada inválida, usando cualquiera")
-                        tipo_off_objetivo = None
-                
+                    jugador_def = objetivo.get('jugador_defensor', 'Desconocido')
+                    print(f"\n  [{i}/{len(objetivos_actuales)}] Objetivo: {coord_str} - {objetivo['nombre']} (Jugador: {jugador_def})")
+                    print("  🎯 ¿Qué tipo de OFF usar para este objetivo?")
+                    super_disp = pool.disponibles('SUPER')
+                    full_disp = pool.disponibles('FULL')
+                    tres_disp = pool.disponibles('3/4')
+                    media_disp = pool.disponibles('MEDIA')
+                    
+                    print(f"    1. SUPER (disponibles: {super_disp})")
+                    print(f"    2. FULL (disponibles: {full_disp})")
+                    print(f"    3. 3/4 (disponibles: {tres_disp})")
+                    print(f"    4. MEDIA (disponibles: {media_disp})")
+                    print(f"    5. Mixta SUPER+FULL (combinar ambos tipos)")
+                    print(f"    6. Cualquiera (usar todas las disponibles)")
+                    
+                    tipo_input = input("    👉 Selecciona tipo (Enter para 6): ").strip() or "6"
+                    tipo_off_objetivo = None
+                    if tipo_input == "1":
+                        tipo_off_objetivo = "SUPER"
+                    elif tipo_input == "2":
+                        tipo_off_objetivo = "FULL"
+                    elif tipo_input == "3":
+                        tipo_off_objetivo = "3/4"
+                    elif tipo_input == "4":
+                        tipo_off_objetivo = "MEDIA"
+                    elif tipo_input == "5":
+                        # Modo mixto en modo fijo
+                        try:
+                            print(f"\n    🔄 Modo Mixto - De las {ataques_por_objetivo} ofensivas, especifica:")
+                            num_super = int(input(f"      SUPER (disponibles: {super_disp}): ").strip() or "0")
+                            num_full = int(input(f"      FULL (disponibles: {full_disp}): ").strip() or "0")
+                            
+                            if num_super + num_full != ataques_por_objetivo:
+                                print(f"      ⚠️  La suma debe ser {ataques_por_objetivo}. Ajustando proporcionalmente...")
+                                total = num_super + num_full
+                                if total > 0:
+                                    num_super = round((num_super / total) * ataques_por_objetivo)
+                                    num_full = ataques_por_objetivo - num_super
+                            
+                            tipo_off_objetivo = {
+                                'tipo': 'MIXTA',
+                                'SUPER': num_super,
+                                'FULL': num_full
+                            }
+                        except:
+                            print("      ⚠️  Entrada inválida, usando cualquiera")
+                            tipo_off_objetivo = None
+                    
                     tipo_off_por_objetivo[coord_str] = tipo_off_objetivo
+                    
+                    # El total ya se reservó arriba; aquí solo los contadores por tipo
+                    if isinstance(tipo_off_objetivo, dict):
+                        pool.reservar_tipo(tipo_off_objetivo['SUPER'], 'SUPER')
+                        pool.reservar_tipo(tipo_off_objetivo['FULL'], 'FULL')
+                    elif tipo_off_objetivo:
+                        pool.reservar_tipo(ataques_por_objetivo, tipo_off_objetivo)
             
             # Agregar objetivos actuales a la lista total
             objetivos_totales.extend(objetivos_actuales)
             
             # Preguntar si quiere añadir otra categoría
             if categorias_disponibles:
-                print(f"\n✅ Asignación completa para esta categoría. Ofensivas sin asignar: {ofensivas_restantes}")
+                print(f"\n✅ Asignación completa para esta categoría. Ofensivas sin asignar: {pool.disponibles()}")
                 print(f"\n📊 Quedan {len(categorias_disponibles)} categoría(s) disponible(s): {', '.join(categorias_disponibles)}")
                 continuar = input("¿Deseas añadir otra categoría? (s/n, Enter=n): ").strip().lower()
                 continuar_agregando = (continuar == 's')
             else:
-                print(f"\n✅ Asignación completa. No quedan más categorías. Ofensivas sin asignar: {ofensivas_restantes}")
+                print(f"\n✅ Asignación completa. No quedan más categorías. Ofensivas sin asignar: {pool.disponibles()}")
                 continuar_agregando = False
     
     # Usar todos los objetivos acumulados
@@ -469,6 +488,7 @@ def menu_crear_plan():
     print("  5. Caballería Pesada (11 min/campo)")
     print("  6. Caballería Ligera/Arquero Montado/Paladín (10 min/campo)")
     print("  7. Explorador (9 min/campo)")
+    print("  8. Automático (unidad más lenta de cada pueblo según sus tropas)")
     
     tipo_tropa_map = {
         "1": "noble",
@@ -477,15 +497,29 @@ def menu_crear_plan():
         "4": "lanza",
         "5": "caballeria_pesada",
         "6": "caballeria_ligera",
-        "7": "explorador"
+        "7": "explorador",
+        "8": "auto"
     }
     
     seleccion_tropa = input("\n👉 Selecciona tipo de tropa (Enter para 1-Noble): ").strip() or "1"
     tipo_tropa = tipo_tropa_map.get(seleccion_tropa, "noble")
     
-    from config_mundos import obtener_velocidad_tropa
-    velocidad = obtener_velocidad_tropa(tipo_tropa, mundo_seleccionado)
-    print(f"✅ Usando {tipo_tropa} ({velocidad:.1f} min/campo)")
+    from config_mundos import obtener_velocidad_tropa, TROPA_AUTOMATICA
+    if tipo_tropa == TROPA_AUTOMATICA:
+        print("✅ Cada ataque usará la velocidad de su unidad más lenta (noble si lo lleva)")
+    else:
+        velocidad = obtener_velocidad_tropa(tipo_tropa, mundo_seleccionado)
+        print(f"✅ Usando {tipo_tropa} ({velocidad:.1f} min/campo)")
+    
+    # Política de prioridad, solo si los objetivos tienen prioridades distintas
+    politica = 'estricta'
+    prioridades = sorted({objetivo.get('prioridad', 1) for objetivo in objetivos})
+    if len(prioridades) > 1:
+        print(f"\n🚩 Objetivos con prioridades {', '.join(str(p) for p in prioridades)} (1 = alta)")
+        print("  1. Estricta (las prioridades bajas solo reciben lo que sobra)")
+        print("  2. Ponderada (las prioridades bajas también reciben una parte)")
+        if input("\n👉 Política (Enter para 1): ").strip() == "2":
+            politica = 'ponderada'
     
     # Seleccionar método de asignación
     print("\n🎲 Paso 4: Método de asignación")
@@ -493,26 +527,48 @@ def menu_crear_plan():
     print("  2. Balanceado por jugador")
     print("  3. Sincronizado (con hora de llegada)")
     print("  4. 🎯 Optimizado por MORAL (Recomendado)")
+    print("  5. 👑 Trenes de nobles (limpieza + nobles en orden)")
+    print("  6. 🌊 Varias oleadas (las ofensivas repiten al volver)")
     
     metodo = input("\nMétodo (Enter para 4): ").strip() or "4"
     
+    # Frentes separados: resolver cada región independiente en su propio proceso
+    por_regiones = input("\n🗺️  ¿Planificar por regiones independientes en paralelo? (s/n, Enter=n): ").strip().lower() == 's'
+    
     plan = None
+    disponibilidad = None
     
     if metodo == "1":
         print("\n⚙️  Generando plan por distancia mínima...")
-        plan = asignar_ataques_por_distancia(pueblos, objetivos, ataques_por_objetivo, mundo_seleccionado, tipo_tropa)
+        if por_regiones:
+            plan = planificar_en_paralelo(pueblos, objetivos, 'distancia', mundo=mundo_seleccionado, tipo_tropa=tipo_tropa, ataques_por_objetivo=ataques_por_objetivo,
+                                          politica_prioridad=politica)
+        else:
+            plan = asignar_ataques_por_distancia(pueblos, objetivos, ataques_por_objetivo, mundo_seleccionado, tipo_tropa,
+                                                 politica_prioridad=politica)
     
     elif metodo == "2":
         print("\n⚙️  Generando plan balanceado...")
-        plan = balancear_por_jugador(pueblos, objetivos, ataques_por_objetivo, mundo_seleccionado, tipo_tropa)
+        if por_regiones:
+            plan = planificar_en_paralelo(pueblos, objetivos, 'balanceado', mundo=mundo_seleccionado, tipo_tropa=tipo_tropa, ataques_por_objetivo=ataques_por_objetivo,
+                                          politica_prioridad=politica)
+        else:
+            plan = balancear_por_jugador(pueblos, objetivos, ataques_por_objetivo, mundo_seleccionado, tipo_tropa,
+                                         politica_prioridad=politica)
     
     elif metodo == "3":
         print("\n⏰ Configurar hora de llegada")
         fecha_str = input("Fecha y hora (formato: YYYY-MM-DD HH:MM:SS): ").strip()
         try:
             hora_llegada = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S")
+            disponibilidad = pedir_disponibilidad()
             print("\n⚙️  Generando plan sincronizado...")
-            plan = asignar_con_sincronizacion(pueblos, objetivos, hora_llegada, ataques_por_objetivo, mundo_seleccionado, tipo_tropa)
+            if por_regiones:
+                plan = planificar_en_paralelo(pueblos, objetivos, 'sincronizado', mundo=mundo_seleccionado, tipo_tropa=tipo_tropa, ataques_por_objetivo=ataques_por_objetivo, hora_llegada=hora_llegada, disponibilidad=disponibilidad,
+                                              politica_prioridad=politica)
+            else:
+                plan = asignar_con_sincronizacion(pueblos, objetivos, hora_llegada, ataques_por_objetivo, mundo_seleccionado, tipo_tropa, disponibilidad,
+                                                  politica)
         except ValueError:
             print("\n❌ Formato de fecha inválido")
             input("\nPresiona Enter para continuar...")
@@ -559,33 +615,43 @@ def menu_crear_plan():
             print(f"\n✅ Ventana configurada: {hora_inicio.strftime('%H:%M:%S %d/%m/%Y')} - {hora_fin.strftime('%H:%M:%S %d/%m/%Y')}")
             print(f"   Objetivo central: {hora_llegada.strftime('%H:%M:%S %d/%m/%Y')}")
         
+        # Los horarios de los jugadores solo se aplican si hay hora de envío
+        disponibilidad = pedir_disponibilidad() if hora_llegada else None
+        
+        # Puntuación ponderada opcional en lugar de la regla de moral
+        print("\n⚖️  Pesos de puntuación (opcional): moral, tiempo, poblacion, tipo_off, balance")
+        print("   Ejemplo: moral=1,tiempo=0.5,balance=0.2 (Enter para priorizar solo la moral)")
+        pesos = None
+        pesos_str = input("\nPesos: ").strip()
+        if pesos_str:
+            try:
+                pesos = leer_pesos(pesos_str)
+            except ValueError as e:
+                print(f"\n⚠️  {e}. Se usa la regla de moral.")
+        optimo = False
+        if pesos and pesos['balance']:
+            print("   ℹ️  Con peso en balance el reparto es voraz (el óptimo no lo admite)")
+        elif pesos:
+            optimo = input("🧮 ¿Reparto óptimo (algoritmo húngaro) en lugar de voraz? (s/n, Enter=n): ").strip().lower() == 's'
+        
         print("\n⚙️  Generando plan...")
         # Pasar el filtro de tipo de OFF si se seleccionó "Todas"
         tipo_off_dict = tipo_off_por_objetivo if filtro_seleccionado == "5" else None
-        plan = asignar_optimizando_moral(pueblos, objetivos, ataques_por_objetivo_dict, mundo_seleccionado, tipo_tropa, hora_llegada, tipo_off_dict)
+        # Con ventana, el asignador quita las horas del bonus de noche y calcula los rangos de envío
+        ventana = (hora_inicio, hora_fin) if hora_llegada else None
+        if por_regiones:
+            plan = planificar_en_paralelo(pueblos, objetivos, 'moral', mundo=mundo_seleccionado, tipo_tropa=tipo_tropa,
+                                          ataques_por_objetivo=ataques_por_objetivo_dict, hora_llegada=hora_llegada,
+                                          tipo_off_por_objetivo=tipo_off_dict, disponibilidad=disponibilidad,
+                                          ventana=ventana, hora_actual=datetime.now(), politica_prioridad=politica,
+                                          pesos=pesos, optimo=optimo)
+        else:
+            plan = asignar_optimizando_moral(pueblos, objetivos, ataques_por_objetivo_dict, mundo_seleccionado, tipo_tropa, hora_llegada, tipo_off_dict, disponibilidad,
+                                             ventana, datetime.now(), politica, pesos, optimo)
         
-        # Agregar información de la ventana al plan y calcular rangos de envío
-        if hora_inicio and hora_fin:
-            plan['ventana_llegada'] = {
-                'inicio': hora_inicio.strftime('%H:%M:%S %d/%m/%Y'),
-                'fin': hora_fin.strftime('%H:%M:%S %d/%m/%Y'),
-                'objetivo': hora_llegada.strftime('%H:%M:%S %d/%m/%Y')
-            }
-            
-            # Calcular rango de envío para cada ataque
-            for objetivo in plan['objetivos']:
-                for ataque in objetivo['ataques']:
-                    tiempo_viaje_mins = ataque['tiempo_viaje_minutos']
-                    
-                    # Hora de envío para llegar al inicio de la ventana
-                    hora_envio_min = hora_inicio - timedelta(minutes=tiempo_viaje_mins)
-                    
-                    # Hora de envío para llegar al final de la ventana
-                    hora_envio_max = hora_fin - timedelta(minutes=tiempo_viaje_mins)
-                    
-                    # Guardar el rango como string
-                    ataque['hora_envio'] = f"{hora_envio_min.strftime('%d/%m/%Y %H:%M:%S')} hasta {hora_envio_max.strftime('%d/%m/%Y %H:%M:%S')}"
-                    ataque['hora_llegada'] = f"{hora_inicio.strftime('%d/%m/%Y %H:%M:%S')} - {hora_fin.strftime('%d/%m/%Y %H:%M:%S')}"
+        if 'bonus_noche' in plan.get('ventana_llegada', {}):
+            print(f"\n🌙 Bonus de noche {plan['ventana_llegada']['bonus_noche']} excluido de la ventana "
+                  f"({plan['ventana_llegada']['pares_descartados']} combinaciones no llegan a tiempo)")
         
         # Mostrar estadísticas de moral
         if 'estadisticas_moral' in plan:
@@ -598,12 +664,94 @@ def menu_crear_plan():
         if hora_llegada:
             print(f"\n⏰ Hora de llegada configurada: {hora_llegada.strftime('%d/%m/%Y %H:%M:%S')}")
     
+    elif metodo == "5":
+        print("\n👑 Trenes de nobles")
+        fecha_str = input("Hora de llegada de la limpieza (formato: YYYY-MM-DD HH:MM:SS): ").strip()
+        try:
+            hora_llegada = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S")
+            archivo_nobles = input("Archivo de pueblos con nobles (x|y|nombre|jugador|puntos|nobles, Enter=usar CSV): ").strip()
+            pueblos_nobles = leer_pueblos_desde_archivo(archivo_nobles) if archivo_nobles else None
+            nobles_por_tren = int(input("Nobles por objetivo (Enter para 4): ").strip() or "4")
+            limpiezas = int(input("Ataques de limpieza por objetivo (Enter para 1): ").strip() or "1")
+            separacion = int(input(f"Milisegundos entre llegadas (Enter para {SEPARACION_TREN_MS}): ").strip() or SEPARACION_TREN_MS)
+        except ValueError:
+            print("\n❌ Valor inválido")
+            input("\nPresiona Enter para continuar...")
+            return
+        print("\n⚙️  Generando trenes...")
+        plan = planificar_trenes(pueblos, objetivos, hora_llegada, pueblos_nobles, nobles_por_tren, limpiezas,
+                                 separacion, mundo_seleccionado, politica)
+    
+    elif metodo == "6":
+        print("\n🌊 Oleadas")
+        fecha_str = input("Hora de llegada de la primera oleada (formato: YYYY-MM-DD HH:MM:SS): ").strip()
+        try:
+            hora_llegada = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S")
+            num_oleadas = int(input("Número de oleadas (Enter para 3): ").strip() or "3")
+            horas_oleadas = float(input(f"Horas entre oleadas (Enter para {HORAS_ENTRE_OLEADAS}): ").strip() or HORAS_ENTRE_OLEADAS)
+        except ValueError:
+            print("\n❌ Valor inválido")
+            input("\nPresiona Enter para continuar...")
+            return
+        print("\n⚙️  Generando oleadas...")
+        plan = planificar_oleadas(pueblos, objetivos, hora_llegada, num_oleadas, horas_oleadas, ataques_por_objetivo_dict,
+                                  mundo_seleccionado, tipo_tropa, datetime.now(), politica)
+    
     else:
         print("\n❌ Método inválido")
         input("\nPresiona Enter para continuar...")
         return
     
     if plan:
+        # Objetivos sin todos sus ataques por los horarios de los jugadores
+        mostrar_objetivos_incompletos(plan)
+        mostrar_prioridades(plan)
+        
+        # Mejora opcional del plan con búsqueda local (los trenes ya van ordenados
+        # y las oleadas dependen de cuándo vuelve cada pueblo)
+        segundos_str = ''
+        if 'trenes' not in plan and 'oleadas' not in plan:
+            segundos_str = input("\n📈 Segundos de optimización local del plan (Enter para no optimizar): ").strip()
+        if segundos_str:
+            try:
+                segundos = float(segundos_str)
+            except ValueError:
+                segundos = 0
+                print("❌ Valor inválido, se mantiene el plan sin optimizar")
+            if segundos > 0:
+                optimizar_plan(plan, pueblos, objetivos, segundos, mundo_seleccionado,
+                               disponibilidad=disponibilidad, hora_actual=datetime.now())
+        
+        # Repartir los envíos de cada jugador (solo planes con horas de envío)
+        if 'trenes' not in plan and 'oleadas' not in plan and any('hora_envio_ms' in ataque for objetivo in plan['objetivos'] for ataque in objetivo['ataques']):
+            separacion_str = input("\n🕐 Separación mínima entre envíos de un jugador en segundos (Enter para no repartir): ").strip()
+            if separacion_str:
+                try:
+                    separacion_ms = round(float(separacion_str) * 1000)
+                    margen_ms = 0
+                    if 'ventana_llegada' not in plan:
+                        margen_ms = round(float(input("   Retraso de llegada permitido en segundos (Enter para 0): ").strip() or "0") * 1000)
+                    programar_envios(plan, separacion_ms, margen_ms, disponibilidad)
+                except ValueError:
+                    print("❌ Valor inválido, no se reparten los envíos")
+        
+        # Fakes desde todos los pueblos de los jugadores, en la ventana del plan
+        fakes_str = input("\n🎭 Fakes por objetivo (Enter para no añadir fakes): ").strip()
+        if fakes_str:
+            try:
+                fakes_por_objetivo = int(fakes_str)
+                limite_fakes = int(input(f"   Fakes máximos por pueblo (Enter para {FAKES_POR_PUEBLO}): ").strip() or FAKES_POR_PUEBLO)
+                archivo_objetivos_fakes = input("   Archivo de objetivos de los fakes (Enter=mismos objetivos): ").strip()
+                objetivos_fakes = objetivos
+                if archivo_objetivos_fakes:
+                    objetivos_fakes = leer_objetivos_desde_archivo(archivo_objetivos_fakes, mundo=mundo_seleccionado, usar_api=True)
+                pueblos_fakes = pueblos_para_fakes(pueblos, mundo_seleccionado)
+                plan_fakes = planificar_fakes(pueblos_fakes, objetivos_fakes, fakes_por_objetivo, limite_fakes,
+                                              mundo=mundo_seleccionado, plan_real=plan)
+                anadir_fakes_al_plan(plan, plan_fakes)
+            except ValueError:
+                print("❌ Valor inválido, no se añaden fakes")
+        
         # Mostrar resumen
         mostrar_resumen_consola(plan)
         
@@ -622,6 +770,10 @@ def menu_exportar_plan(plan):
         print("  3️⃣  Exportar BBCode (foros)")
         print("  4️⃣  Guardar plan (JSON)")
         print("  5️⃣  Ver resumen de nuevo")
+        print("  6️⃣  Guardar plan (binario compacto)")
+        print("  7️⃣  Exportar todos los formatos (texto + coordenadas + BBCode)")
+        print("  8️⃣  Exportar órdenes por jugador (un archivo por jugador)")
+        print("  9️⃣  Exportar BBCode por partes (límite de foro/correo)")
         print("  0️⃣  Volver al menú principal")
         
         opcion = input("\n👉 Selecciona una opción: ").strip()
@@ -649,6 +801,35 @@ def menu_exportar_plan(plan):
         elif opcion == "5":
             mostrar_resumen_consola(plan)
         
+        elif opcion == "6":
+            archivo = input(f"Nombre del archivo (Enter para 'data/plan{EXTENSION_PLAN_BINARIO}'): ").strip() or f"data/plan{EXTENSION_PLAN_BINARIO}"
+            comprimir = input("¿Comprimir? (s/n, Enter=s): ").strip().lower() != 'n'
+            guardar_plan_binario(plan, archivo, comprimir)
+            input("\nPresiona Enter para continuar...")
+        
+        elif opcion == "7":
+            prefijo = input("Prefijo de los archivos (Enter para 'plan_ataque'): ").strip() or "plan_ataque"
+            exportar_todos_formatos(plan, prefijo)
+            input("\nPresiona Enter para continuar...")
+        
+        elif opcion == "8":
+            carpeta = input("Carpeta de salida (Enter para 'ordenes'): ").strip() or "ordenes"
+            print("  1. Texto")
+            print("  2. BBCode")
+            print("  3. Lista de envíos")
+            formato = {"1": "texto", "2": "bbcode", "3": "envios"}.get(input("👉 Formato (Enter para 2): ").strip() or "2", "bbcode")
+            exportar_por_jugador(plan, carpeta, formato)
+            input("\nPresiona Enter para continuar...")
+        
+        elif opcion == "9":
+            ruta_base = input("Nombre base (Enter para 'plan_bbcode'): ").strip() or "plan_bbcode"
+            try:
+                limite = int(input(f"Tamaño máximo por parte en bytes (Enter para {LIMITE_BBCODE_POR_DEFECTO}): ").strip() or LIMITE_BBCODE_POR_DEFECTO)
+                exportar_bbcode_por_partes(plan, ruta_base, limite)
+            except ValueError as e:
+                print(f"\n❌ Error: {e}")
+            input("\nPresiona Enter para continuar...")
+        
         elif opcion == "0":
             break
         
@@ -664,9 +845,12 @@ def menu_cargar_plan():
     print("📂 CARGAR PLAN EXISTENTE")
     print("="*80)
     
-    archivo = input("\nRuta del archivo JSON (Enter para 'data/plan.json'): ").strip() or "data/plan.json"
+    archivo = input(f"\nRuta del archivo JSON o {EXTENSION_PLAN_BINARIO} (Enter para 'data/plan.json'): ").strip() or "data/plan.json"
     
-    plan = cargar_plan_json(archivo)
+    if archivo.endswith(EXTENSION_PLAN_BINARIO):
+        plan = cargar_plan_binario(archivo)
+    else:
+        plan = cargar_plan_json(archivo)
     if plan:
         mostrar_resumen_consola(plan)
         menu_exportar_plan(plan)
@@ -674,6 +858,44 @@ def menu_cargar_plan():
         input("\nPresiona Enter para continuar...")
 
 
+def menu_apoyos():
+    """Menú para repartir apoyos defensivos contra ataques entrantes"""
+    limpiar_pantalla()
+    print("="*80)
+    print("🛡️  CALCULAR APOYOS")
+    print("="*80)
+    
+    mundo_seleccionado = 'es95'
+    from config_mundos import seleccionar_mundo, cargar_mundo_local
+    cargar_mundo_local(mundo_seleccionado)
+    seleccionar_mundo(mundo_seleccionado)
+    
+    archivo_pueblos = input("\nArchivo de pueblos defensivos (x|y|nombre|jugador|puntos, Enter para 'data/pueblos.txt'): ").strip() or "data/pueblos.txt"
+    pueblos = leer_pueblos_desde_archivo(archivo_pueblos)
+    archivo_entrantes = input("Archivo de ataques entrantes (destino origen fecha hora, Enter para 'data/entrantes.txt'): ").strip() or "data/entrantes.txt"
+    entrantes = leer_entrantes(archivo_entrantes)
+    if not pueblos or not entrantes:
+        input("\nPresiona Enter para continuar...")
+        return
+    
+    try:
+        unidad = input(f"Unidad más lenta del apoyo (Enter para {UNIDAD_APOYO}): ").strip() or UNIDAD_APOYO
+        apoyos_por_entrante = int(input("Apoyos por ataque entrante (Enter para 1): ").strip() or "1")
+        apoyos_por_pueblo = int(input("Apoyos máximos por pueblo (Enter para 1): ").strip() or "1")
+        margen_ms = int(input(f"Milisegundos de llegada antes del ataque (Enter para {MARGEN_APOYO_MS}): ").strip() or MARGEN_APOYO_MS)
+    except ValueError:
+        print("\n❌ Valor inválido")
+        input("\nPresiona Enter para continuar...")
+        return
+    metodo = 'optimo' if input("Reparto (1=voraz, 2=óptimo; Enter para 1): ").strip() == "2" else 'voraz'
+    
+    print("\n⚙️  Calculando apoyos...")
+    plan = asignar_apoyos(pueblos, entrantes, apoyos_por_entrante, apoyos_por_pueblo, metodo, unidad,
+                          mundo_seleccionado, margen_ms=margen_ms)
+    mostrar_resumen_consola(plan)
+    menu_exportar_plan(plan)
+
+
 def menu_crear_ejemplos():
     """Menú para crear archivos de ejemplo"""
     limpiar_pantalla()
@@ -0,0 +1,189 @@
+"""
+Módulo de oleadas
+Planifica operaciones de varios días: cada ofensiva vuelve a su pueblo
+después de atacar y puede salir de nuevo en una oleada posterior
+"""
+
+import heapq
+from datetime import datetime, timedelta
+
+from asignador import crear_ataque, formatear_horas_plan, ordenar_por_prioridad, anotar_prioridad
+from calculadora import calcular_moral, coordenadas_a_string, datetime_a_ms, unidades_mas_lentas
+from config_mundos import segundos_por_campo, TROPA_AUTOMATICA
+from indice_espacial import IndiceEspacial
+
+# Horas por defecto entre las llegadas de dos oleadas seguidas
+HORAS_ENTRE_OLEADAS = 24
+
+
+def _crear_ataque(pueblo, objetivo, distancia_cuadrada, unidad, ms_por_campo, llegada_ms, oleada):
+    """Ataque de una oleada con el mismo formato que los del asignador, más su regreso"""
+    distancia = distancia_cuadrada ** 0.5
+    tiempo_viaje_ms = round(distancia * ms_por_campo)
+    moral = calcular_moral(pueblo.get('puntos_jugador', 0), objetivo.get('puntos_defensor', 0))
+    return crear_ataque(pueblo, objetivo, distancia, tiempo_viaje_ms / 60000, tiempo_viaje_ms, moral, llegada_ms,
+                        unidad, hora_regreso_ms=llegada_ms + tiempo_viaje_ms, oleada=oleada)
+
+
+def planificar_oleadas(pueblos_atacantes, objetivos, hora_primera_llegada, oleadas=3,
+                       horas_entre_oleadas=HORAS_ENTRE_OLEADAS, ataques_por_objetivo=5, mundo='es95',
+                       tipo_tropa=TROPA_AUTOMATICA, hora_actual=None, politica_prioridad='estricta'):
+    """
+    Planifica varias oleadas sobre los mismos objetivos reutilizando pueblos.
+    
+    Cada oleada llega horas_entre_oleadas después de la anterior y lleva
+    ataques_por_objetivo ataques a cada objetivo. Un pueblo que ataca sale
+    a (llegada - viaje) y vuelve a (llegada + viaje); desde ese momento
+    puede volver a salir, así que una ofensiva que cae pronto y cerca sirve
+    para varias oleadas (se supone que vuelve con las tropas).
+    
+    Los regresos forman una cola de eventos ordenada por hora: antes de
+    cada oleada solo se sacan de la cola los pueblos que ya han vuelto y se
+    añaden al índice espacial, y cada objetivo toma los pueblos libres más
+    cercanos que salen después de su regreso (y de hora_actual). Así cada
+    oleada solo mira los pueblos libres alrededor de cada objetivo, aunque
+    haya miles de pueblos y varias oleadas.
+    
+    Args:
+        pueblos_atacantes: lista de pueblos atacantes (o un PoolOfensivas)
+        objetivos: lista de objetivos (por tandas de 'prioridad'; en su orden dentro de cada una)
+        hora_primera_llegada: datetime de llegada de la primera oleada
+        oleadas: número de oleadas
+        horas_entre_oleadas: horas entre las llegadas de oleadas seguidas
+        ataques_por_objetivo: ataques por objetivo en cada oleada (int o dict
+                              coordenadas_str -> número)
+        mundo: identificador del mundo
+        tipo_tropa: tipo de tropa o 'auto' (unidad más lenta de cada pueblo)
+        hora_actual: (opcional) datetime desde el que se puede enviar
+        politica_prioridad: 'estricta' o 'ponderada' (ver asignador.tandas_por_prioridad)
+    
+    Returns:
+        dict: plan de ataque (ataques con 'oleada' y 'hora_regreso_ms') con
+              el resumen en plan['oleadas']
+    """
+    pueblos_atacantes = list(pueblos_atacantes)
+    objetivos = ordenar_por_prioridad(objetivos, politica_prioridad)
+    separacion = timedelta(hours=horas_entre_oleadas)
+    llegadas = [hora_primera_llegada + separacion * i for i in range(oleadas)]
+    
+    plan = {
+        'fecha_creacion': datetime.now().isoformat(),
+        'mundo': mundo,
+        'tipo_tropa': tipo_tropa,
+        'objetivos': [],
+        'pueblos_sin_asignar': [],
+        'hora_llegada_objetivo': hora_primera_llegada.strftime('%d/%m/%Y %H:%M:%S'),
+        'oleadas': {
+            'numero': oleadas,
+            'horas_entre_oleadas': horas_entre_oleadas,
+            'llegadas': [llegada.strftime('%d/%m/%Y %H:%M:%S') for llegada in llegadas],
+            'ataques_por_oleada': [],
+            'pueblos_reutilizados': 0,
+            'objetivos_incompletos': []
+        }
+    }
+    
+    # Velocidad de cada pueblo (ida y vuelta a la misma velocidad)
+    if tipo_tropa == TROPA_AUTOMATICA:
+        unidades = unidades_mas_lentas(pueblos_atacantes, mundo)
+    else:
+        unidades = [tipo_tropa] * len(pueblos_atacantes)
+    ms_por_unidad = {unidad: segundos_por_campo(unidad, mundo) * 1000 for unidad in set(unidades)}
+    velocidad = {id(p): (unidad, ms_por_unidad[unidad]) for p, unidad in zip(pueblos_atacantes, unidades)}
+    
+    # Al principio todos los pueblos están en casa desde hora_actual
+    ahora_ms = datetime_a_ms(hora_actual) if hora_actual else None
+    libre_desde = {id(p): ahora_ms for p in pueblos_atacantes}
+    orden_pueblo = {id(p): orden for orden, p in enumerate(pueblos_atacantes)}
+    ms_por_campo_min = min(ms_por_unidad.values(), default=0)
+    indice = IndiceEspacial(pueblos_atacantes)
+    regresos = []
+    usos = {}
+    
+    ataques_por_coordenadas = {}
+    pedidos_por_coordenadas = {}
+    for numero, llegada in enumerate(llegadas, 1):
+        llegada_ms = datetime_a_ms(llegada)
+        
+        # Pueblos que vuelven a casa antes de esta llegada
+        while regresos and regresos[0][0] <= llegada_ms:
+            regreso_ms, orden, pueblo = heapq.heappop(regresos)
+            libre_desde[id(pueblo)] = regreso_ms
+            indice.anadir(pueblo, orden)
+        
+        # Nadie sale antes de hora_actual: los más lejanos no llegan a tiempo
+        alcance = None
+        if ahora_ms is not None and ms_por_campo_min:
+            alcance = max(llegada_ms - ahora_ms, 0) / ms_por_campo_min
+        
+        asignados_oleada = 0
+        for objetivo in objetivos:
+            coord_objetivo = objetivo['coordenadas']
+            if isinstance(ataques_por_objetivo, dict):
+                pedidos = ataques_por_objetivo.get(coordenadas_a_string(coord_objetivo), 5)
+            else:
+                pedidos = ataques_por_objetivo
+            pedidos_por_coordenadas[coord_objetivo] = pedidos_por_coordenadas.get(coord_objetivo, 0) + max(pedidos, 0)
+            if pedidos <= 0:
+                continue
+            
+            elegidos = []
+            for d2, pueblo in indice.cercanos(coord_objetivo, alcance):
+                unidad, ms_por_campo = velocidad[id(pueblo)]
+                envio_ms = llegada_ms - round(d2 ** 0.5 * ms_por_campo)
+                libre = libre_desde[id(pueblo)]
+                if libre is None or envio_ms >= libre:
+                    elegidos.append((d2, pueblo, unidad, ms_por_campo))
+                    if len(elegidos) == pedidos:
+                        break
+            
+            ataques = ataques_por_coordenadas.setdefault(coord_objetivo, [])
+            for d2, pueblo, unidad, ms_por_campo in elegidos:
+                ataque = _crear_ataque(pueblo, objetivo, d2, unidad, ms_por_campo, llegada_ms, numero)
+                ataques.append(ataque)
+                indice.quitar(pueblo)
+                heapq.heappush(regresos, (ataque['hora_regreso_ms'], orden_pueblo[id(pueblo)], pueblo))
+                usos[id(pueblo)] = usos.get(id(pueblo), 0) + 1
+            asignados_oleada += len(elegidos)
+            
+            if len(elegidos) < pedidos:
+                plan['oleadas']['objetivos_incompletos'].append({
+                    'coordenadas': coordenadas_a_string(coord_objetivo),
+                    'oleada': numero,
+                    'ataques_asignados': len(elegidos),
+                    'ataques_pedidos': pedidos
+                })
+        
+        plan['oleadas']['ataques_por_oleada'].append(asignados_oleada)
+    
+    for objetivo in objetivos:
+        ataques = ataques_por_coordenadas.get(objetivo['coordenadas'], [])
+        plan['objetivos'].append({
+            'coordenadas': coordenadas_a_string(objetivo['coordenadas']),
+            'nombre': objetivo['nombre'],
+            'jugador_defensor': objetivo.get('jugador_defensor', 'Desconocido'),
+            'ataques': ataques,
+            'ataques_asignados': len(ataques)
+        })
+        anotar_prioridad(plan, objetivo, len(ataques), pedidos_por_coordenadas.get(objetivo['coordenadas'], 0),
+                          politica_prioridad)
+    
+    formatear_horas_plan(plan, '%d/%m/%Y')
+    
+    # Pueblos que no salen en ninguna oleada
+    plan['pueblos_sin_asignar'] = [
+        {
+            'coordenadas': coordenadas_a_string(p['coordenadas']),
+            'nombre': p['nombre'],
+            'jugador': p['jugador']
+        }
+        for p in pueblos_atacantes if id(p) not in usos
+    ]
+    plan['oleadas']['pueblos_reutilizados'] = sum(1 for veces in usos.values() if veces > 1)
+    
+    resumen = plan['oleadas']
+    print(f"🌊 {oleadas} oleadas planificadas: {' + '.join(str(n) for n in resumen['ataques_por_oleada'])} ataques "
+          f"({resumen['pueblos_reutilizados']} pueblos repiten)")
+    if resumen['objetivos_incompletos']:
+        print(f"   ⚠️  {len(resumen['objetivos_incompletos'])} objetivos sin todos sus ataques en alguna oleada")
+    return plan
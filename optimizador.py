@@ -0,0 +1,330 @@
+"""
+Módulo de optimización local de planes
+Mejora un plan ya generado intercambiando pueblos entre objetivos
+(swap) o sustituyendo ataques por pueblos sin asignar (relocate)
+dentro de un tiempo máximo
+"""
+
+import random
+import time
+from datetime import datetime
+
+from calculadora import (calcular_distancia, calcular_moral, coordenadas_a_string, tiempo_a_string, datetime_a_ms,
+                         unidades_mas_lentas, tramos_sin_bonus_noche, colocar_llegada)
+from config_mundos import segundos_por_campo, horas_bonus_noche, TROPA_AUTOMATICA
+from asignador import CAMPOS_PUEBLO, formatear_horas_plan, formato_fecha_plan
+
+
+class _EstadoPlan:
+    """
+    Plan en forma de tabla para evaluar movimientos en O(1).
+    
+    Cada ataque es una entrada (pueblo, índice de objetivo) con su moral, su
+    tiempo de viaje y la llegada de su hueco; los movimientos solo recalculan
+    las entradas que cambian.
+    """
+    
+    def __init__(self, plan, pueblos_atacantes, objetivos, mundo, disponibilidad=None, hora_actual=None, ventana=None):
+        self.plan = plan
+        self.mundo = mundo
+        self.disponibilidad = disponibilidad
+        self.tipo_tropa = plan.get('tipo_tropa', 'noble')
+        self._segundos = {}
+        self.ahora_ms = datetime_a_ms(hora_actual) if hora_actual else None
+        
+        # Ventana: tramos de llegada (sin el bonus de noche si el plan lo quitó);
+        # cada pareja recibe su propia llegada dentro de ellos
+        self.tramos = None
+        if ventana:
+            inicio_ms, fin_ms = datetime_a_ms(ventana[0]), datetime_a_ms(ventana[1])
+            horas_noche = horas_bonus_noche(mundo) if 'bonus_noche' in plan.get('ventana_llegada', {}) else None
+            self.tramos = tramos_sin_bonus_noche(inicio_ms, fin_ms, horas_noche)
+            self.objetivo_ms = datetime_a_ms(ventana[0] + (ventana[1] - ventana[0]) / 2)
+        
+        # Coordenadas -> pueblos (cada ataque o pueblo libre toma el siguiente)
+        pueblos_por_coord = {}
+        for pueblo in reversed(list(pueblos_atacantes)):
+            pueblos_por_coord.setdefault(coordenadas_a_string(pueblo['coordenadas']), []).append(pueblo)
+        
+        def tomar_pueblo(coord_str):
+            candidatos = pueblos_por_coord.get(coord_str)
+            return candidatos.pop() if candidatos else None
+        
+        puntos_por_objetivo = {coordenadas_a_string(o['coordenadas']): o.get('puntos_defensor', 0) for o in objetivos}
+        
+        # Objetivos: coordenadas y puntos del defensor
+        self.coord_objetivos = []
+        self.puntos_objetivos = []
+        # Ataques: pueblo, objetivo, moral, tiempo (minutos) y llegada del hueco (ms)
+        self.ataques = []
+        # Campos opcionales que usa este formato de plan
+        self.campos = set()
+        for idx, objetivo in enumerate(plan['objetivos']):
+            coord_str = objetivo['coordenadas']
+            x, y = coord_str.split('|')
+            self.coord_objetivos.append((int(x), int(y)))
+            self.puntos_objetivos.append(puntos_por_objetivo.get(coord_str, 0))
+            for posicion, ataque in enumerate(objetivo['ataques']):
+                pueblo = tomar_pueblo(ataque['pueblo_atacante'])
+                if pueblo is None:
+                    continue  # pueblo desconocido: ese ataque no se toca
+                self.campos.update(campo for campo in CAMPOS_PUEBLO if campo in ataque)
+                unidad = ataque.get('tropa_lenta', self.tipo_tropa)
+                moral, minutos = self.evaluar(pueblo, unidad, idx)
+                self.ataques.append([pueblo, unidad, idx, posicion, moral, minutos, ataque.get('hora_llegada_ms')])
+        
+        # Pueblos sin asignar que se pueden usar en un relocate
+        self.libres = []
+        self.libres_desconocidos = []
+        for libre in plan.get('pueblos_sin_asignar', []):
+            pueblo = tomar_pueblo(libre['coordenadas'])
+            if pueblo is not None:
+                self.libres.append(pueblo)
+            else:
+                self.libres_desconocidos.append(libre)
+    
+    def segundos_unidad(self, unidad):
+        segundos = self._segundos.get(unidad)
+        if segundos is None:
+            segundos = segundos_por_campo(unidad, self.mundo)
+            self._segundos[unidad] = segundos
+        return segundos
+    
+    def evaluar(self, pueblo, unidad, idx):
+        """Moral y tiempo de viaje (minutos) de un pueblo contra un objetivo"""
+        distancia = calcular_distancia(pueblo['coordenadas'], self.coord_objetivos[idx])
+        moral = calcular_moral(pueblo.get('puntos_jugador', 0), self.puntos_objetivos[idx])
+        return moral, distancia * self.segundos_unidad(unidad) / 60
+    
+    def tiempo_ms(self, pueblo, unidad, idx):
+        """Tiempo de viaje en milisegundos (como 'tiempo_viaje_ms' de los ataques)"""
+        distancia = calcular_distancia(pueblo['coordenadas'], self.coord_objetivos[idx])
+        return round(distancia * self.segundos_unidad(unidad) * 1000)
+    
+    def colocar(self, pueblo, tiempo_viaje_ms):
+        """Tramo (inicio, fin, llegada) al que llega una pareja en la ventana (y en su horario), o None"""
+        tramos = self.tramos
+        if self.disponibilidad:
+            tramos = self.disponibilidad.recortar_llegadas(pueblo['jugador'], tramos, tiempo_viaje_ms)
+        return colocar_llegada(tramos, tiempo_viaje_ms, self.objetivo_ms, self.ahora_ms)
+    
+    def admite(self, pueblo, unidad, idx, llegada_ms):
+        """
+        Indica si un pueblo puede ocupar un hueco: sale no antes de hora_actual,
+        llega a la ventana (si la hay) y su jugador está conectado al enviar.
+        """
+        if self.tramos is None and (llegada_ms is None or (self.ahora_ms is None and self.disponibilidad is None)):
+            return True
+        tiempo_viaje_ms = self.tiempo_ms(pueblo, unidad, idx)
+        if self.tramos is not None:
+            return self.colocar(pueblo, tiempo_viaje_ms) is not None
+        if self.ahora_ms is not None and llegada_ms - tiempo_viaje_ms < self.ahora_ms:
+            return False
+        return self.disponibilidad is None or self.disponibilidad.disponible(pueblo['jugador'], llegada_ms - tiempo_viaje_ms)
+    
+    def totales(self):
+        """(moral media, tiempo total en minutos) del estado actual"""
+        if not self.ataques:
+            return 0, 0
+        suma_moral = sum(a[4] for a in self.ataques)
+        suma_tiempo = sum(a[5] for a in self.ataques)
+        return suma_moral / len(self.ataques), suma_tiempo
+
+
+def _es_mejora(delta_moral, delta_tiempo):
+    """Primero la moral; con la misma moral, menos tiempo de viaje"""
+    return delta_moral > 0 or (delta_moral == 0 and delta_tiempo < -1e-9)
+
+
+def _unidad_de(pueblo, unidad_actual, estado):
+    """Unidad con la que viaja un pueblo nuevo en un relocate"""
+    if estado.tipo_tropa == TROPA_AUTOMATICA:
+        return unidades_mas_lentas([pueblo], estado.mundo)[0]
+    return unidad_actual
+
+
+def _reconstruir_ataque(ataque, pueblo, unidad, idx, estado, moral):
+    """Actualiza los campos del ataque para un pueblo (nuevo o intercambiado)"""
+    coord_objetivo = estado.coord_objetivos[idx]
+    distancia = calcular_distancia(pueblo['coordenadas'], coord_objetivo)
+    segundos = estado.segundos_unidad(unidad)
+    minutos = distancia * segundos / 60
+    
+    ataque['pueblo_atacante'] = coordenadas_a_string(pueblo['coordenadas'])
+    ataque['nombre_pueblo'] = pueblo['nombre']
+    ataque['jugador'] = pueblo['jugador']
+    ataque['distancia'] = round(distancia, 2)
+    ataque['tiempo_viaje'] = tiempo_a_string(minutos)
+    if 'tiempo_viaje_minutos' in ataque:
+        ataque['tiempo_viaje_minutos'] = round(minutos, 2)
+    if 'tiempo_viaje_ms' in ataque:
+        ataque['tiempo_viaje_ms'] = round(distancia * segundos * 1000)
+        if estado.tramos is not None:
+            # Tramo de la ventana al que llega el nuevo pueblo (ya comprobado al moverlo)
+            llegada_desde, llegada_hasta, _ = estado.colocar(pueblo, ataque['tiempo_viaje_ms'])
+            ataque['hora_llegada_ms'] = llegada_desde
+            ataque['hora_llegada_hasta_ms'] = llegada_hasta
+        if 'hora_llegada_ms' in ataque:
+            ataque['hora_envio_ms'] = ataque['hora_llegada_ms'] - ataque['tiempo_viaje_ms']
+        if 'hora_llegada_hasta_ms' in ataque:
+            ataque['hora_envio_hasta_ms'] = ataque['hora_llegada_hasta_ms'] - ataque['tiempo_viaje_ms']
+    ataque['moral'] = moral
+    if 'tropa_lenta' in ataque:
+        ataque['tropa_lenta'] = unidad
+    
+    # Solo los campos que ya usa el formato del plan
+    for campo in estado.campos:
+        if campo in pueblo:
+            ataque[campo] = pueblo[campo]
+        else:
+            ataque.pop(campo, None)
+
+
+def optimizar_plan(plan, pueblos_atacantes, objetivos, presupuesto_segundos=2.0, mundo=None, semilla=0,
+                   disponibilidad=None, hora_actual=None, ventana=None):
+    """
+    Mejora un plan con búsqueda local (swap y relocate) durante un tiempo máximo.
+    
+    Un swap intercambia los objetivos de dos ataques; un relocate cambia el
+    pueblo de un ataque por uno sin asignar. Solo se mueven pueblos del mismo
+    tipo de OFF, así que se respetan los tipos y cantidades pedidos por objetivo;
+    en planes balanceados los relocate solo usan pueblos del mismo jugador.
+    Un movimiento se acepta si sube la moral o, con la misma moral, reduce el
+    tiempo de viaje. Cada movimiento se evalúa con el cambio de los dos ataques
+    implicados, sin recalcular el plan entero, y el plan es válido en todo momento.
+    
+    Funciona con los planes de cualquier asignador (horas de envío incluidas).
+    
+    Args:
+        plan: plan de ataque (se modifica en el sitio)
+        pueblos_atacantes: pueblos usados para generar el plan (puntos y coordenadas)
+        objetivos: objetivos usados para generar el plan (puntos del defensor)
+        presupuesto_segundos: tiempo máximo de búsqueda
+        mundo: identificador del mundo (por defecto, el del plan)
+        semilla: semilla aleatoria (mismo plan y semilla -> mismos candidatos)
+        disponibilidad: (opcional) Disponibilidad; no se aceptan movimientos que
+            dejen un envío fuera del horario de su jugador
+        hora_actual: (opcional) datetime desde el que se puede enviar; no se
+            aceptan movimientos que dejen un envío antes de esa hora
+        ventana: (opcional) (hora_inicio, hora_fin) de llegada (por defecto, la
+            de plan['ventana_llegada']); cada pueblo movido recibe su tramo de
+            llegada como en el asignador y solo se aceptan los que llegan a alguno
+    
+    Returns:
+        dict: resumen de la mejora (también se guarda en plan['optimizacion'])
+    """
+    if 'trenes' in plan:
+        raise ValueError("Los trenes de nobles no se optimizan: cambiarían el orden de llegada")
+    
+    mundo = mundo or plan.get('mundo', 'es95')
+    if ventana is None and 'ventana_llegada' in plan:
+        ventana = tuple(datetime.strptime(plan['ventana_llegada'][clave], '%H:%M:%S %d/%m/%Y')
+                        for clave in ('inicio', 'fin'))
+    estado = _EstadoPlan(plan, pueblos_atacantes, objetivos, mundo, disponibilidad, hora_actual, ventana)
+    rng = random.Random(semilla)
+    mantener_jugadores = 'balance_jugadores' in plan
+    
+    moral_antes, tiempo_antes = estado.totales()
+    ataques = estado.ataques
+    libres = estado.libres
+    swaps = relocates = evaluados = 0
+    
+    inicio = time.perf_counter()
+    limite = inicio + presupuesto_segundos
+    
+    while ataques and time.perf_counter() < limite:
+        # Comprobar el reloj cada 256 movimientos
+        for _intento in range(256):
+            evaluados += 1
+            a = rng.choice(ataques)
+            pueblo_a, unidad_a, idx_a, _posicion, moral_a, tiempo_a, llegada_a = a
+            
+            if libres and rng.random() < 0.3:
+                # Relocate: sustituir el pueblo del ataque por uno libre
+                posicion_libre = rng.randrange(len(libres))
+                nuevo = libres[posicion_libre]
+                if nuevo.get('tipo_off') != pueblo_a.get('tipo_off'):
+                    continue
+                if mantener_jugadores and nuevo['jugador'] != pueblo_a['jugador']:
+                    continue
+                unidad_nueva = _unidad_de(nuevo, unidad_a, estado)
+                moral_n, tiempo_n = estado.evaluar(nuevo, unidad_nueva, idx_a)
+                if _es_mejora(moral_n - moral_a, tiempo_n - tiempo_a) and estado.admite(nuevo, unidad_nueva, idx_a, llegada_a):
+                    libres[posicion_libre] = pueblo_a
+                    a[0], a[1], a[4], a[5] = nuevo, unidad_nueva, moral_n, tiempo_n
+                    relocates += 1
+                continue
+            
+            # Swap: intercambiar los objetivos de dos ataques
+            b = rng.choice(ataques)
+            pueblo_b, unidad_b, idx_b, _posicion, moral_b, tiempo_b, llegada_b = b
+            if idx_a == idx_b or pueblo_a.get('tipo_off') != pueblo_b.get('tipo_off'):
+                continue
+            moral_ab, tiempo_ab = estado.evaluar(pueblo_a, unidad_a, idx_b)
+            moral_ba, tiempo_ba = estado.evaluar(pueblo_b, unidad_b, idx_a)
+            delta_moral = moral_ab + moral_ba - moral_a - moral_b
+            delta_tiempo = tiempo_ab + tiempo_ba - tiempo_a - tiempo_b
+            if (_es_mejora(delta_moral, delta_tiempo) and estado.admite(pueblo_a, unidad_a, idx_b, llegada_b)
+                    and estado.admite(pueblo_b, unidad_b, idx_a, llegada_a)):
+                a[0], a[1], a[4], a[5] = pueblo_b, unidad_b, moral_ba, tiempo_ba
+                b[0], b[1], b[4], b[5] = pueblo_a, unidad_a, moral_ab, tiempo_ab
+                swaps += 1
+    
+    # Volcar el estado final en los diccionarios del plan
+    if swaps or relocates:
+        for pueblo, unidad, idx, posicion, moral, _, _ in ataques:
+            ataque = plan['objetivos'][idx]['ataques'][posicion]
+            if ataque['pueblo_atacante'] != coordenadas_a_string(pueblo['coordenadas']):
+                _reconstruir_ataque(ataque, pueblo, unidad, idx, estado, moral)
+        
+        if relocates:
+            plan['pueblos_sin_asignar'] = [
+                {
+                    'coordenadas': coordenadas_a_string(p['coordenadas']),
+                    'nombre': p['nombre'],
+                    'jugador': p['jugador']
+                }
+                for p in libres
+            ] + estado.libres_desconocidos
+        
+        if any('hora_envio_ms' in ataque for objetivo in plan['objetivos'] for ataque in objetivo['ataques']):
+            formatear_horas_plan(plan, formato_fecha_plan(plan))
+        
+        _actualizar_estadisticas(plan)
+    
+    moral_despues, tiempo_despues = estado.totales()
+    resumen = {
+        'segundos': round(time.perf_counter() - inicio, 2),
+        'movimientos_evaluados': evaluados,
+        'swaps': swaps,
+        'relocates': relocates,
+        'moral_media_antes': round(moral_antes, 2),
+        'moral_media_despues': round(moral_despues, 2),
+        'tiempo_total_antes_minutos': round(tiempo_antes, 2),
+        'tiempo_total_despues_minutos': round(tiempo_despues, 2)
+    }
+    plan['optimizacion'] = resumen
+    
+    print(f"📈 Optimización ({resumen['segundos']} s, {swaps} swaps, {relocates} relocates):")
+    print(f"   Moral media: {resumen['moral_media_antes']}% → {resumen['moral_media_despues']}%")
+    print(f"   Tiempo total de viaje: {tiempo_a_string(tiempo_antes)} → {tiempo_a_string(tiempo_despues)}")
+    return resumen
+
+
+def _actualizar_estadisticas(plan):
+    """Recalcula estadísticas de moral y balance de jugadores tras los movimientos"""
+    ataques = [ataque for objetivo in plan['objetivos'] for ataque in objetivo['ataques']]
+    
+    if 'estadisticas_moral' in plan:
+        morales = [ataque['moral'] for ataque in ataques]
+        plan['estadisticas_moral'] = {
+            'moral_promedio': round(sum(morales) / len(morales), 1) if morales else 0,
+            'ataques_100_moral': sum(1 for moral in morales if moral == 100),
+            'ataques_baja_moral': sum(1 for moral in morales if moral < 50)
+        }
+    
+    if 'balance_jugadores' in plan:
+        balance = {jugador: 0 for jugador in plan['balance_jugadores']}
+        for ataque in ataques:
+            balance[ataque['jugador']] = balance.get(ataque['jugador'], 0) + 1
+        plan['balance_jugadores'] = balance
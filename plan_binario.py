@@ -0,0 +1,428 @@
+"""
+Módulo de almacenamiento binario de planes de ataque
+Guarda los ataques en formato columnar con una tabla de cadenas compartida
+y un índice en la cabecera para cargar objetivos o jugadores sueltos
+"""
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+# Firma y extensión de los archivos de plan binario
+MAGIA = b'GTPLAN\x00\x01'
+EXTENSION_PLAN_BINARIO = '.gtplan'
+VERSION_FORMATO = 1
+
+# Tipos de columna
+#   i: enteros de 64 bits
+#   d: decimales (float64)
+#   s: cadena (índice en la tabla de cadenas)
+#   c: coordenada (par de enteros de 32 bits)
+#   j: valor arbitrario serializado en JSON (índice en la tabla de cadenas)
+#   o: diccionario anidado (solo presencia, sus claves van en columnas hijas)
+_TAMANO_ELEMENTO = {'i': 8, 'd': 8, 's': 4, 'c': 8, 'j': 4, 'o': 0}
+_TIPO_ARRAY = {'i': 'q', 'd': 'd', 's': 'I', 'c': 'i', 'j': 'I'}
+
+_CABECERA_FIJA = struct.Struct('<BI')
+_INVERTIR_BYTES = sys.byteorder != 'little'
+
+
+def _es_entero(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def _tipo_columna(valores):
+    """
+    Deduce el tipo de columna a partir de los valores presentes.
+
+    Args:
+        valores: lista de valores (sin ausentes)
+
+    Returns:
+        str: código de tipo de columna
+    """
+    if all(_es_entero(v) and -2**63 <= v < 2**63 for v in valores):
+        return 'i'
+    if all(isinstance(v, float) for v in valores):
+        return 'd'
+    if all(isinstance(v, str) for v in valores):
+        return 's'
+    if all(isinstance(v, (tuple, list)) and len(v) == 2 and
+           all(_es_entero(c) and -2**31 <= c < 2**31 for c in v) for v in valores):
+        return 'c'
+    if all(isinstance(v, dict) for v in valores):
+        return 'o'
+    return 'j'
+
+
+class _TablaCadenas:
+    """Tabla de cadenas compartida por todas las columnas del plan"""
+
+    def __init__(self):
+        self.cadenas = []
+        self._indices = {}
+
+    def indice(self, cadena):
+        idx = self._indices.get(cadena)
+        if idx is None:
+            idx = len(self.cadenas)
+            self._indices[cadena] = idx
+            self.cadenas.append(cadena)
+        return idx
+
+
+def _a_bytes(datos):
+    if _INVERTIR_BYTES:
+        datos.byteswap()
+    return datos.tobytes()
+
+
+def _desde_bytes(tipo, contenido):
+    datos = array(_TIPO_ARRAY[tipo])
+    datos.frombytes(contenido)
+    if _INVERTIR_BYTES:
+        datos.byteswap()
+    return datos
+
+
+def _codificar_columnas(filas, ruta, columnas, partes, tabla):
+    """
+    Codifica recursivamente las columnas de una lista de diccionarios.
+
+    Args:
+        filas: lista de diccionarios (o None si la fila no tiene el padre)
+        ruta: ruta de claves hasta este nivel
+        columnas: lista donde se añaden los descriptores de columna
+        partes: lista donde se añaden los bytes de cada columna
+        tabla: tabla de cadenas del plan
+    """
+    claves = {}
+    for fila in filas:
+        if fila is not None:
+            for clave in fila:
+                claves.setdefault(clave, None)
+
+    for clave in claves:
+        valores = [fila.get(clave) if fila is not None and clave in fila else None for fila in filas]
+        presencia = [fila is not None and clave in fila for fila in filas]
+        presentes = [v for v, p in zip(valores, presencia) if p]
+        tipo = _tipo_columna(presentes)
+        con_presencia = not all(presencia)
+
+        columnas.append([ruta + [clave], tipo, con_presencia])
+        if con_presencia:
+            partes.append(bytes(presencia))
+
+        if tipo == 'o':
+            hijos = [v if p else None for v, p in zip(valores, presencia)]
+            _codificar_columnas(hijos, ruta + [clave], columnas, partes, tabla)
+        elif tipo == 'c':
+            datos = array('i')
+            for x, y in presentes:
+                datos.append(x)
+                datos.append(y)
+            partes.append(_a_bytes(datos))
+        elif tipo == 's':
+            partes.append(_a_bytes(array('I', [tabla.indice(v) for v in presentes])))
+        elif tipo == 'j':
+            partes.append(_a_bytes(array('I', [
+                tabla.indice(json.dumps(v, ensure_ascii=False, separators=(',', ':')))
+                for v in presentes
+            ])))
+        else:
+            partes.append(_a_bytes(array(_TIPO_ARRAY[tipo], presentes)))
+
+
+def _decodificar_bloque(contenido, num_filas, columnas, cadenas):
+    """
+    Reconstruye la lista de ataques de un bloque columnar.
+
+    Args:
+        contenido: bytes del bloque (ya descomprimido)
+        num_filas: número de ataques del bloque
+        columnas: descriptores de columna del bloque
+        cadenas: tabla de cadenas del plan
+
+    Returns:
+        list: lista de ataques
+    """
+    filas = [{} for _ in range(num_filas)]
+    # Contenedor de cada fila por ruta de padre (los diccionarios anidados)
+    contenedores = {(): filas}
+    posicion = 0
+
+    for ruta, tipo, con_presencia in columnas:
+        ruta = tuple(ruta)
+        padres = contenedores[ruta[:-1]]
+        clave = ruta[-1]
+
+        if con_presencia:
+            presencia = contenido[posicion:posicion + num_filas]
+            posicion += num_filas
+            indices = [i for i in range(num_filas) if presencia[i] and padres[i] is not None]
+        else:
+            indices = [i for i in range(num_filas) if padres[i] is not None]
+
+        if tipo == 'o':
+            hijos = [None] * num_filas
+            for i in indices:
+                hijos[i] = padres[i][clave] = {}
+            contenedores[ruta] = hijos
+            continue
+
+        longitud = len(indices) * _TAMANO_ELEMENTO[tipo]
+        datos = _desde_bytes(tipo, contenido[posicion:posicion + longitud])
+        posicion += longitud
+
+        if tipo == 'c':
+            for n, i in enumerate(indices):
+                padres[i][clave] = (datos[2 * n], datos[2 * n + 1])
+        elif tipo == 's':
+            for i, idx in zip(indices, datos):
+                padres[i][clave] = cadenas[idx]
+        elif tipo == 'j':
+            for i, idx in zip(indices, datos):
+                padres[i][clave] = json.loads(cadenas[idx])
+        else:
+            for i, valor in zip(indices, datos):
+                padres[i][clave] = valor
+
+    return filas
+
+
+def guardar_plan_binario(plan, ruta_archivo, comprimir=True):
+    """
+    Guarda un plan de ataque en formato binario columnar.
+
+    Los ataques de cada objetivo se guardan en un bloque independiente,
+    con los nombres de jugadores y pueblos en una tabla de cadenas común.
+    La cabecera contiene el índice de bloques por objetivo y por jugador.
+
+    Args:
+        plan: diccionario con el plan de ataque
+        ruta_archivo: ruta donde guardar el archivo
+        comprimir: si True, comprime cabecera y bloques con zlib
+    """
+    tabla = _TablaCadenas()
+    indice_objetivos = []
+    indice_jugadores = {}
+    bloques = []
+    desplazamiento = 0
+
+    for idx, objetivo in enumerate(plan['objetivos']):
+        ataques = objetivo.get('ataques', [])
+        columnas = []
+        partes = []
+        _codificar_columnas(ataques, [], columnas, partes, tabla)
+
+        bloque = b''.join(partes)
+        if comprimir:
+            bloque = zlib.compress(bloque)
+        bloques.append(bloque)
+
+        entrada = {clave: valor for clave, valor in objetivo.items() if clave != 'ataques'}
+        entrada['_bloque'] = [desplazamiento, len(bloque), len(ataques)]
+        entrada['_columnas'] = columnas
+        indice_objetivos.append(entrada)
+        desplazamiento += len(bloque)
+
+        for ataque in ataques:
+            jugador = ataque.get('jugador')
+            if jugador is None:
+                continue
+            indices = indice_jugadores.setdefault(jugador, [])
+            if not indices or indices[-1] != idx:
+                indices.append(idx)
+
+    cabecera = {
+        'version': VERSION_FORMATO,
+        'metadatos': {clave: valor for clave, valor in plan.items() if clave != 'objetivos'},
+        'cadenas': tabla.cadenas,
+        'objetivos': indice_objetivos,
+        'jugadores': indice_jugadores
+    }
+    cabecera_bytes = json.dumps(cabecera, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if comprimir:
+        cabecera_bytes = zlib.compress(cabecera_bytes)
+
+    with open(ruta_archivo, 'wb') as f:
+        f.write(MAGIA)
+        f.write(_CABECERA_FIJA.pack(1 if comprimir else 0, len(cabecera_bytes)))
+        f.write(cabecera_bytes)
+        for bloque in bloques:
+            f.write(bloque)
+
+    print(f"✅ Plan binario guardado en: {ruta_archivo}")
+
+
+class PlanBinario:
+    """Lector perezoso de planes binarios: solo carga los bloques que se piden"""
+
+    def __init__(self, ruta_archivo):
+        """
+        Abre un plan binario y lee su cabecera.
+
+        Args:
+            ruta_archivo: ruta al archivo .gtplan
+        """
+        self.ruta_archivo = ruta_archivo
+        self._archivo = open(ruta_archivo, 'rb')
+
+        try:
+            if self._archivo.read(len(MAGIA)) != MAGIA:
+                raise ValueError(f"El archivo no es un plan binario válido: {ruta_archivo}")
+
+            comprimido, longitud = _CABECERA_FIJA.unpack(self._archivo.read(_CABECERA_FIJA.size))
+            cabecera_bytes = self._archivo.read(longitud)
+            if comprimido:
+                cabecera_bytes = zlib.decompress(cabecera_bytes)
+        except Exception:
+            self._archivo.close()
+            raise
+
+        cabecera = json.loads(cabecera_bytes.decode('utf-8'))
+
+        self.comprimido = bool(comprimido)
+        self.metadatos = cabecera['metadatos']
+        self._cadenas = cabecera['cadenas']
+        self._objetivos = cabecera['objetivos']
+        self._jugadores = cabecera['jugadores']
+        self._inicio_datos = len(MAGIA) + _CABECERA_FIJA.size + longitud
+        self._por_coordenadas = {obj.get('coordenadas'): idx for idx, obj in enumerate(self._objetivos)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+    def __len__(self):
+        return len(self._objetivos)
+
+    def cerrar(self):
+        """Cierra el archivo subyacente"""
+        self._archivo.close()
+
+    def jugadores(self):
+        """
+        Returns:
+            list: nombres de los jugadores con ataques en el plan
+        """
+        return list(self._jugadores)
+
+    def resumen_objetivos(self):
+        """
+        Devuelve los datos de cada objetivo sin cargar sus ataques.
+
+        Returns:
+            list: lista de diccionarios de objetivo (sin 'ataques')
+        """
+        return [
+            {clave: valor for clave, valor in obj.items() if not clave.startswith('_')}
+            for obj in self._objetivos
+        ]
+
+    def _leer_ataques(self, idx):
+        entrada = self._objetivos[idx]
+        desplazamiento, longitud, num_filas = entrada['_bloque']
+
+        self._archivo.seek(self._inicio_datos + desplazamiento)
+        contenido = self._archivo.read(longitud)
+        if self.comprimido:
+            contenido = zlib.decompress(contenido)
+
+        return _decodificar_bloque(contenido, num_filas, entrada['_columnas'], self._cadenas)
+
+    def _objetivo_con_ataques(self, idx, ataques):
+        objetivo = {clave: valor for clave, valor in self._objetivos[idx].items() if not clave.startswith('_')}
+        objetivo['ataques'] = ataques
+        return objetivo
+
+    def cargar_objetivo(self, objetivo):
+        """
+        Carga un objetivo con todos sus ataques.
+
+        Args:
+            objetivo: índice del objetivo o coordenadas en formato "xxx|yyy"
+
+        Returns:
+            dict: objetivo con sus ataques
+        """
+        idx = self._por_coordenadas[objetivo] if isinstance(objetivo, str) else objetivo
+        return self._objetivo_con_ataques(idx, self._leer_ataques(idx))
+
+    def cargar_jugador(self, jugador):
+        """
+        Carga solo los ataques de un jugador, leyendo únicamente los bloques
+        de los objetivos donde participa.
+
+        Args:
+            jugador: nombre del jugador
+
+        Returns:
+            list: objetivos con solo los ataques de ese jugador
+        """
+        objetivos = []
+        for idx in self._jugadores.get(jugador, []):
+            ataques = [a for a in self._leer_ataques(idx) if a.get('jugador') == jugador]
+            objetivos.append(self._objetivo_con_ataques(idx, ataques))
+        return objetivos
+
+    def plan_de_jugador(self, jugador):
+        """
+        Construye un plan con los metadatos completos y solo los ataques de un jugador.
+
+        Args:
+            jugador: nombre del jugador
+
+        Returns:
+            dict: plan de ataque reducido
+        """
+        plan = dict(self.metadatos)
+        plan['objetivos'] = self.cargar_jugador(jugador)
+        return plan
+
+    def __iter__(self):
+        for idx in range(len(self._objetivos)):
+            yield self.cargar_objetivo(idx)
+
+    def a_plan(self):
+        """
+        Carga el plan completo.
+
+        Returns:
+            dict: plan de ataque
+        """
+        plan = dict(self.metadatos)
+        plan['objetivos'] = list(self)
+        return plan
+
+
+def cargar_plan_binario(ruta_archivo):
+    """
+    Carga un plan de ataque completo desde formato binario.
+
+    Args:
+        ruta_archivo: ruta al archivo .gtplan
+
+    Returns:
+        dict: plan de ataque
+    """
+    try:
+        with PlanBinario(ruta_archivo) as lector:
+            plan = lector.a_plan()
+        print(f"✅ Plan cargado desde: {ruta_archivo}")
+        return plan
+    except FileNotFoundError:
+        print(f"❌ Archivo no encontrado: {ruta_archivo}")
+        return None
+    except (ValueError, zlib.error, struct.error) as e:
+        print(f"❌ Error al leer plan binario: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    print("=== Módulo de Plan Binario ===")
+    print("Importa este módulo desde main.py para guardar/cargar planes compactos")
@@ -0,0 +1,328 @@
+"""
+Módulo de planificación por regiones en paralelo
+Divide objetivos y pueblos en regiones independientes (que no comparten
+pueblos), resuelve cada una en un proceso distinto y une los resultados
+"""
+
+import io
+import contextlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from calculadora import coordenadas_a_string
+
+# Métodos de asignación y formas de dividir el plan en regiones
+METODOS_PARALELO = ('distancia', 'balanceado', 'sincronizado', 'moral')
+DIVISIONES_REGIONES = ('distancia', 'categoria', 'continente')
+
+
+def continente(coordenadas):
+    """
+    Calcula el continente (K) de unas coordenadas.
+    
+    Args:
+        coordenadas: tupla (x, y)
+    
+    Returns:
+        int: número de continente (K55 para 5xx|5xx)
+    """
+    x, y = coordenadas
+    return (y // 100) * 10 + x // 100
+
+
+def _buscar(padres, i):
+    """Raíz del conjunto de i (union-find con compresión de caminos)"""
+    while padres[i] != i:
+        padres[i] = padres[padres[i]]
+        i = padres[i]
+    return i
+
+
+def _unir(padres, a, b):
+    """Une los conjuntos de a y b; la raíz es siempre el índice menor"""
+    raiz_a = _buscar(padres, a)
+    raiz_b = _buscar(padres, b)
+    if raiz_a != raiz_b:
+        if raiz_b < raiz_a:
+            raiz_a, raiz_b = raiz_b, raiz_a
+        padres[raiz_b] = raiz_a
+
+
+def _objetivos_alcanzables(pueblos, objetivos, distancia_max):
+    """
+    Para cada pueblo, índices de los objetivos a distancia <= distancia_max.
+    
+    Usa una rejilla de celdas de lado distancia_max, así que cada pueblo solo
+    se compara con los objetivos de las 9 celdas vecinas.
+    """
+    lado = max(1, int(distancia_max))
+    limite = distancia_max * distancia_max
+    
+    celdas = {}
+    for idx, objetivo in enumerate(objetivos):
+        x, y = objetivo['coordenadas']
+        celdas.setdefault((x // lado, y // lado), []).append(idx)
+    
+    alcanzables = []
+    for pueblo in pueblos:
+        x, y = pueblo['coordenadas']
+        cx, cy = x // lado, y // lado
+        cercanos = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for idx in celdas.get((cx + dx, cy + dy), ()):
+                    ox, oy = objetivos[idx]['coordenadas']
+                    if (ox - x) ** 2 + (oy - y) ** 2 <= limite:
+                        cercanos.append(idx)
+        alcanzables.append(sorted(cercanos))
+    return alcanzables
+
+
+def _armar_regiones(padres, pueblos, objetivos, pueblo_a_objetivo):
+    """
+    Agrupa objetivos y pueblos por raíz del union-find.
+    
+    Returns:
+        list: regiones ordenadas por su primer objetivo
+    """
+    regiones = {}
+    for idx, objetivo in enumerate(objetivos):
+        region = regiones.setdefault(_buscar(padres, idx), {'objetivos': [], 'pueblos': []})
+        region['objetivos'].append(objetivo)
+    
+    for pueblo, idx in zip(pueblos, pueblo_a_objetivo):
+        if idx is not None:
+            regiones[_buscar(padres, idx)]['pueblos'].append(pueblo)
+    
+    return [regiones[raiz] for raiz in sorted(regiones)]
+
+
+def regiones_por_distancia(pueblos, objetivos, distancia_max, grupos=None):
+    """
+    Divide el plan en regiones según el alcance de los pueblos.
+    
+    Un pueblo pertenece a la región de los objetivos que tiene a distancia
+    <= distancia_max; dos objetivos alcanzables desde un mismo pueblo quedan
+    en la misma región. Los pueblos que no alcanzan ningún objetivo no
+    pertenecen a ninguna región.
+    
+    Args:
+        pueblos: lista de pueblos atacantes
+        objetivos: lista de objetivos
+        distancia_max: alcance en campos (p. ej. la distancia máxima de nobles)
+        grupos: (opcional) listas de índices de objetivos que deben ir juntos
+                (por ejemplo, una categoría de leer_categorias_objetivos)
+    
+    Returns:
+        tuple: (regiones, pueblos_fuera) con regiones = [{'objetivos', 'pueblos'}]
+    """
+    padres = list(range(len(objetivos)))
+    for grupo in grupos or []:
+        for idx in grupo[1:]:
+            _unir(padres, grupo[0], idx)
+    
+    pueblo_a_objetivo = []
+    pueblos_fuera = []
+    for pueblo, cercanos in zip(pueblos, _objetivos_alcanzables(pueblos, objetivos, distancia_max)):
+        if not cercanos:
+            pueblo_a_objetivo.append(None)
+            pueblos_fuera.append(pueblo)
+            continue
+        for idx in cercanos[1:]:
+            _unir(padres, cercanos[0], idx)
+        pueblo_a_objetivo.append(cercanos[0])
+    
+    return _armar_regiones(padres, pueblos, objetivos, pueblo_a_objetivo), pueblos_fuera
+
+
+def regiones_por_continente(pueblos, objetivos):
+    """
+    Divide el plan por continentes: cada pueblo solo ataca objetivos de su K.
+    
+    Args:
+        pueblos: lista de pueblos atacantes
+        objetivos: lista de objetivos
+    
+    Returns:
+        tuple: (regiones, pueblos_fuera) como regiones_por_distancia
+    """
+    padres = list(range(len(objetivos)))
+    primero_por_k = {}
+    for idx, objetivo in enumerate(objetivos):
+        k = continente(objetivo['coordenadas'])
+        if k in primero_por_k:
+            _unir(padres, primero_por_k[k], idx)
+        else:
+            primero_por_k[k] = idx
+    
+    pueblo_a_objetivo = [primero_por_k.get(continente(pueblo['coordenadas'])) for pueblo in pueblos]
+    pueblos_fuera = [pueblo for pueblo, idx in zip(pueblos, pueblo_a_objetivo) if idx is None]
+    return _armar_regiones(padres, pueblos, objetivos, pueblo_a_objetivo), pueblos_fuera
+
+
+def _planificar_region(metodo, pueblos, objetivos, opciones):
+    """
+    Resuelve una región con el asignador indicado (se ejecuta en un proceso hijo).
+    
+    La salida por consola de los asignadores se descarta para no mezclar
+    los mensajes de varios procesos.
+    """
+    import asignador
+    
+    mundo = opciones.get('mundo', 'es95')
+    tipo_tropa = opciones.get('tipo_tropa', 'noble')
+    ataques = opciones.get('ataques_por_objetivo', 5)
+    politica = opciones.get('politica_prioridad', 'estricta')
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        if metodo == 'distancia':
+            return asignador.asignar_ataques_por_distancia(pueblos, objetivos, ataques, mundo, tipo_tropa,
+                                                           politica_prioridad=politica)
+        if metodo == 'balanceado':
+            return asignador.balancear_por_jugador(pueblos, objetivos, ataques, mundo, tipo_tropa, politica_prioridad=politica)
+        if metodo == 'sincronizado':
+            return asignador.asignar_con_sincronizacion(pueblos, objetivos, opciones['hora_llegada'], ataques, mundo, tipo_tropa,
+                                                        opciones.get('disponibilidad'), politica)
+        return asignador.asignar_optimizando_moral(
+            pueblos, objetivos, ataques, mundo, tipo_tropa,
+            opciones.get('hora_llegada'), opciones.get('tipo_off_por_objetivo'), opciones.get('disponibilidad'),
+            opciones.get('ventana'), opciones.get('hora_actual'), politica, opciones.get('pesos'),
+            opciones.get('optimo', False)
+        )
+
+
+def _unir_planes(planes, pueblos_fuera, opciones):
+    """
+    Une los planes de cada región en un único plan, en el orden de las regiones.
+    """
+    plan = {
+        'fecha_creacion': datetime.now().isoformat(),
+        'mundo': opciones.get('mundo', 'es95'),
+        'tipo_tropa': opciones.get('tipo_tropa', 'noble'),
+        'objetivos': [],
+        'pueblos_sin_asignar': [],
+        'regiones': []
+    }
+    
+    total_ataques = 0
+    suma_moral = 0
+    for plan_region in planes:
+        num_ataques = sum(len(objetivo['ataques']) for objetivo in plan_region['objetivos'])
+        plan['objetivos'].extend(plan_region['objetivos'])
+        plan['pueblos_sin_asignar'].extend(plan_region['pueblos_sin_asignar'])
+        plan['regiones'].append({
+            'objetivos': len(plan_region['objetivos']),
+            'ataques': num_ataques
+        })
+        
+        if 'hora_llegada_objetivo' in plan_region:
+            plan['hora_llegada_objetivo'] = plan_region['hora_llegada_objetivo']
+        
+        if 'ventana_llegada' in plan_region:
+            ventana = plan.setdefault('ventana_llegada', dict(plan_region['ventana_llegada'], pares_descartados=0))
+            ventana['pares_descartados'] += plan_region['ventana_llegada'].get('pares_descartados', 0)
+        
+        if 'balance_jugadores' in plan_region:
+            balance = plan.setdefault('balance_jugadores', {})
+            for jugador, cantidad in plan_region['balance_jugadores'].items():
+                balance[jugador] = balance.get(jugador, 0) + cantidad
+        
+        if 'disponibilidad' in plan_region:
+            resumen = plan.setdefault('disponibilidad', {'pares_descartados': 0, 'objetivos_incompletos': []})
+            resumen['pares_descartados'] += plan_region['disponibilidad']['pares_descartados']
+            resumen['objetivos_incompletos'].extend(plan_region['disponibilidad']['objetivos_incompletos'])
+        
+        if 'prioridades' in plan_region:
+            resumen = plan.setdefault('prioridades', {
+                'politica': plan_region['prioridades']['politica'], 'por_prioridad': {}, 'objetivos_incompletos': []
+            })
+            for prioridad, nivel in plan_region['prioridades']['por_prioridad'].items():
+                total = resumen['por_prioridad'].setdefault(prioridad, dict.fromkeys(nivel, 0))
+                for clave, valor in nivel.items():
+                    total[clave] += valor
+            resumen['objetivos_incompletos'].extend(plan_region['prioridades']['objetivos_incompletos'])
+        
+        if 'estadisticas_moral' in plan_region:
+            stats = plan_region['estadisticas_moral']
+            total = plan.setdefault('estadisticas_moral', {
+                'moral_promedio': 0,
+                'ataques_100_moral': 0,
+                'ataques_baja_moral': 0
+            })
+            total['ataques_100_moral'] += stats['ataques_100_moral']
+            total['ataques_baja_moral'] += stats['ataques_baja_moral']
+            suma_moral += stats['moral_promedio'] * num_ataques
+        
+        total_ataques += num_ataques
+    
+    if 'estadisticas_moral' in plan and total_ataques > 0:
+        plan['estadisticas_moral']['moral_promedio'] = round(suma_moral / total_ataques, 1)
+    
+    # Pueblos que no alcanzan ningún objetivo
+    plan['pueblos_sin_asignar'].extend(
+        {
+            'coordenadas': coordenadas_a_string(p['coordenadas']),
+            'nombre': p['nombre'],
+            'jugador': p['jugador']
+        }
+        for p in pueblos_fuera
+    )
+    
+    return plan
+
+
+def planificar_en_paralelo(pueblos, objetivos, metodo='moral', division='distancia', distancia_max=None,
+                           grupos=None, max_procesos=None, **opciones):
+    """
+    Genera un plan resolviendo cada región independiente en un proceso.
+    
+    Las regiones se resuelven con el mismo asignador que el plan normal y
+    se unen siempre en el mismo orden (el de su primer objetivo), así que el
+    resultado no depende de qué proceso termine antes.
+    
+    Args:
+        pueblos: lista de pueblos atacantes
+        objetivos: lista de objetivos
+        metodo: 'distancia', 'balanceado', 'sincronizado' o 'moral'
+        division: 'distancia' (alcance de nobles), 'categoria' (grupos + alcance) o 'continente'
+        distancia_max: alcance en campos (por defecto, la distancia máxima de nobles del mundo)
+        grupos: (opcional) listas de índices de objetivos que deben ir juntos (p. ej. por categoría)
+        max_procesos: número de procesos (None = número de núcleos)
+        **opciones: mundo, tipo_tropa, ataques_por_objetivo, hora_llegada, tipo_off_por_objetivo, disponibilidad,
+            ventana, hora_actual, pesos, optimo (estas cuatro solo con el método moral), politica_prioridad
+    
+    Returns:
+        dict: plan de ataque con la lista 'regiones' (objetivos y ataques por región)
+    """
+    if metodo not in METODOS_PARALELO:
+        raise ValueError(f"Método desconocido: {metodo}. Usa uno de: {', '.join(METODOS_PARALELO)}")
+    if metodo == 'sincronizado' and not opciones.get('hora_llegada'):
+        raise ValueError("El método sincronizado necesita hora_llegada")
+    
+    if division == 'categoria' and not grupos:
+        raise ValueError("La división por categoría necesita los grupos de objetivos")
+    
+    if division == 'continente':
+        regiones, pueblos_fuera = regiones_por_continente(pueblos, objetivos)
+    elif division in ('distancia', 'categoria'):
+        if distancia_max is None:
+            from config_mundos import obtener_config
+            distancia_max = obtener_config(opciones.get('mundo', 'es95'))['distancia_maxima_nobles']
+        regiones, pueblos_fuera = regiones_por_distancia(pueblos, objetivos, distancia_max, grupos)
+    else:
+        raise ValueError(f"División desconocida: {division}. Usa 'distancia', 'categoria' o 'continente'")
+    
+    print(f"🗺️  {len(regiones)} regiones independientes ({len(pueblos_fuera)} pueblos fuera de alcance)")
+    
+    argumentos = [(metodo, region['pueblos'], region['objetivos'], opciones) for region in regiones]
+    
+    if len(regiones) <= 1 or max_procesos == 1:
+        planes = [_planificar_region(*args) for args in argumentos]
+    else:
+        with ProcessPoolExecutor(max_workers=max_procesos) as executor:
+            # map devuelve los resultados en el orden de envío
+            planes = list(executor.map(_planificar_region, *zip(*argumentos)))
+    
+    plan = _unir_planes(planes, pueblos_fuera, opciones)
+    print(f"✅ Plan por regiones: {sum(r['ataques'] for r in plan['regiones'])} ataques en {len(regiones)} regiones")
+    return plan
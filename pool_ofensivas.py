@@ -0,0 +1,109 @@
+"""
+Módulo del pool de ofensivas
+Agrupa los pueblos atacantes por tipo de OFF y lleva la cuenta de las
+ofensivas reservadas, para consultar disponibles sin recorrer la lista
+"""
+
+# Tipos de OFF del CSV de ofensivas, en el orden en que se muestran
+TIPOS_OFF = ('SUPER', 'FULL', '3/4', 'MEDIA')
+
+
+class PoolOfensivas:
+    """
+    Pueblos atacantes indexados por tipo de OFF con contadores.
+    
+    Los totales por tipo se calculan una vez al crear el pool; las
+    reservas (ofensivas comprometidas con un objetivo mientras se
+    configura el plan) actualizan los contadores, así que total(),
+    disponibles() y reservadas() son O(1).
+    """
+    
+    def __init__(self, pueblos):
+        """
+        Args:
+            pueblos: lista de pueblos (con 'tipo_off' opcional)
+        """
+        self.pueblos = list(pueblos)
+        self._por_tipo = {}
+        for pueblo in self.pueblos:
+            self._por_tipo.setdefault(pueblo.get('tipo_off'), []).append(pueblo)
+        
+        self._reservadas_por_tipo = {}
+        self._reservadas = 0
+    
+    def __len__(self):
+        return len(self.pueblos)
+    
+    def __iter__(self):
+        return iter(self.pueblos)
+    
+    def tipos(self):
+        """Tipos de OFF presentes, en orden de aparición"""
+        return list(self._por_tipo)
+    
+    def pueblos_de_tipo(self, tipo):
+        """
+        Pueblos de un tipo de OFF.
+        
+        Args:
+            tipo: tipo de OFF ('SUPER', 'FULL', '3/4', 'MEDIA'...)
+        
+        Returns:
+            list: pueblos de ese tipo (lista interna, no modificar)
+        """
+        return self._por_tipo.get(tipo, [])
+    
+    def total(self, tipo=None):
+        """Número de ofensivas (de un tipo o todas)"""
+        if tipo is None:
+            return len(self.pueblos)
+        return len(self._por_tipo.get(tipo, ()))
+    
+    def reservadas(self, tipo=None):
+        """Número de ofensivas reservadas (de un tipo o todas)"""
+        if tipo is None:
+            return self._reservadas
+        return self._reservadas_por_tipo.get(tipo, 0)
+    
+    def disponibles(self, tipo=None):
+        """
+        Ofensivas aún sin reservar.
+        
+        Sin tipo devuelve el total restante; puede ser negativo si se
+        reservaron más de las que hay (el menú permite continuar igualmente).
+        """
+        return self.total(tipo) - self.reservadas(tipo)
+    
+    def reservar(self, cantidad, tipo=None):
+        """
+        Reserva ofensivas para un objetivo.
+        
+        Args:
+            cantidad: número de ofensivas
+            tipo: tipo de OFF reservado, o None si vale cualquiera
+        """
+        self._reservadas += cantidad
+        if tipo is not None:
+            self._reservadas_por_tipo[tipo] = self._reservadas_por_tipo.get(tipo, 0) + cantidad
+    
+    def reservar_tipo(self, cantidad, tipo):
+        """
+        Cuenta ofensivas de un tipo sin tocar el total restante.
+        
+        Útil cuando el total ya se reservó sin tipo y después se concreta
+        la composición (por ejemplo, una mezcla SUPER + FULL).
+        """
+        self._reservadas_por_tipo[tipo] = self._reservadas_por_tipo.get(tipo, 0) + cantidad
+    
+    def conteo_por_tipo(self, tipos=TIPOS_OFF):
+        """
+        Total de ofensivas de cada tipo.
+        
+        Returns:
+            dict: {tipo: total}
+        """
+        return {tipo: self.total(tipo) for tipo in tipos}
+    
+    def desglose(self):
+        """Texto "SUPER=n, FULL=n, 3/4=n, MEDIA=n" para mostrar en consola"""
+        return ', '.join(f"{tipo}={total}" for tipo, total in self.conteo_por_tipo().items())
@@ -0,0 +1,276 @@
+"""
+Módulo de programación de envíos por jugador
+Reparte las horas de envío de cada jugador con una separación mínima
+entre órdenes, sin salirse de la ventana de llegada de cada ataque
+"""
+
+import heapq
+import math
+from bisect import bisect_left, bisect_right
+
+from calculadora import tiempo_a_string
+
+# Separación mínima por defecto entre dos envíos del mismo jugador
+SEPARACION_POR_DEFECTO_MS = 1000
+
+
+def _intervalos_envio(ataque, margen_llegada_ms):
+    """
+    Rango permitido de la hora de envío de un ataque (ms).
+    
+    Con ventana de llegada es [envío al inicio, envío al final]; sin ella,
+    la llegada puede retrasarse hasta margen_llegada_ms.
+    """
+    inicio = ataque['hora_envio_ms']
+    fin = ataque.get('hora_envio_hasta_ms', inicio + margen_llegada_ms)
+    return inicio, fin
+
+
+def _regiones_prohibidas(tareas, separacion_ms, retraso_ms=0, descartados=None):
+    """
+    Regiones prohibidas para envíos de la misma duración (Garey, Johnson, Simons y Tarjan).
+    
+    Recorre los inicios de rango de mayor a menor y coloca hacia atrás, lo más
+    tarde posible y por plazo, los ataques que empiezan en ese inicio o
+    después. Si el primero queda antes del inicio, no hay reparto posible;
+    si queda a menos de una separación, ningún envío puede empezar en el
+    hueco abierto (c - separación, inicio), porque empujaría a esos ataques
+    fuera de plazo. Las regiones se guardan unidas y ordenadas, así que
+    comprobar una hora es una búsqueda binaria.
+    
+    La colocación hacia atrás se mantiene de un inicio al siguiente: cada
+    ataque nuevo entra por su plazo (búsqueda binaria) y solo corre hacia
+    atrás a los de plazo menor hasta el primero que no se mueve.
+    
+    Args:
+        tareas: lista de (inicio, fin, ataque)
+        separacion_ms: separación mínima entre dos envíos
+        retraso_ms: retraso añadido a todos los plazos
+        descartados: (opcional) lista en la que dejar los ataques que no caben;
+            sin ella, un ataque que no cabe hace que no haya reparto posible
+    
+    Returns:
+        tuple: (desdes, hastas) de las regiones abiertas, o None si no hay reparto posible
+    """
+    desdes, hastas = [], []
+    regiones = (desdes, hastas)
+    # Colocación hacia atrás de los ataques ya liberados: plazos negados (de mayor
+    # a menor plazo) y la hora de cada uno, que baja a lo largo de la lista
+    plazos, horas = [], []
+    por_inicio = sorted(tareas, key=lambda t: t[0], reverse=True)
+    siguiente = 0
+    while siguiente < len(por_inicio):
+        liberacion = por_inicio[siguiente][0]
+        while siguiente < len(por_inicio) and por_inicio[siguiente][0] == liberacion:
+            _, fin, ataque = por_inicio[siguiente]
+            siguiente += 1
+            plazo = fin + retraso_ms
+            posicion = bisect_right(plazos, -plazo)
+            anterior = horas[posicion - 1] if posicion else math.inf
+            hora = _fuera_de_regiones(min(plazo, anterior - separacion_ms), regiones, hacia_atras=True)
+            
+            # Los de plazo menor se corren hacia atrás hasta el primero que no cambia
+            corridas = []
+            for i in range(posicion, len(horas)):
+                anterior = corridas[-1] if corridas else hora
+                corrida = _fuera_de_regiones(min(-plazos[i], anterior - separacion_ms), regiones, hacia_atras=True)
+                if corrida == horas[i]:
+                    break
+                corridas.append(corrida)
+            
+            primero = hora if posicion == len(horas) else horas[-1]
+            if posicion + len(corridas) == len(horas) and corridas:
+                primero = corridas[-1]
+            if primero < liberacion:
+                if descartados is None:
+                    return None
+                descartados.append(ataque)
+                continue
+            horas[posicion:posicion + len(corridas)] = corridas
+            plazos.insert(posicion, -plazo)
+            horas.insert(posicion, hora)
+        
+        primero = horas[-1] if horas else math.inf
+        if primero < liberacion + separacion_ms:
+            # Las regiones anteriores terminan después de esta liberación: como
+            # mucho la primera se solapa con la nueva
+            desde = primero - separacion_ms
+            if desdes and desdes[0] < liberacion:
+                desdes[0] = min(desdes[0], desde)
+            else:
+                desdes.insert(0, desde)
+                hastas.insert(0, liberacion)
+    return regiones
+
+
+def _fuera_de_regiones(hora, regiones, hacia_atras=False):
+    """Mueve una hora al borde de la región prohibida que la contiene (si la hay)"""
+    desdes, hastas = regiones
+    i = bisect_left(desdes, hora) - 1
+    if i >= 0 and hora < hastas[i]:
+        return desdes[i] if hacia_atras else hastas[i]
+    return hora
+
+
+def _programar_jugador(tareas, separacion_ms, regiones=([], [])):
+    """
+    Programa los envíos de un jugador (primero el plazo más cercano).
+    
+    Recorre una línea temporal: en cada paso se liberan los ataques cuyo
+    rango ya empezó y se envía el de plazo más temprano (montículo por fin
+    de rango). Si ningún ataque está liberado, se salta al siguiente inicio,
+    y nunca se envía dentro de una región prohibida: se espera a que acabe.
+    Con las regiones de _regiones_prohibidas el reparto cumple todos los
+    plazos siempre que exista alguno que los cumpla.
+    
+    Args:
+        tareas: lista de (inicio, fin, ataque)
+        separacion_ms: separación mínima entre dos envíos
+        regiones: (opcional) regiones prohibidas (de _regiones_prohibidas)
+    
+    Returns:
+        list: envios = [(hora_envio, ataque, en_plazo)]
+    """
+    tareas = sorted(tareas, key=lambda t: t[0])
+    pendientes = []
+    envios = []
+    siguiente = 0
+    libre_desde = -math.inf  # primera hora en la que el jugador puede volver a enviar
+    
+    while siguiente < len(tareas) or pendientes:
+        if not pendientes:
+            libre_desde = max(libre_desde, tareas[siguiente][0])
+        libre_desde = _fuera_de_regiones(libre_desde, regiones)
+        while siguiente < len(tareas) and tareas[siguiente][0] <= libre_desde:
+            inicio, fin, ataque = tareas[siguiente]
+            heapq.heappush(pendientes, (fin, siguiente, ataque))
+            siguiente += 1
+        if not pendientes:
+            continue
+        
+        fin, _, ataque = heapq.heappop(pendientes)
+        envios.append((libre_desde, ataque, libre_desde <= fin))
+        libre_desde += separacion_ms
+    
+    return envios
+
+
+def _margen_que_falta(tareas, separacion_ms):
+    """
+    Menor retraso de todos los plazos con el que sí hay reparto (búsqueda binaria).
+    
+    El reparto sin esperas por plazo más cercano da una cota que casi
+    siempre es ya la respuesta, así que se comprueba primero.
+    
+    Returns:
+        int: retraso en milisegundos
+    """
+    fines = {id(ataque): fin for _, fin, ataque in tareas}
+    alto = max(hora - fines[id(ataque)] for hora, ataque, _ in _programar_jugador(tareas, separacion_ms))
+    bajo = 0
+    if _regiones_prohibidas(tareas, separacion_ms, alto - 1) is None:
+        bajo = alto - 1
+    while alto - bajo > 1:
+        medio = (bajo + alto) // 2
+        if _regiones_prohibidas(tareas, separacion_ms, medio) is None:
+            bajo = medio
+        else:
+            alto = medio
+    return alto
+
+
+def programar_envios(plan, separacion_ms=SEPARACION_POR_DEFECTO_MS, margen_llegada_ms=0, disponibilidad=None):
+    """
+    Reparte los envíos de cada jugador con una separación mínima.
+    
+    Cada ataque conserva su llegada dentro de la ventana (o, sin ventana,
+    como mucho margen_llegada_ms después de la hora pedida). Los jugadores
+    para los que no existe reparto posible se marcan como inviables: los
+    ataques que no caben se quitan del reparto y se dejan al final de su
+    rango con 'envio_sin_separacion' (los demás siguen separados y en
+    plazo) y el resumen indica cuánto margen falta. Con
+    disponibilidad, el rango de cada ataque se recorta antes a las horas en
+    que su jugador está conectado (el primer tramo conectado del rango).
+    
+    Args:
+        plan: plan con 'hora_envio_ms' en los ataques (sincronizado o con ventana)
+        separacion_ms: milisegundos mínimos entre dos envíos del mismo jugador
+        margen_llegada_ms: retraso de llegada permitido en planes sin ventana
+        disponibilidad: (opcional) Disponibilidad con los horarios de los jugadores
+    
+    Returns:
+        dict: resumen (también se guarda en plan['programacion_envios'])
+    """
+    if 'trenes' in plan:
+        raise ValueError("Los trenes de nobles ya tienen sus envíos ordenados al milisegundo")
+    
+    tareas_por_jugador = {}
+    for objetivo in plan['objetivos']:
+        for ataque in objetivo['ataques']:
+            if 'hora_envio_ms' not in ataque:
+                continue
+            inicio, fin = _intervalos_envio(ataque, margen_llegada_ms)
+            if disponibilidad:
+                conectado = disponibilidad.recortar_llegadas(ataque['jugador'], [(inicio, fin)], 0)
+                if conectado:
+                    inicio, fin = conectado[0]
+            tareas_por_jugador.setdefault(ataque['jugador'], []).append((inicio, fin, ataque))
+    
+    if not tareas_por_jugador:
+        raise ValueError("El plan no tiene horas de envío (usa el método sincronizado o una ventana de llegada)")
+    
+    movidos = 0
+    inviables = {}
+    for jugador, tareas in tareas_por_jugador.items():
+        # Sin reparto posible el jugador es inviable: el menor retraso que lo hace
+        # posible es el margen que le falta. Los ataques que no caben se quitan
+        # del reparto (sin retrasar a los demás) y se dejan al final de su rango
+        retraso_maximo = 0
+        descartados = []
+        regiones = _regiones_prohibidas(tareas, separacion_ms)
+        if regiones is None:
+            retraso_maximo = _margen_que_falta(tareas, separacion_ms)
+            regiones = _regiones_prohibidas(tareas, separacion_ms, descartados=descartados)
+        fines = {id(ataque): fin for _, fin, ataque in tareas}
+        sin_sitio = {id(ataque) for ataque in descartados}
+        envios = _programar_jugador([t for t in tareas if id(t[2]) not in sin_sitio], separacion_ms, regiones)
+        envios.extend((fines[id(ataque)], ataque, False) for ataque in descartados)
+        conflictos = 0
+        for hora_envio, ataque, en_plazo in envios:
+            if not en_plazo:
+                hora_envio = fines[id(ataque)]
+            if hora_envio != ataque['hora_envio_ms']:
+                movidos += 1
+            ataque['hora_envio_ms'] = hora_envio
+            ataque['hora_llegada_ms'] = hora_envio + ataque['tiempo_viaje_ms']
+            ataque.pop('hora_envio_hasta_ms', None)
+            ataque.pop('hora_llegada_hasta_ms', None)
+            if en_plazo:
+                ataque.pop('envio_sin_separacion', None)
+            else:
+                ataque['envio_sin_separacion'] = True
+                conflictos += 1
+        if conflictos:
+            inviables[jugador] = {
+                'ataques_sin_separacion': conflictos,
+                'margen_que_falta_ms': retraso_maximo
+            }
+    
+    from asignador import formatear_horas_plan, formato_fecha_plan
+    formatear_horas_plan(plan, formato_fecha_plan(plan))
+    
+    resumen = {
+        'separacion_ms': separacion_ms,
+        'margen_llegada_ms': margen_llegada_ms,
+        'jugadores': len(tareas_por_jugador),
+        'ataques_movidos': movidos,
+        'jugadores_inviables': inviables
+    }
+    plan['programacion_envios'] = resumen
+    
+    print(f"🕐 Envíos programados: {len(tareas_por_jugador)} jugadores, {movidos} ataques movidos "
+          f"(separación mínima {separacion_ms / 1000:g} s)")
+    for jugador, datos in inviables.items():
+        print(f"   ⚠️  {jugador}: {datos['ataques_sin_separacion']} envíos sin separación "
+              f"(faltan {tiempo_a_string(datos['margen_que_falta_ms'] / 60000)} de margen)")
+    return resumen
@@ -0,0 +1,335 @@
+"""
+Módulo de puntuación
+Puntúa de una vez todas las parejas pueblo-objetivo con pesos configurables
+(moral, tiempo de viaje, población, tipo de OFF y reparto entre jugadores)
+y reparte los ataques de forma óptima con el algoritmo húngaro
+"""
+
+from calculadora import calcular_morales, matriz_distancias
+
+# NumPy es opcional: si está instalado, la matriz de puntuaciones y el húngaro se vectorizan
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Criterios que se pueden ponderar
+CRITERIOS = ('moral', 'tiempo', 'poblacion', 'tipo_off', 'balance')
+
+# Pesos por defecto: manda la moral; el tiempo de viaje y la población desempatan
+PESOS_POR_DEFECTO = {'moral': 1.0, 'tiempo': 0.1, 'poblacion': 0.05, 'tipo_off': 0.0, 'balance': 0.0}
+
+
+def normalizar_pesos(pesos=None):
+    """
+    Completa y comprueba un diccionario de pesos.
+    
+    Args:
+        pesos: (opcional) dict criterio -> peso; los criterios que faltan
+               valen 0 (sin pesos se usan PESOS_POR_DEFECTO)
+    
+    Returns:
+        dict: peso de cada criterio de CRITERIOS
+    """
+    if pesos is None:
+        return dict(PESOS_POR_DEFECTO)
+    
+    desconocidos = set(pesos) - set(CRITERIOS)
+    if desconocidos:
+        raise ValueError(f"Criterios desconocidos: {', '.join(sorted(desconocidos))}. Usa: {', '.join(CRITERIOS)}")
+    normalizados = {criterio: float(pesos.get(criterio, 0)) for criterio in CRITERIOS}
+    if any(peso < 0 for peso in normalizados.values()):
+        raise ValueError("Los pesos no pueden ser negativos")
+    return normalizados
+
+
+def leer_pesos(texto):
+    """
+    Lee pesos escritos como "moral=1,tiempo=0.5,balance=0.2".
+    
+    Args:
+        texto: pares criterio=peso separados por comas
+    
+    Returns:
+        dict: pesos normalizados (ver normalizar_pesos)
+    """
+    pesos = {}
+    for parte in texto.split(','):
+        if not parte.strip():
+            continue
+        criterio, separador, valor = parte.partition('=')
+        if not separador:
+            raise ValueError(f"Peso mal escrito: '{parte.strip()}' (usa criterio=peso)")
+        try:
+            pesos[criterio.strip()] = float(valor)
+        except ValueError:
+            raise ValueError(f"Peso no numérico para {criterio.strip()}: '{valor.strip()}'") from None
+    return normalizar_pesos(pesos)
+
+
+def acepta_tipo(tipo_pedido, tipo_pueblo):
+    """
+    Indica si un tipo de OFF encaja con el pedido de un objetivo.
+    
+    Args:
+        tipo_pedido: tipo pedido (str), dict MIXTA con cantidades por tipo o None
+        tipo_pueblo: tipo de OFF del pueblo
+    
+    Returns:
+        bool: True si encaja (sin tipo pedido, ninguno encaja)
+    """
+    if not tipo_pedido:
+        return False
+    if isinstance(tipo_pedido, dict):
+        return tipo_pedido.get(tipo_pueblo, 0) > 0
+    return tipo_pueblo == tipo_pedido
+
+
+def matriz_puntuaciones(pueblos, objetivos, pesos=None, ms_por_campo=None, poblaciones=None, tipos_pedidos=None):
+    """
+    Puntúa todas las parejas pueblo-objetivo en una sola pasada.
+    
+    Cada criterio se lleva a [0, 1] antes de aplicar su peso:
+    - moral: moral / 100
+    - tiempo: 1 - tiempo de viaje / mayor tiempo de viaje
+    - poblacion: población ofensiva / mayor población
+    - tipo_off: 1 si el tipo del pueblo encaja con el pedido del objetivo
+    El reparto entre jugadores ('balance') depende de lo ya asignado, así
+    que no entra en la matriz: lo aplica el asignador voraz al elegir.
+    Los criterios con peso 0 no se calculan.
+    
+    Args:
+        pueblos: lista de pueblos (coordenadas, puntos_jugador, tipo_off)
+        objetivos: lista de objetivos (coordenadas, puntos_defensor)
+        pesos: (opcional) dict criterio -> peso (ver normalizar_pesos)
+        ms_por_campo: (opcional) milisegundos por campo de cada pueblo (por
+                      defecto, la misma velocidad para todos)
+        poblaciones: (opcional) población ofensiva de cada pueblo (por defecto
+                     'poblacion_ofensiva')
+        tipos_pedidos: (opcional) tipo de OFF pedido por cada objetivo (str,
+                       dict MIXTA o None)
+    
+    Returns:
+        array (NumPy, forma n x m) o list de listas: puntuacion[i][j]
+    """
+    pesos = normalizar_pesos(pesos)
+    n, m = len(pueblos), len(objetivos)
+    if ms_por_campo is None:
+        ms_por_campo = [1.0] * n
+    if poblaciones is None:
+        poblaciones = [pueblo.get('poblacion_ofensiva', 0) for pueblo in pueblos]
+    
+    puntos_atacantes = [pueblo.get('puntos_jugador', 0) for pueblo in pueblos]
+    puntos_defensores = [objetivo.get('puntos_defensor', 0) for objetivo in objetivos]
+    tipos_pueblos = [pueblo.get('tipo_off') for pueblo in pueblos]
+    
+    if np is not None:
+        puntuacion = np.zeros((n, m))
+        if not n or not m:
+            return puntuacion
+        if pesos['moral']:
+            morales = calcular_morales(np.asarray(puntos_atacantes).reshape(-1, 1), puntos_defensores)
+            puntuacion += pesos['moral'] * morales / 100
+        if pesos['tiempo']:
+            distancias = matriz_distancias([p['coordenadas'] for p in pueblos], [o['coordenadas'] for o in objetivos])
+            tiempos = distancias * np.asarray(ms_por_campo, dtype=np.float64).reshape(-1, 1)
+            maximo = tiempos.max()
+            if maximo > 0:
+                puntuacion += pesos['tiempo'] * (1 - tiempos / maximo)
+        if pesos['poblacion']:
+            poblacion = np.asarray(poblaciones, dtype=np.float64)
+            maximo = poblacion.max()
+            if maximo > 0:
+                puntuacion += pesos['poblacion'] * (poblacion / maximo).reshape(-1, 1)
+        if pesos['tipo_off'] and tipos_pedidos:
+            # Una comparación por tipo de OFF distinto, no por pareja
+            tipos = np.asarray([str(tipo) for tipo in tipos_pueblos])
+            for tipo in set(tipos_pueblos):
+                columnas = np.array([acepta_tipo(pedido, tipo) for pedido in tipos_pedidos])
+                if columnas.any():
+                    puntuacion += pesos['tipo_off'] * np.outer(tipos == str(tipo), columnas)
+        return puntuacion
+    
+    filas = [[0.0] * m for _ in range(n)]
+    if pesos['moral']:
+        for fila, puntos in zip(filas, puntos_atacantes):
+            for j, moral in enumerate(calcular_morales(puntos, puntos_defensores)):
+                fila[j] += pesos['moral'] * moral / 100
+    if pesos['tiempo'] and n and m:
+        distancias = matriz_distancias([p['coordenadas'] for p in pueblos], [o['coordenadas'] for o in objetivos])
+        tiempos = [[d * v for d in fila] for fila, v in zip(distancias, ms_por_campo)]
+        maximo = max(max(fila) for fila in tiempos)
+        if maximo > 0:
+            for fila, tiempos_fila in zip(filas, tiempos):
+                for j, tiempo in enumerate(tiempos_fila):
+                    fila[j] += pesos['tiempo'] * (1 - tiempo / maximo)
+    if pesos['poblacion'] and n:
+        maximo = max(poblaciones)
+        if maximo > 0:
+            for fila, poblacion in zip(filas, poblaciones):
+                extra = pesos['poblacion'] * poblacion / maximo
+                for j in range(m):
+                    fila[j] += extra
+    if pesos['tipo_off'] and tipos_pedidos:
+        encajes = {tipo: [acepta_tipo(pedido, tipo) for pedido in tipos_pedidos] for tipo in set(tipos_pueblos)}
+        for fila, tipo in zip(filas, tipos_pueblos):
+            for j, encaja in enumerate(encajes[tipo]):
+                if encaja:
+                    fila[j] += pesos['tipo_off']
+    return filas
+
+
+def asignacion_minima(costes, filas, columnas):
+    """
+    Asignación de coste mínimo (algoritmo húngaro por caminos más cortos).
+    
+    Cada fila recibe una columna distinta; necesita filas <= columnas.
+    
+    Args:
+        costes: función (fila, columna) -> coste
+        filas: número de filas
+        columnas: número de columnas
+    
+    Returns:
+        list: columna asignada a cada fila
+    """
+    infinito = float('inf')
+    u = [0.0] * (filas + 1)
+    v = [0.0] * (columnas + 1)
+    dueno = [0] * (columnas + 1)   # fila (desde 1) asignada a cada columna
+    previo = [0] * (columnas + 1)
+    
+    for fila in range(1, filas + 1):
+        dueno[0] = fila
+        columna_libre = 0
+        minimos = [infinito] * (columnas + 1)
+        usadas = [False] * (columnas + 1)
+        while True:
+            usadas[columna_libre] = True
+            fila_actual = dueno[columna_libre]
+            delta = infinito
+            siguiente = 0
+            for j in range(1, columnas + 1):
+                if not usadas[j]:
+                    coste = costes(fila_actual - 1, j - 1) - u[fila_actual] - v[j]
+                    if coste < minimos[j]:
+                        minimos[j] = coste
+                        previo[j] = columna_libre
+                    if minimos[j] < delta:
+                        delta = minimos[j]
+                        siguiente = j
+            for j in range(columnas + 1):
+                if usadas[j]:
+                    u[dueno[j]] += delta
+                    v[j] -= delta
+                else:
+                    minimos[j] -= delta
+            columna_libre = siguiente
+            if dueno[columna_libre] == 0:
+                break
+        while columna_libre:
+            anterior = previo[columna_libre]
+            dueno[columna_libre] = dueno[anterior]
+            columna_libre = anterior
+    
+    asignacion = [0] * filas
+    for j in range(1, columnas + 1):
+        if dueno[j]:
+            asignacion[dueno[j] - 1] = j - 1
+    return asignacion
+
+
+def asignacion_minima_numpy(costes):
+    """Igual que asignacion_minima con la matriz de costes y el bucle de columnas en NumPy"""
+    filas, columnas = costes.shape
+    u = np.zeros(filas + 1)
+    v = np.zeros(columnas + 1)
+    dueno = np.zeros(columnas + 1, dtype=np.int64)
+    previo = np.zeros(columnas + 1, dtype=np.int64)
+    
+    for fila in range(1, filas + 1):
+        dueno[0] = fila
+        columna_libre = 0
+        minimos = np.full(columnas + 1, np.inf)
+        usadas = np.zeros(columnas + 1, dtype=bool)
+        while True:
+            usadas[columna_libre] = True
+            fila_actual = dueno[columna_libre]
+            libres = ~usadas[1:]
+            reducidos = costes[fila_actual - 1] - u[fila_actual] - v[1:]
+            mejora = libres & (reducidos < minimos[1:])
+            minimos[1:][mejora] = reducidos[mejora]
+            previo[1:][mejora] = columna_libre
+            
+            candidatos = np.where(libres, minimos[1:], np.inf)
+            siguiente = int(np.argmin(candidatos)) + 1
+            delta = candidatos[siguiente - 1]
+            
+            u[dueno[usadas]] += delta
+            v[usadas] -= delta
+            minimos[~usadas] -= delta
+            columna_libre = siguiente
+            if dueno[columna_libre] == 0:
+                break
+        while columna_libre:
+            anterior = previo[columna_libre]
+            dueno[columna_libre] = dueno[anterior]
+            columna_libre = anterior
+    
+    asignacion = [0] * filas
+    for j in np.flatnonzero(dueno[1:]).tolist():
+        asignacion[dueno[j + 1] - 1] = j
+    return asignacion
+
+
+def asignacion_optima(puntuaciones, huecos, permitidas=None):
+    """
+    Reparto que maximiza la suma de puntuaciones (algoritmo húngaro).
+    
+    Cada hueco es un ataque pedido a un objetivo y cada pueblo cubre como
+    mucho un hueco. Las parejas no permitidas cuestan más que cualquier
+    reparto, así que primero se cubre el máximo de huecos posible y, entre
+    esos repartos, se elige el de mayor puntuación total.
+    
+    Args:
+        puntuaciones: matriz pueblos x objetivos (matriz_puntuaciones)
+        huecos: índice de objetivo de cada hueco
+        permitidas: (opcional) matriz booleana pueblos x huecos
+    
+    Returns:
+        list: parejas (pueblo, hueco) permitidas del reparto
+    """
+    n, h = len(puntuaciones), len(huecos)
+    if not n or not h:
+        return []
+    
+    # El algoritmo necesita filas <= columnas: si hay más pueblos que huecos, se traspone
+    traspuesta = n > h
+    if np is not None:
+        puntos = np.asarray(puntuaciones, dtype=np.float64)[:, huecos]
+        costes = puntos.max() - puntos
+        prohibido = (costes.max() + 1) * min(n, h) + 1
+        if permitidas is not None:
+            permitidas = np.asarray(permitidas, dtype=bool)
+            costes = np.where(permitidas, costes, prohibido)
+        asignacion = asignacion_minima_numpy(costes.T if traspuesta else costes)
+        permitida = (lambda i, k: True) if permitidas is None else (lambda i, k: bool(permitidas[i, k]))
+    else:
+        maximo = max(max(fila) for fila in puntuaciones)
+        prohibido = (maximo - min(min(fila) for fila in puntuaciones) + 1) * min(n, h) + 1
+        permitida = (lambda i, k: True) if permitidas is None else (lambda i, k: permitidas[i][k])
+        
+        def coste(i, k):
+            if traspuesta:
+                i, k = k, i
+            if not permitida(i, k):
+                return prohibido
+            return maximo - puntuaciones[i][huecos[k]]
+        
+        if traspuesta:
+            asignacion = asignacion_minima(coste, h, n)
+        else:
+            asignacion = asignacion_minima(coste, n, h)
+    
+    parejas = [(i, k) for k, i in enumerate(asignacion)] if traspuesta else list(enumerate(asignacion))
+    return [(i, k) for i, k in sorted(parejas) if permitida(i, k)]
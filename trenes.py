@@ -0,0 +1,209 @@
+"""
+Módulo de trenes de nobles
+Planifica conquistas: ataques de limpieza seguidos de nobles que llegan
+en orden, separados por pocos milisegundos
+"""
+
+from datetime import datetime
+
+from asignador import crear_ataque, formatear_horas_plan, ordenar_por_prioridad, anotar_prioridad
+from calculadora import calcular_moral, coordenadas_a_string, datetime_a_ms, unidades_mas_lentas
+from config_mundos import obtener_config, segundos_por_campo
+from indice_espacial import IndiceEspacial
+
+# Separación por defecto entre llegadas consecutivas de un tren
+SEPARACION_TREN_MS = 100
+
+
+def nobles_de_pueblo(pueblo):
+    """Nobles disponibles en un pueblo ('nobles' o tropas['nobles'])"""
+    if 'nobles' in pueblo:
+        return pueblo['nobles']
+    return pueblo.get('tropas', {}).get('nobles', 0)
+
+
+def puede_limpiar(pueblo):
+    """Indica si un pueblo tiene tropas para limpiar, además de sus nobles (sin tropas conocidas, sí)"""
+    if 'tropas' not in pueblo:
+        return True
+    return any(cantidad for clave, cantidad in pueblo['tropas'].items() if clave != 'nobles')
+
+
+def _crear_ataque(pueblo, objetivo, distancia_cuadrada, segundos_campo, unidad, llegada_ms, rol, orden):
+    """Ataque de un tren con el mismo formato que los del asignador"""
+    distancia = distancia_cuadrada ** 0.5
+    moral = calcular_moral(pueblo.get('puntos_jugador', 0), objetivo.get('puntos_defensor', 0))
+    return crear_ataque(pueblo, objetivo, distancia, distancia * segundos_campo / 60,
+                        round(distancia * segundos_campo * 1000), moral, llegada_ms, unidad, rol=rol, orden=orden)
+
+
+def _elegir_nobles(indice, restantes, coord_objetivo, nobles_por_tren, alcance):
+    """
+    Pueblos que envían los nobles de un tren: [(d2, pueblo, nobles)].
+    
+    Si algún pueblo al alcance tiene nobles para el tren completo se usa el
+    más cercano de ellos; si no, se juntan los más cercanos hasta completarlo.
+    """
+    juntos = []
+    juntados = 0
+    for d2, pueblo in indice.cercanos(coord_objetivo, alcance):
+        disponibles = restantes[id(pueblo)]
+        if disponibles >= nobles_por_tren:
+            return [(d2, pueblo, nobles_por_tren)]
+        if juntados < nobles_por_tren:
+            usar = min(disponibles, nobles_por_tren - juntados)
+            juntos.append((d2, pueblo, usar))
+            juntados += usar
+    
+    return juntos if juntados == nobles_por_tren else None
+
+
+def planificar_trenes(pueblos_atacantes, objetivos, hora_llegada, pueblos_nobles=None, nobles_por_tren=4,
+                      limpiezas_por_objetivo=1, separacion_ms=SEPARACION_TREN_MS, mundo='es95',
+                      politica_prioridad='estricta'):
+    """
+    Planifica un tren por objetivo: limpiezas y después nobles, en orden.
+    
+    Cada objetivo recibe sus limpiezas (las ofensivas más cercanas) y, tras
+    ellas, los nobles del pueblo más cercano que pueda enviar el tren completo
+    (o de varios pueblos cercanos si ninguno puede). La primera limpieza llega
+    a hora_llegada y cada ataque siguiente separacion_ms después, así que todo
+    el tren cae en una ventana de (limpiezas + nobles - 1) * separacion_ms.
+    Las ofensivas viajan a la velocidad de su unidad más lenta (sin contar
+    los nobles) y los nobles solo salen de pueblos dentro de la distancia
+    máxima de nobles del mundo. Un pueblo con nobles y tropas puede limpiar
+    y nobilizar: si sale en un tren, su limpieza va a ese mismo tren.
+    
+    Args:
+        pueblos_atacantes: ofensivas para las limpiezas (lista o PoolOfensivas)
+        objetivos: lista de objetivos (por tandas de 'prioridad'; en su orden dentro de cada una)
+        hora_llegada: datetime de llegada de la primera limpieza
+        pueblos_nobles: (opcional) pueblos con nobles; por defecto, los pueblos
+                        atacantes con 'nobles' o tropas['nobles'] (que también
+                        limpian si tienen más tropas)
+        nobles_por_tren: nobles por objetivo
+        limpiezas_por_objetivo: ataques de limpieza por objetivo
+        separacion_ms: milisegundos entre llegadas consecutivas
+        mundo: identificador del mundo
+        politica_prioridad: 'estricta' o 'ponderada' (ver asignador.tandas_por_prioridad)
+    
+    Returns:
+        dict: plan de ataque con los trenes (ataques con 'rol' y 'orden')
+    """
+    pueblos_atacantes = list(pueblos_atacantes)
+    if pueblos_nobles is None:
+        pueblos_nobles = [p for p in pueblos_atacantes if nobles_de_pueblo(p) > 0]
+    ofensivas = [p for p in pueblos_atacantes if puede_limpiar(p)]
+    
+    plan = {
+        'fecha_creacion': datetime.now().isoformat(),
+        'mundo': mundo,
+        'tipo_tropa': 'noble',
+        'objetivos': [],
+        'pueblos_sin_asignar': [],
+        'hora_llegada_objetivo': hora_llegada.strftime('%d/%m/%Y %H:%M:%S'),
+        'trenes': {
+            'nobles_por_tren': nobles_por_tren,
+            'limpiezas_por_objetivo': limpiezas_por_objetivo,
+            'separacion_ms': separacion_ms,
+            'ventana_ms': (limpiezas_por_objetivo + nobles_por_tren - 1) * separacion_ms,
+            'objetivos_sin_tren': []
+        }
+    }
+    
+    llegada_ms = datetime_a_ms(hora_llegada)
+    alcance = obtener_config(mundo)['distancia_maxima_nobles']
+    segundos_noble = segundos_por_campo('noble', mundo)
+    
+    # Velocidad de cada ofensiva (unidad más lenta sin los nobles, que van aparte;
+    # arietes si no hay tropas)
+    sin_nobles = [{'tropas': {clave: cantidad for clave, cantidad in p.get('tropas', {}).items() if clave != 'nobles'}}
+                  for p in ofensivas]
+    unidades = unidades_mas_lentas(sin_nobles, mundo, por_defecto='ariete')
+    velocidad_ofensiva = {id(p): (unidad, segundos_por_campo(unidad, mundo)) for p, unidad in zip(ofensivas, unidades)}
+    
+    indice_ofensivas = IndiceEspacial(ofensivas)
+    indice_nobles = IndiceEspacial(pueblos_nobles)
+    restantes = {id(p): nobles_de_pueblo(p) for p in pueblos_nobles}
+    usados = set()
+    con_nobles = set()
+    
+    # Ofensivas por coordenadas, para que el pueblo de los nobles limpie su propio tren
+    ofensivas_por_coord = {}
+    for pueblo in ofensivas:
+        ofensivas_por_coord.setdefault(tuple(pueblo['coordenadas']), []).append(pueblo)
+    
+    for objetivo in ordenar_por_prioridad(objetivos, politica_prioridad):
+        coord_objetivo = objetivo['coordenadas']
+        
+        # Primero los nobles: sin ellos no se reservan limpiezas
+        nobles = _elegir_nobles(indice_nobles, restantes, coord_objetivo, nobles_por_tren, alcance)
+        limpiezas = []
+        if nobles is not None:
+            elegidas = set()
+            for d2, pueblo_noble, _ in nobles:
+                for pueblo in ofensivas_por_coord.get(tuple(pueblo_noble['coordenadas']), ()):
+                    if len(limpiezas) < limpiezas_por_objetivo and id(pueblo) not in usados | elegidas:
+                        limpiezas.append((d2, pueblo))
+                        elegidas.add(id(pueblo))
+            for d2, pueblo in indice_ofensivas.cercanos(coord_objetivo):
+                if len(limpiezas) >= limpiezas_por_objetivo:
+                    break
+                if id(pueblo) not in elegidas:
+                    limpiezas.append((d2, pueblo))
+        
+        if nobles is None or len(limpiezas) < limpiezas_por_objetivo:
+            plan['trenes']['objetivos_sin_tren'].append({
+                'coordenadas': coordenadas_a_string(coord_objetivo),
+                'nombre': objetivo['nombre'],
+                'motivo': 'sin nobles al alcance' if nobles is None else 'sin ofensivas de limpieza'
+            })
+            anotar_prioridad(plan, objetivo, 0, limpiezas_por_objetivo + nobles_por_tren, politica_prioridad)
+            continue
+        
+        ataques = []
+        orden = 0
+        for d2, pueblo in limpiezas:
+            indice_ofensivas.quitar(pueblo)
+            usados.add(id(pueblo))
+            unidad, segundos = velocidad_ofensiva[id(pueblo)]
+            ataques.append(_crear_ataque(pueblo, objetivo, d2, segundos, unidad,
+                                         llegada_ms + orden * separacion_ms, 'limpieza', orden + 1))
+            orden += 1
+        
+        for d2, pueblo, cantidad in nobles:
+            con_nobles.add(id(pueblo))
+            restantes[id(pueblo)] -= cantidad
+            if restantes[id(pueblo)] == 0:
+                indice_nobles.quitar(pueblo)
+            for _ in range(cantidad):
+                ataques.append(_crear_ataque(pueblo, objetivo, d2, segundos_noble, 'noble',
+                                             llegada_ms + orden * separacion_ms, 'noble', orden + 1))
+                orden += 1
+        
+        plan['objetivos'].append({
+            'coordenadas': coordenadas_a_string(coord_objetivo),
+            'nombre': objetivo['nombre'],
+            'jugador_defensor': objetivo.get('jugador_defensor', 'Desconocido'),
+            'ataques': ataques,
+            'ataques_asignados': len(ataques)
+        })
+        anotar_prioridad(plan, objetivo, len(ataques), len(ataques), politica_prioridad)
+    
+    formatear_horas_plan(plan, '%d/%m/%Y')
+    
+    # Ofensivas que no salen ni a limpiar ni con nobles (los nobles sobrantes se quedan en sus pueblos)
+    plan['pueblos_sin_asignar'] = [
+        {
+            'coordenadas': coordenadas_a_string(p['coordenadas']),
+            'nombre': p['nombre'],
+            'jugador': p['jugador']
+        }
+        for p in ofensivas if id(p) not in usados and id(p) not in con_nobles
+    ]
+    
+    trenes = len(plan['objetivos'])
+    print(f"👑 {trenes} trenes planificados ({len(plan['trenes']['objetivos_sin_tren'])} objetivos sin tren)")
+    for objetivo in plan['trenes']['objetivos_sin_tren']:
+        print(f"   ⚠️  {objetivo['coordenadas']}: {objetivo['motivo']}")
+    return plan